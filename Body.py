@@ -12,18 +12,19 @@ DEFAULT_SEED = 12345
 class BlockBody:
     transactions: List[Dict[str, Any]]
     merkle_root: Optional[str] = None
+    backend: Optional[str] = None  # hash_backends pavadinimas (None — custom32)
 
     def __post_init__(self) -> None:
         if self.transactions is None:
             raise ValueError("transactions negali būti None")
         if self.merkle_root is None:
             # apskaičiuojame Merkle root, jei nebuvo pateiktas
-            self.merkle_root = compute_merkle_root_from_tx_list(self.transactions)
+            self.merkle_root = compute_merkle_root_from_tx_list(self.transactions, show_tree=False, backend=self.backend)
 
     @classmethod
-    def from_csv(cls, csv_path: str, n: int = DEFAULT_N, seed: Optional[int] = DEFAULT_SEED) -> "BlockBody":
-        txs = pick_random_transactions(csv_path=csv_path, n=n, seed=seed)
-        return cls(txs)
+    def from_csv(cls, csv_path: str, n: int = DEFAULT_N, seed: Optional[int] = DEFAULT_SEED, streaming: bool = False, backend: Optional[str] = None) -> "BlockBody":
+        txs = pick_random_transactions(csv_path=csv_path, n=n, seed=seed, streaming=streaming)
+        return cls(txs, backend=backend)
 
     def to_dict(self) -> Dict[str, Any]:
         return {"transactions": self.transactions, "merkle_root": self.merkle_root}
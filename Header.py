@@ -1,8 +1,53 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import Callable, Optional
+import struct
 import time
 
-from my_hash_function import hash_generator
+import my_hash_function
+from my_hash_function import HASH_BITS
+from hash_backends import HashBackend, backend_for_version, version_layout
+
+# Kasybos režimai: "naive" — kiekvienam nonce hash'inamas visas serialize(),
+# "midstate" — prefiksas sugeriamas vieną kartą, kiekvienam nonce hash'inama tik pabaiga,
+# "batch" — kaip midstate, bet numpy pagalba tikrinama po BATCH_SIZE nonce vienu metu
+# (tik backend'ams su supports_batch; kitiems naudojamas midstate).
+# Hash funkcija parenkama pagal version (hash_backends: formatas žemiausiame baite, backend id — aukščiau).
+MINE_MODES = ("naive", "midstate", "batch")
+DEFAULT_MINE_MODE = "batch" if my_hash_function.np is not None else "midstate"
+BATCH_SIZE = 4096
+CHECK_EVERY = 256  # kas kiek bandymų midstate režime kviečiamas progress/stabdymo patikrinimas
+MAX_NONCE = 2 ** 62
+
+# Nuo šios versijos header hash'inamas kaip fiksuoto dydžio dvejetainis įrašas (pack()),
+# senesnės versijos — kaip tekstinis serialize(), todėl esami blokai validuojasi kaip anksčiau.
+BINARY_HEADER_VERSION = 2
+HEADER_HASH_SIZE = 32  # hash laukas: ilgio baitas + iki 32 baitų (256 bitų hash)
+# version, prev_hash (ilgis, baitai), merkle_root (ilgis, baitai), timestamp, difficulty; nonce — paskutinis
+HEADER_PREFIX = struct.Struct(f"<IB{HEADER_HASH_SIZE}sB{HEADER_HASH_SIZE}sQI")
+HEADER_NONCE = struct.Struct("<Q")
+HEADER_VERSION = struct.Struct("<I")  # pirmasis HEADER_PREFIX laukas
+NONCE_OFFSET = HEADER_PREFIX.size
+HEADER_SIZE = HEADER_PREFIX.size + HEADER_NONCE.size
+# Nuo šios versijos dvejetainis header turi skaitinį target (32 baitai, big-endian) prieš nonce:
+# PoW — int(hash) < target vietoj "0" * difficulty prefikso. Tekstiniuose header'iuose target
+# (jei nurodytas) pridedamas serialize pabaigoje.
+TARGET_HEADER_VERSION = 3
+HEADER_TARGET = struct.Struct(f"{HEADER_HASH_SIZE}s")
+TARGET_HEADER_SIZE = HEADER_SIZE + HEADER_TARGET.size
+
+
+def target_from_difficulty(difficulty: int, bits: int = HASH_BITS) -> int:
+    """Target, atitinkantis "0" * difficulty prefiksą: hash < 16^(hex ilgis - difficulty)."""
+    if difficulty <= 0:
+        return 1 << bits
+    return 1 << (bits - 4 * difficulty) if 4 * difficulty <= bits else 0
+
+
+def _hash_to_raw(hex_hash: str) -> bytes:
+    raw = bytes.fromhex(hex_hash)
+    if len(raw) > HEADER_HASH_SIZE:
+        raise ValueError(f"Hash ilgesnis nei {HEADER_HASH_SIZE} baitų: {hex_hash}")
+    return raw
 
 @dataclass
 class BlockHeader:
@@ -13,42 +58,218 @@ class BlockHeader:
     nonce: int = 0
     difficulty: int = 3  # kiek nulių heksadešimtainėje hasho pradžioje reikalaujama
     is_genesis: bool = False  # jei True — hash grąžinamas kaip "00000000"
+    target: Optional[int] = None  # jei nurodytas — PoW yra int(hash) < target (difficulty nenaudojamas)
+
+    @property
+    def layout(self) -> int:
+        """Serializacijos formatas (version be backend bitų)."""
+        return version_layout(self.version)
+
+    @property
+    def backend(self) -> HashBackend:
+        return backend_for_version(self.version)
+
+    @property
+    def is_binary(self) -> bool:
+        return self.layout >= BINARY_HEADER_VERSION
+
+    @property
+    def packed_size(self) -> int:
+        return TARGET_HEADER_SIZE if self.layout >= TARGET_HEADER_VERSION else HEADER_SIZE
+
+    def pow_limit(self) -> int:
+        """Hash (kaip skaičius) turi būti mažesnis už šią ribą."""
+        return self.target if self.target is not None else target_from_difficulty(self.difficulty, self.backend.bits)
 
     def serialize(self) -> str:
-        return f"{self.prev_hash}|{self.timestamp}|{self.version}|{self.merkle_root}|{self.nonce}|{self.difficulty}"
+        """Tai, kas hash'inama: tekstinis formatas arba (binary versijoms) pack() hex."""
+        if self.is_binary:
+            return self.pack().hex()
+        return f"{self.serialize_prefix()}{self.serialize_suffix()}"
+
+    def serialize_prefix(self) -> str:
+        """Serializacijos dalis, kuri nesikeičia keičiant nonce."""
+        return f"{self.prev_hash}|{self.timestamp}|{self.version}|{self.merkle_root}|"
+
+    def serialize_suffix(self, nonce: Optional[int] = None) -> str:
+        nonce = self.nonce if nonce is None else nonce
+        return f"{nonce}{self._serialize_tail()}"
+
+    def _serialize_tail(self) -> str:
+        # be target serializacija tokia pati kaip anksčiau — seni blokai validuojasi
+        if self.target is None:
+            return f"|{self.difficulty}"
+        return f"|{self.difficulty}|{self.target:x}"
+
+    def pack_prefix(self) -> bytes:
+        """Dvejetainio header dalis be nonce (packed_size - 8 baitai)."""
+        prev_raw = _hash_to_raw(self.prev_hash)
+        root_raw = _hash_to_raw(self.merkle_root)
+        prefix = HEADER_PREFIX.pack(self.version, len(prev_raw), prev_raw, len(root_raw), root_raw, self.timestamp, self.difficulty)
+        if self.layout < TARGET_HEADER_VERSION:
+            if self.target is not None:
+                raise ValueError(f"target galimas tik nuo {TARGET_HEADER_VERSION} versijos dvejetainiuose header'iuose")
+            return prefix
+        if self.target is None or not 0 <= self.target < 1 << (8 * HEADER_TARGET.size):
+            raise ValueError(f"Versijos {self.version} header'iui reikia target (0 <= target < 2^{8 * HEADER_TARGET.size})")
+        return prefix + HEADER_TARGET.pack(self.target.to_bytes(HEADER_TARGET.size, "big"))
+
+    def pack(self) -> bytes:
+        """Fiksuoto dydžio (packed_size baitų) dvejetainis header."""
+        return self.pack_prefix() + HEADER_NONCE.pack(self.nonce)
+
+    def pack_into(self, buf, offset: int = 0) -> None:
+        buf[offset:offset + self.packed_size] = self.pack()
+
+    @staticmethod
+    def write_nonce(buf, nonce: int, offset: int = 0) -> None:
+        """Pakeičia nonce jau supakuotame header buferyje (be perpakavimo); vieta — pagal buferio version."""
+        (version,) = HEADER_VERSION.unpack_from(buf, offset)
+        nonce_offset = NONCE_OFFSET + (HEADER_TARGET.size if version_layout(version) >= TARGET_HEADER_VERSION else 0)
+        HEADER_NONCE.pack_into(buf, offset + nonce_offset, nonce)
+
+    @classmethod
+    def unpack(cls, data, offset: int = 0) -> "BlockHeader":
+        version, prev_len, prev_raw, root_len, root_raw, timestamp, difficulty = HEADER_PREFIX.unpack_from(data, offset)
+        target = None
+        nonce_offset = offset + NONCE_OFFSET
+        if version_layout(version) >= TARGET_HEADER_VERSION:
+            (target_raw,) = HEADER_TARGET.unpack_from(data, nonce_offset)
+            target = int.from_bytes(target_raw, "big")
+            nonce_offset += HEADER_TARGET.size
+        (nonce,) = HEADER_NONCE.unpack_from(data, nonce_offset)
+        return cls(prev_hash=prev_raw[:prev_len].hex(), timestamp=timestamp, version=version,
+                   merkle_root=root_raw[:root_len].hex(), nonce=nonce, difficulty=difficulty, target=target)
 
     def hash(self) -> str:
         if self.is_genesis:
             return "00000000"
-        return hash_generator(self.serialize())
+        if self.is_binary:
+            return self.backend.hash_bytes(self.pack())
+        return self.backend.hash_text(self.serialize())
 
-    def mine(self, max_nonce: int = 10_000_000, start_nonce: int = 0) -> str:
+    def hash_int(self) -> int:
+        """hash() kaip sveikasis skaičius."""
+        if self.is_genesis:
+            return 0
+        if self.is_binary:
+            return self.backend.hash_bytes_int(self.pack())
+        return self.backend.hash_text_int(self.serialize())
+
+    def mine(self, max_nonce: int = 10_000_000, start_nonce: int = 0, mode: str = DEFAULT_MINE_MODE) -> str:
         if self.is_genesis:
             return self.hash()
-        target_prefix = "0" * self.difficulty
+        if mode in ("midstate", "batch"):
+            h = self.mine_stride(start_nonce, 1, max_nonce, mode=mode)
+            if h is None:
+                raise RuntimeError("Nonce nerastas per leistiną bandymų skaičių")
+            return h
+        if mode != "naive":
+            raise ValueError(f"Nežinomas kasybos režimas: {mode}")
+        limit = self.pow_limit()
+        backend = self.backend
         nonce = start_nonce
+        buf = bytearray(self.pack()) if self.is_binary else None
         while nonce < max_nonce:
             self.nonce = nonce
-            h = self.hash()
-            if h.startswith(target_prefix):
-                return h
+            if buf is not None:
+                self.write_nonce(buf, nonce)
+                h = backend.hash_bytes_int(buf)
+            else:
+                h = backend.hash_text_int(self.serialize())
+            if h < limit:
+                return backend.format(h)
             nonce += 1
         raise RuntimeError("Nonce nerastas per leistiną bandymų skaičių")
 
+    def mine_stride(self, start_nonce: int, step: int = 1, max_nonce: int = MAX_NONCE, progress: Optional[Callable[[int], bool]] = None, mode: str = DEFAULT_MINE_MODE) -> Optional[str]:
+        """
+        Kasa nonce start_nonce, start_nonce + step, ... (< max_nonce).
+        Kas CHECK_EVERY (batch režime — kas BATCH_SIZE) bandymų kviečia progress(bandymai),
+        kuri grąžina True, jei reikia sustoti. Radus hash grąžina jį, kitaip None;
+        self.nonce lieka paskutinis patikrintas nonce.
+        """
+        if step < 1:
+            raise ValueError("step turi būti >= 1")
+        # prefiksas hash'inamas vieną kartą, kiekvienam nonce — tik "nonce|difficulty"
+        # (dvejetainiame formate — tik 8 nonce baitai)
+        # hash lyginamas kaip skaičius su pow_limit(), hex formuojamas tik radus
+        backend = self.backend
+        if self.is_binary:
+            state = backend.bytes_state(self.pack_prefix())
+            finish_bytes = state.digest_with_bytes
+            pack_nonce = HEADER_NONCE.pack
+            finish = lambda nonce: finish_bytes(pack_nonce(nonce))
+            digest_batch = lambda nonces: backend.nonce_batch_bytes(state, nonces)
+        else:
+            state = backend.text_state(self.serialize_prefix())
+            tail = self._serialize_tail()
+            finish_text = state.digest_with
+            finish = lambda nonce: finish_text(f"{nonce}{tail}")
+            digest_batch = lambda nonces: backend.nonce_batch(state, nonces, tail)
+        if mode == "batch" and backend.supports_batch:
+            return self._mine_stride_batch(digest_batch, start_nonce, step, max_nonce, progress)
+        if mode not in ("midstate", "batch"):
+            raise ValueError(f"Nežinomas kasybos režimas: {mode}")
+        limit = self.pow_limit()
+        chunk = CHECK_EVERY * step
+        for lo in range(start_nonce, max_nonce, chunk):
+            nonces = range(lo, min(lo + chunk, max_nonce), step)
+            for nonce in nonces:
+                h = finish(nonce)
+                if h < limit:
+                    self.nonce = nonce
+                    if progress is not None:
+                        progress((nonce - lo) // step + 1)
+                    return backend.format(h)
+            self.nonce = nonces[-1]
+            if progress is not None and progress(len(nonces)):
+                return None
+        return None
+
+    def _mine_stride_batch(self, digest_batch, start_nonce: int, step: int, max_nonce: int, progress) -> Optional[str]:
+        np = my_hash_function.np
+        if np is None:
+            raise ImportError("batch kasybos režimui reikia numpy")
+        # digest'ai — uint32, todėl riba apkarpoma iki 2^32 (uint64 palyginimui)
+        limit = min(self.pow_limit(), 1 << HASH_BITS)
+        chunk = BATCH_SIZE * step
+        for lo in range(start_nonce, max_nonce, chunk):
+            nonces = np.arange(lo, min(lo + chunk, max_nonce), step, dtype=np.int64)
+            digests = digest_batch(nonces)
+            hits = np.flatnonzero(digests.astype(np.uint64) < limit)
+            if hits.size:
+                first = int(hits[0])
+                self.nonce = int(nonces[first])
+                if progress is not None:
+                    progress(first + 1)
+                return self.backend.format(int(digests[first]))
+            self.nonce = int(nonces[-1])
+            if progress is not None and progress(len(nonces)):
+                return None
+        return None
+
     def validate_proof_of_work(self) -> bool:
         if self.is_genesis:
             return self.hash() == "00000000"
-        return self.hash().startswith("0" * self.difficulty)
+        return self.validate_hash(self.hash(), self.difficulty, self.target)
 
     @staticmethod
-    def validate_hash(hash_str: str, difficulty: int) -> bool:
-        """Patikrina ar duotas hash atitinka difficulty (prefix nulių)."""
-        return isinstance(hash_str, str) and hash_str.startswith("0" * difficulty)
+    def validate_hash(hash_str: str, difficulty: int, target: Optional[int] = None) -> bool:
+        """Patikrina ar duotas hash atitinka difficulty (prefix nulių) arba, jei nurodytas, target (int(hash) < target)."""
+        if not isinstance(hash_str, str):
+            return False
+        if target is None:
+            return hash_str.startswith("0" * difficulty)
+        try:
+            return int(hash_str, 16) < target
+        except ValueError:
+            return False
 
     @classmethod
-    def create_with_current_time(cls, prev_hash: str, merkle_root: str, version: int = 1, difficulty: int = 3) -> "BlockHeader":
+    def create_with_current_time(cls, prev_hash: str, merkle_root: str, version: int = 1, difficulty: int = 3, target: Optional[int] = None) -> "BlockHeader":
         """Patogus konstruktorius nustatantis timestamp į dabartinį UTC laiką (s Unix)."""
-        return cls(prev_hash=prev_hash, timestamp=int(time.time()), version=version, merkle_root=merkle_root, nonce=0, difficulty=difficulty)
+        return cls(prev_hash=prev_hash, timestamp=int(time.time()), version=version, merkle_root=merkle_root, nonce=0, difficulty=difficulty, target=target)
 
     @classmethod
     def create_genesis(cls, merkle_root: str = "", version: int = 1, difficulty: int = 3, timestamp: Optional[int] = 0) -> "BlockHeader":
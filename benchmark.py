@@ -0,0 +1,285 @@
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import my_hash_function
+from my_hash_function import hash_generator, hash_batch_hex
+from Header import BlockHeader, MINE_MODES
+from hash_backends import BACKENDS, DEFAULT_BACKEND, make_version
+from merkel_root2 import compute_merkle_root_from_tx_list, LEAF_CACHE
+from transaction_generator import UTXOGenerator
+from user import User
+
+# Našumo matavimai su fiksuotais seed'ais; rezultatai rašomi į JSON, kad būtų galima palyginti paleidimus:
+#   python benchmark.py [rezultatai.json] [--quick] [--only hash,mine] [--compare senas.json]
+SEED = 12345
+DEFAULT_OUTPUT = "benchmark.json"
+REGRESSION_THRESHOLD = 0.10  # kiek (santykinai) sulėtėjimo laikoma regresija lyginant
+REPEAT = 3  # trumpi matavimai kartojami, imamas geriausias laikas (mažiau triukšmo)
+
+HASH_LENGTHS = [8, 64, 256, 1024]
+MERKLE_SIZES = [100, 1_000, 10_000, 100_000, 1_000_000]
+QUICK_MERKLE_SIZES = [100, 1_000, 10_000]
+
+
+def _timed(fn: Callable[[], Any], repeat: int = 1, setup: Optional[Callable[[], Any]] = None) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _rate(count: int, seconds: float) -> float:
+    return count / seconds if seconds > 0 else float("inf")
+
+
+def _random_text(rng: random.Random, length: int) -> str:
+    return "".join(rng.choice("0123456789abcdef|") for _ in range(length))
+
+
+def _random_users(n: int, rng: random.Random) -> List[User]:
+    return [User(name=f"#{i + 1} Vartotojas", public_key=f"{rng.getrandbits(32):08x}", balance=rng.randint(100, 1_000_000)) for i in range(n)]
+
+
+def _random_txs(n: int, rng: random.Random) -> List[Dict[str, str]]:
+    txs = []
+    for i in range(n):
+        inputs = ";".join(f"{rng.getrandbits(32):08x}:{rng.randint(0, 1)}" for _ in range(rng.randint(1, 3)))
+        txs.append({
+            "transaction_id": f"{i:08x}",
+            "sender": f"{rng.getrandbits(32):08x}",
+            "receiver": f"{rng.getrandbits(32):08x}",
+            "amount": str(rng.randint(1, 1_000_000)),
+            "inputs": inputs,
+        })
+    return txs
+
+
+def bench_hash(quick: bool = False) -> Dict[str, Any]:
+    """hash_generator (ir paketinio hash_batch_hex) bei kitų hash_backends hash'ai per sekundę skirtingiems įvesties ilgiams."""
+    rng = random.Random(SEED)
+    results = {}
+    for length in HASH_LENGTHS:
+        n = max(200, (20_000 if quick else 100_000) // max(length // 8, 1))
+        texts = [_random_text(rng, length) for _ in range(n)]
+        seconds = _timed(lambda: [hash_generator(t) for t in texts], REPEAT)
+        entry = {"count": n, "seconds": seconds, "hashes_per_sec": _rate(n, seconds)}
+        if my_hash_function.np is not None:
+            batch_seconds = _timed(lambda: hash_batch_hex(texts), REPEAT)
+            entry["batch_hashes_per_sec"] = _rate(n, batch_seconds)
+        for name, backend in BACKENDS.items():
+            if name != DEFAULT_BACKEND:
+                entry[f"{name}_hashes_per_sec"] = _rate(n, _timed(lambda: backend.hash_texts(texts), REPEAT))
+        results[str(length)] = entry
+    return results
+
+
+def bench_mine(quick: bool = False) -> Dict[str, Any]:
+    """
+    BlockHeader kasybos nonce per sekundę kiekvienam režimui ir hash backend'ui
+    (difficulty = hex ilgis + 1 — hash niekada nerandamas).
+    """
+    n = 20_000 if quick else 200_000
+    results = {}
+    for name, backend in BACKENDS.items():
+        for layout in (1, 2):
+            for mode in MINE_MODES:
+                if mode == "batch" and not backend.supports_batch:
+                    continue
+                key = f"v{layout}_{mode}" if name == DEFAULT_BACKEND else f"{name}_v{layout}_{mode}"
+                results[key] = _bench_mine_one(make_version(layout, name), mode, n, backend.hex_len + 1)
+    return results
+
+
+def _bench_mine_one(version: int, mode: str, n: int, difficulty: int) -> Dict[str, Any]:
+    header = BlockHeader(prev_hash="00000000", timestamp=1_700_000_000, version=version, merkle_root="1234abcd", difficulty=difficulty)
+    count = n // 4 if mode == "naive" else n
+    if mode == "naive":
+        def run():
+            try:
+                header.mine(max_nonce=count, mode="naive")
+            except RuntimeError:
+                pass
+    else:
+        def run():
+            header.mine_stride(0, 1, count, mode=mode)
+    seconds = _timed(run, REPEAT)
+    return {"nonces": count, "seconds": seconds, "nonces_per_sec": _rate(count, seconds)}
+
+
+def bench_merkle(quick: bool = False) -> Dict[str, Any]:
+    """compute_merkle_root_from_tx_list laikas: šaltas (tuščias lapų kešas) ir šiltas."""
+    rng = random.Random(SEED)
+    results = {}
+    for size in (QUICK_MERKLE_SIZES if quick else MERKLE_SIZES):
+        txs = _random_txs(size, rng)
+        saved_size = LEAF_CACHE.maxsize
+        LEAF_CACHE.clear()
+        LEAF_CACHE.maxsize = max(saved_size, size)
+        try:
+            root = lambda: compute_merkle_root_from_tx_list(txs, show_tree=False)
+            repeat = REPEAT if size <= 100_000 else 1
+            cold = _timed(root, repeat, setup=LEAF_CACHE.clear)
+            warm = _timed(root, repeat)
+        finally:
+            LEAF_CACHE.clear()
+            LEAF_CACHE.maxsize = saved_size
+        results[str(size)] = {"seconds": cold, "leaves_per_sec": _rate(size, cold), "warm_seconds": warm}
+    return results
+
+
+def bench_utxo(quick: bool = False) -> Dict[str, Any]:
+    """UTXOGenerator.generate_transactions transakcijos per sekundę."""
+    n = 5_000 if quick else 50_000
+    rng = random.Random(SEED)
+    users = _random_users(1_000, rng)
+    random.seed(SEED)  # generatorius naudoja globalų random
+    gen = UTXOGenerator(users)
+    gen.create_genesis_utxos(n_per_user=3)
+    seconds = _timed(lambda: gen.generate_transactions(n_txs=n))
+    made = len(gen.transactions)
+    return {"requested": n, "generated": made, "seconds": seconds, "txs_per_sec": _rate(made, seconds)}
+
+
+def bench_parallel(quick: bool = False) -> Dict[str, Any]:
+    """Lygiagrečios kasybos bandymai per sekundę pagal worker'ių skaičių (difficulty 9 — visą laiko limitą)."""
+    from procesas import try_mine_partitioned_multiprocessing
+    time_limit = 0.5 if quick else 2.0
+    cpu = os.cpu_count() or 1
+    counts = sorted({1, 2, 4, cpu} | ({cpu * 2} if not quick else set()))
+    candidates = [
+        BlockHeader(prev_hash="00000000", timestamp=1_700_000_000, version=1, merkle_root=f"{i:08x}", difficulty=9)
+        for i in range(5)
+    ]
+    results = {}
+    for workers in counts:
+        _, _, _, stats = try_mine_partitioned_multiprocessing(candidates, time_limit, n_workers=workers)
+        tries = sum(s["tries"] for s in stats)
+        results[str(workers)] = {"seconds": time_limit, "tries": tries, "tries_per_sec": _rate(tries, time_limit)}
+    return results
+
+
+def bench_chain(quick: bool = False) -> Dict[str, Any]:
+    """mine_chain_from_csv blokai per minutę laikiname kataloge (sugeneruoti vartotojai ir transakcijos)."""
+    from main import mine_chain_from_csv
+    from block_body import save_balances_to_users_txt
+    n_blocks = 20 if quick else 100
+    rng = random.Random(SEED)
+    users = _random_users(200, rng)
+    random.seed(SEED)
+    gen = UTXOGenerator(users)
+    gen.create_genesis_utxos(n_per_user=3)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            gen.save_utxos_csv("genesis_utxos.csv")
+            gen.generate_and_export(n_blocks * 10, "transactions.txt", "transactions_min.csv")
+            meta = {u.public_key: (u.name, u.public_key, str(u.balance)) for u in users}
+            save_balances_to_users_txt("users.txt", {u.public_key: float(u.balance) for u in users}, meta)
+            with contextlib.redirect_stdout(io.StringIO()):
+                seconds = _timed(lambda: mine_chain_from_csv("transactions_min.csv", users_path="users.txt", difficulty=3, block_limit=n_blocks))
+        finally:
+            os.chdir(cwd)
+    return {"blocks": n_blocks, "difficulty": 3, "seconds": seconds, "blocks_per_min": _rate(n_blocks * 60, seconds)}
+
+
+BENCHMARKS: Dict[str, Callable[[bool], Dict[str, Any]]] = {
+    "hash": bench_hash,
+    "mine": bench_mine,
+    "merkle": bench_merkle,
+    "utxo": bench_utxo,
+    "parallel": bench_parallel,
+    "chain": bench_chain,
+}
+
+
+def run_benchmarks(names: Optional[List[str]] = None, quick: bool = False) -> Dict[str, Any]:
+    report = {
+        "meta": {
+            "timestamp": int(time.time()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": my_hash_function.np is not None,
+            "quick": quick,
+            "seed": SEED,
+        },
+        "results": {},
+    }
+    for name in names or list(BENCHMARKS):
+        if name not in BENCHMARKS:
+            raise ValueError(f"Nežinomas benchmark'as: {name} (galimi: {', '.join(BENCHMARKS)})")
+        print(f"Vykdoma: {name}...", file=sys.stderr)
+        report["results"][name] = BENCHMARKS[name](quick)
+    return report
+
+
+def _rates(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """Visi '*_per_sec' / '*_per_min' skaičiai plokščiu pavidalu: 'merkle.1000.leaves_per_sec' -> reikšmė."""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_rates(value, path + "."))
+        elif key.endswith(("_per_sec", "_per_min")) and isinstance(value, (int, float)):
+            flat[path] = float(value)
+    return flat
+
+
+def compare_reports(old: Dict[str, Any], new: Dict[str, Any], threshold: float = REGRESSION_THRESHOLD) -> List[Dict[str, Any]]:
+    """Palygina du rezultatų failus; regression=True, jei greitis sumažėjo daugiau nei threshold."""
+    old_rates = _rates(old.get("results", {}))
+    rows = []
+    for path, value in _rates(new.get("results", {})).items():
+        if path not in old_rates or old_rates[path] <= 0:
+            continue
+        ratio = value / old_rates[path]
+        rows.append({"metric": path, "old": old_rates[path], "new": value, "ratio": ratio, "regression": ratio < 1 - threshold})
+    return rows
+
+
+if __name__ == "__main__":
+    quick = "--quick" in sys.argv
+    names = None
+    compare_path = None
+    args = []
+    argv = sys.argv[1:]
+    i = 0
+    while i < len(argv):
+        if argv[i] == "--only" and i + 1 < len(argv):
+            names = [n for n in argv[i + 1].split(",") if n]
+            i += 2
+        elif argv[i] == "--compare" and i + 1 < len(argv):
+            compare_path = argv[i + 1]
+            i += 2
+        else:
+            if not argv[i].startswith("--"):
+                args.append(argv[i])
+            i += 1
+    output_path = args[0] if args else DEFAULT_OUTPUT
+
+    report = run_benchmarks(names, quick)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Rezultatai įrašyti į {output_path}")
+
+    if compare_path:
+        with open(compare_path, "r", encoding="utf-8") as f:
+            old = json.load(f)
+        rows = compare_reports(old, report)
+        for row in rows:
+            flag = "  REGRESIJA" if row["regression"] else ""
+            print(f"{row['metric']:45} {row['old']:14.1f} -> {row['new']:14.1f} ({row['ratio']:.2f}x){flag}")
+        sys.exit(1 if any(r["regression"] for r in rows) else 0)
@@ -1,15 +1,23 @@
 import csv
+import os
 import random
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Optional, Tuple
 import json
 from tempfile import NamedTemporaryFile
 
 # statiniai parametrai — pakeiskite čia
 DEFAULT_N = 5
 DEFAULT_SEED = 12345
+DEFAULT_COMPACT_EVERY = 1000  # po kiek pašalintų transakcijų Mempool perrašo CSV
+DEFAULT_SNAPSHOT_EVERY = 100  # po kiek blokų Ledger perrašo users.txt
 
-def pick_random_transactions(csv_path: Optional[str] = None, n: int = 100, seed: Optional[int] = None, save_selected_path: Optional[str] = None) -> List[Dict[str, str]]:
+def pick_random_transactions(csv_path: Optional[str] = None, n: int = 100, seed: Optional[int] = None, save_selected_path: Optional[str] = None, streaming: bool = False) -> List[Dict[str, str]]:
+    """
+    Atsitiktinai parenka n transakcijų iš CSV.
+    streaming=True — vienas praėjimas per failą su rezervuaro atranka: atmintyje laikoma tik n eilučių,
+    o rezultatas priklauso tik nuo seed (naudojamas atskiras RNG, globalus random nekeičiamas).
+    """
     if csv_path is None:
         raise ValueError("Įveskite iš kurio csv failo skaityti - nurodykite parametrą csv_path.")
 
@@ -17,21 +25,26 @@ def pick_random_transactions(csv_path: Optional[str] = None, n: int = 100, seed:
     if not path.exists():
         raise FileNotFoundError(f"CSV file not found: {path}")
 
-    with path.open(newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
+    if streaming:
+        selected = _reservoir_sample(path, n, random.Random(seed))
+        if not selected:
+            return []
+    else:
+        with path.open(newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            rows = list(reader)
 
-    if seed is not None:
-        random.seed(seed)
+        if seed is not None:
+            random.seed(seed)
 
-    if not rows:
-        return []
+        if not rows:
+            return []
 
-    if len(rows) <= n:
-        random.shuffle(rows)
-        selected = rows
-    else:
-        selected = random.sample(rows, n)
+        if len(rows) <= n:
+            random.shuffle(rows)
+            selected = rows
+        else:
+            selected = random.sample(rows, n)
 
     
     if save_selected_path:
@@ -43,6 +56,24 @@ def pick_random_transactions(csv_path: Optional[str] = None, n: int = 100, seed:
 
     return selected
 
+def _reservoir_sample(path: Path, n: int, rng: random.Random) -> List[Dict[str, str]]:
+    # Algoritmas R: i-toji eilutė (i >= n) pakeičia atsitiktinį rezervuaro elementą su tikimybe n / (i + 1)
+    reservoir: List[Dict[str, str]] = []
+    seen = 0
+    with path.open(newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if seen < n:
+                reservoir.append(row)
+            else:
+                j = rng.randrange(seen + 1)
+                if j < n:
+                    reservoir[j] = row
+            seen += 1
+    if seen <= n:
+        # kaip ir įprastame režime — kai eilučių mažiau nei n, grąžinamos visos sumaišytos
+        rng.shuffle(reservoir)
+    return reservoir
+
 def remove_transactions_from_csv(csv_path: str, tx_ids: set) -> None:
     """
     Pašalina visas eilutes iš csv_path kurių pirmas stulpelis (transaction_id) yra tx_ids.
@@ -72,6 +103,173 @@ def remove_transactions_from_csv(csv_path: str, tx_ids: set) -> None:
     tmp_path.replace(path)
     print(f"Pašalinta {len(tx_ids)} transakcijų iš {csv_path}")
 
+class Mempool:
+    """
+    Transakcijų CSV laikomas atmintyje: CSV nuskaitomas vieną kartą, o count, atsitiktinis
+    parinkimas ir pašalinimas pagal transaction_id kainuoja O(1) (pašalinimui — O(1) vienai eilutei).
+    Pašalinti id rašomi į tombstone žurnalą (<csv>.tombstones), o pats CSV perrašomas
+    tik kas compact_every pašalinimų (arba close()).
+    reserve() pašalina eilutes tik iš atminties (į žurnalą nerašoma): commit() jas pašalina galutinai,
+    release() grąžina atgal (pvz. kai bloko nepavyko iškasti).
+    """
+
+    def __init__(self, csv_path: str, compact_every: int = DEFAULT_COMPACT_EVERY, journal_path: Optional[str] = None):
+        self.csv_path = csv_path
+        self.journal_path = journal_path or f"{csv_path}.tombstones"
+        self.compact_every = compact_every
+        self.fieldnames: List[str] = []
+        self._slots: List[Dict[str, str]] = []      # eilutės; pašalinant paskutinė perkeliama į atsilaisvinusią vietą
+        self._by_id: Dict[str, List[int]] = {}      # transaction_id -> slotų indeksai
+        self._order: List[int] = []                 # kiekvieno slot'o eilutės vieta pradiniame CSV (kompaktavimui)
+        self._pending = 0                           # kiek id žurnale dar neperkelta į CSV
+        self._reserved: Dict[str, List[Tuple[Dict[str, str], int]]] = {}  # id -> [(eilutė, vieta CSV)]
+        self._load()
+
+    @staticmethod
+    def _tx_id(row: Dict[str, str]) -> str:
+        return (row.get("transaction_id") or row.get("id") or "").strip()
+
+    def _load(self) -> None:
+        path = Path(self.csv_path)
+        if not path.exists():
+            raise FileNotFoundError(f"CSV file not found: {path}")
+        with path.open(newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            self.fieldnames = list(reader.fieldnames or [])
+            for seq, row in enumerate(reader):
+                if not any((v or "").strip() for v in row.values() if isinstance(v, str)):
+                    continue
+                self._by_id.setdefault(self._tx_id(row), []).append(len(self._slots))
+                self._slots.append(row)
+                self._order.append(seq)
+        # pritaikome dar nekompaktuotus pašalinimus
+        if os.path.isfile(self.journal_path):
+            with open(self.journal_path, "r", encoding="utf-8") as jf:
+                for line in jf:
+                    tx_id = line.strip()
+                    if tx_id:
+                        self._discard(tx_id)
+                        self._pending += 1
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, tx_id: str) -> bool:
+        return tx_id in self._by_id
+
+    def get(self, tx_id: str) -> Optional[Dict[str, str]]:
+        slots = self._by_id.get(tx_id)
+        return self._slots[slots[0]] if slots else None
+
+    def sample(self, n: int = 100, seed: Optional[int] = None) -> List[Dict[str, str]]:
+        """Atsitiktinai parenka n transakcijų (kaip pick_random_transactions), naudojant atskirą RNG."""
+        rng = random.Random(seed) if seed is not None else random
+        if len(self._slots) <= n:
+            selected = self._slots[:]
+            rng.shuffle(selected)
+            return selected
+        return rng.sample(self._slots, n)
+
+    def rows_in_order(self) -> List[Dict[str, str]]:
+        """Likusios eilutės pradinio CSV tvarka (generatoriaus tvarka — tėvinės TX anksčiau)."""
+        return [self._slots[i] for i in sorted(range(len(self._slots)), key=self._order.__getitem__)]
+
+    def _remove_slot(self, pos: int) -> None:
+        last = len(self._slots) - 1
+        if pos != last:
+            moved = self._slots[last]
+            self._slots[pos] = moved
+            self._order[pos] = self._order[last]
+            ids = self._by_id[self._tx_id(moved)]
+            ids[ids.index(last)] = pos
+        self._slots.pop()
+        self._order.pop()
+
+    def _discard(self, tx_id: str) -> List[Tuple[Dict[str, str], int]]:
+        """Išima id eilutes iš atminties; grąžina [(eilutė, vieta CSV)] (tuščias — id nerastas)."""
+        if tx_id not in self._by_id:
+            return []
+        rows = []
+        slots = self._by_id[tx_id]
+        while slots:
+            pos = slots.pop()
+            rows.append((self._slots[pos], self._order[pos]))
+            self._remove_slot(pos)
+        del self._by_id[tx_id]
+        return rows
+
+    @staticmethod
+    def _sorted_ids(tx_ids: Iterable[str]) -> List[str]:
+        # rikiuojama, kad slotų tvarka (ir sample rezultatai) nepriklausytų nuo set iteracijos tvarkos
+        return sorted({t.strip() for t in tx_ids if t})
+
+    def remove(self, tx_ids: Iterable[str]) -> int:
+        """Pašalina transakcijas pagal id; grąžina kiek skirtingų id buvo rasta."""
+        return self._journal([t for t in self._sorted_ids(tx_ids) if self._discard(t)])
+
+    def reserve(self, tx_ids: Iterable[str]) -> List[str]:
+        """Kaip remove, bet be žurnalo: grąžina rastus id, kuriuos vėliau reikia commit() arba release()."""
+        reserved = []
+        for t in self._sorted_ids(tx_ids):
+            rows = self._discard(t)
+            if rows:
+                self._reserved.setdefault(t, []).extend(rows)
+                reserved.append(t)
+        return reserved
+
+    def commit(self, tx_ids: Iterable[str]) -> int:
+        """Galutinai pašalina rezervuotas transakcijas (įrašo į žurnalą)."""
+        return self._journal([t for t in self._sorted_ids(tx_ids) if self._reserved.pop(t, None)])
+
+    def release(self, tx_ids: Iterable[str]) -> int:
+        """Grąžina rezervuotas transakcijas į mempool."""
+        released = 0
+        for t in self._sorted_ids(tx_ids):
+            for row, seq in self._reserved.pop(t, []):
+                self._by_id.setdefault(t, []).append(len(self._slots))
+                self._slots.append(row)
+                self._order.append(seq)
+                released += 1
+        return released
+
+    def _journal(self, removed: List[str]) -> int:
+        if not removed:
+            return 0
+        with open(self.journal_path, "a", encoding="utf-8") as jf:
+            jf.write("".join(f"{t}\n" for t in removed))
+            jf.flush()
+            os.fsync(jf.fileno())
+        self._pending += len(removed)
+        if self._pending >= self.compact_every:
+            self.compact()
+        return len(removed)
+
+    def compact(self) -> None:
+        """Perrašo CSV be pašalintų eilučių (išlaikant pradinę tvarką) ir išvalo žurnalą."""
+        path = Path(self.csv_path)
+        tmp_path = path.with_suffix(".tmp")
+        # rezervuotos eilutės dar nepašalintos — CSV jas išlaiko
+        placed = list(zip(self._order, self._slots))
+        placed += [item[::-1] for rows in self._reserved.values() for item in rows]
+        rows = [row for _, row in sorted(placed, key=lambda p: p[0])]
+        with tmp_path.open("w", newline="", encoding="utf-8") as wf:
+            writer = csv.DictWriter(wf, fieldnames=self.fieldnames, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+            wf.flush()
+            os.fsync(wf.fileno())
+        tmp_path.replace(path)
+        # CSV jau be pašalintų eilučių — žurnalas nebereikalingas
+        if os.path.isfile(self.journal_path):
+            os.remove(self.journal_path)
+        if self._pending:
+            print(f"Pašalinta {self._pending} transakcijų iš {self.csv_path}")
+        self._pending = 0
+
+    def close(self) -> None:
+        if self._pending:
+            self.compact()
+
 def apply_transactions_simple(txs: list, balances: Dict[str, float], allow_negative: bool = False):
     """
     Paprasta versija: tiesiog atnaujina balances in-place.
@@ -155,6 +353,89 @@ def save_balances_to_users_txt(path: str, balances: Dict[str, float], meta: Dict
             bal_str = f"{int(bal):,}"
             f.write(f"{name:{name_w}} {pub:{pk_w}} {bal_str:>{bal_w}}\n")
 
+class Ledger:
+    """
+    Balansai laikomi atmintyje visą kasybos laiką: bloko pritaikymas kainuoja O(bloko dydis).
+    Kiekvieno bloko pakeisti balansai (naujos reikšmės) rašomi į žurnalą (<users>.journal),
+    o users.txt perrašomas tik kas snapshot_every blokų ir close() metu.
+    Rezultatas toks pat, kaip kiekvienam blokui darant load -> apply -> save users.txt
+    (pakeisti balansai nukerpami iki sveikųjų, o users.txt nesantys adresai neišsaugomi).
+    """
+
+    def __init__(self, users_path: str, snapshot_every: int = DEFAULT_SNAPSHOT_EVERY, journal_path: Optional[str] = None):
+        self.users_path = users_path
+        self.journal_path = journal_path or f"{users_path}.journal"
+        self.snapshot_every = snapshot_every
+        self.balances, self.meta = load_balances_from_users_txt(users_path, key_by="public_key")
+        self._pending = 0   # kiek blokų žurnale dar neperkelta į users.txt
+        self._replay()
+
+    def _replay(self) -> None:
+        # po nutrūkusio darbo pritaikome žurnalo įrašus; neužbaigta paskutinė eilutė ignoruojama
+        if not os.path.isfile(self.journal_path):
+            return
+        with open(self.journal_path, "r", encoding="utf-8") as jf:
+            for line in jf:
+                if not line.endswith("\n"):
+                    break
+                try:
+                    changes = json.loads(line)
+                except ValueError:
+                    break
+                self._set(changes)
+                self._pending += 1
+
+    def _set(self, changes: Dict[str, Optional[float]]) -> None:
+        for key, value in changes.items():
+            if value is None:
+                self.balances.pop(key, None)
+            else:
+                self.balances[key] = value
+
+    def __len__(self) -> int:
+        return len(self.balances)
+
+    def get(self, key: str, default: float = 0.0) -> float:
+        return self.balances.get(key, default)
+
+    def apply_block(self, txs: list, allow_negative: bool = False) -> Dict[str, Optional[float]]:
+        """Pritaiko bloko transakcijas; grąžina pakeistų adresų naujus balansus (None — pašalintas)."""
+        apply_transactions_simple(txs, self.balances, allow_negative=allow_negative)
+        changes: Dict[str, Optional[float]] = {}
+        for tx in txs:
+            for key in (tx.get("sender") or tx.get("from") or tx.get("addr_from"),
+                        tx.get("receiver") or tx.get("to") or tx.get("addr_to")):
+                if key is None or key in changes or key not in self.balances:
+                    continue
+                if key in self.meta:
+                    changes[key] = float(int(self.balances[key]))
+                else:
+                    changes[key] = None
+        self._set(changes)
+        with open(self.journal_path, "a", encoding="utf-8") as jf:
+            jf.write(json.dumps(changes, ensure_ascii=False) + "\n")
+            jf.flush()
+            os.fsync(jf.fileno())
+        self._pending += 1
+        if self._pending >= self.snapshot_every:
+            self.snapshot()
+        return changes
+
+    def snapshot(self) -> None:
+        """Atomiškai perrašo users.txt dabartiniais balansais ir išvalo žurnalą."""
+        tmp_path = f"{self.users_path}.tmp"
+        save_balances_to_users_txt(tmp_path, self.balances, self.meta)
+        with open(tmp_path, "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.users_path)
+        if os.path.isfile(self.journal_path):
+            os.remove(self.journal_path)
+        self._pending = 0
+
+    def close(self) -> None:
+        if self._pending:
+            self.snapshot()
+
 if __name__ == "__main__":
     import sys
     if len(sys.argv) < 3:
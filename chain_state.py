@@ -0,0 +1,190 @@
+import csv
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Grandinės būsena kaip UTXO indeksas: (transaction_id, tr_index) -> (savininkas, suma).
+# Kiekvienas input'as tikrinamas vienu dict paieškos veiksmu, todėl dvigubas išleidimas
+# aptinkamas per O(1) vienam input'ui. Kiekvienam pritaikytam blokui saugomas undo įrašas.
+DEFAULT_GENESIS_UTXO_PATH = "genesis_utxos.csv"
+
+Outpoint = Tuple[str, int]
+
+# atmetimo priežastys: SPENT/INVALID niekada nebetaps galiojančios, MISSING — gal tėvinė TX dar neiškasta
+REJECT_SPENT = "spent"
+REJECT_MISSING = "missing"
+REJECT_INVALID = "invalid"
+
+
+def parse_inputs(inputs_field: str) -> List[Outpoint]:
+    """'txid:0;txid2:1' -> [('txid', 0), ('txid2', 1)]; netaisyklingas laukas — ValueError."""
+    outpoints = []
+    for part in (inputs_field or "").split(";"):
+        part = part.strip()
+        if not part:
+            continue
+        tx_id, sep, index = part.rpartition(":")
+        if not sep or not tx_id:
+            raise ValueError(f"Netaisyklingas input'as: {part}")
+        outpoints.append((tx_id, int(index)))
+    return outpoints
+
+
+def _tx_id(tx: Dict[str, str]) -> str:
+    return (tx.get("transaction_id") or tx.get("id") or "").strip()
+
+
+class ChainState:
+    """
+    Neišleistų išėjimų indeksas su bloko tikrinimu, pritaikymu ir paskutinio bloko atšaukimu.
+    Transakcijos — transactions_min.csv eilutės: išėjimas 0 — gavėjui amount,
+    išėjimas 1 — grąža siuntėjui (input'ų suma - amount), jei ji > 0.
+    """
+
+    def __init__(self, utxos: Iterable[Tuple[str, int, str, int]] = ()):
+        self._utxos: Dict[Outpoint, Tuple[str, int]] = {}
+        self._spent: Dict[Outpoint, int] = {}    # išleistas išėjimas -> bloko aukštis (dvigubam išleidimui atpažinti)
+        # undo: (iš indekso pašalinti UTXO, pridėti išėjimai, [(išleistas išėjimas, ankstesnis _spent įrašas)])
+        self._undo: List[Tuple[list, List[Outpoint], list]] = []
+        for tx_id, index, owner, amount in utxos:
+            self._utxos[(tx_id, int(index))] = (owner, int(amount))
+
+    @classmethod
+    def from_genesis_csv(cls, path: str = DEFAULT_GENESIS_UTXO_PATH) -> "ChainState":
+        """Užkrauna genesis UTXO (transaction_id,tr_index,owner,amount), išsaugotus transaction_generator.py."""
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = csv.DictReader(f)
+            return cls((r["transaction_id"], r["tr_index"], r["owner"], r["amount"]) for r in rows)
+
+    def __len__(self) -> int:
+        return len(self._utxos)
+
+    def __contains__(self, outpoint: Outpoint) -> bool:
+        return outpoint in self._utxos
+
+    @property
+    def height(self) -> int:
+        """Kiek blokų pritaikyta."""
+        return len(self._undo)
+
+    def get(self, outpoint: Outpoint) -> Optional[Tuple[str, int]]:
+        return self._utxos.get(outpoint)
+
+    def _lookup(self, outpoint: Outpoint, created: Dict[Outpoint, Tuple[str, int]]) -> Optional[Tuple[str, int]]:
+        utxo = self._utxos.get(outpoint)
+        return utxo if utxo is not None else created.get(outpoint)
+
+    def check(self, tx: Dict[str, str], spent: set = frozenset(), created: Optional[Dict[Outpoint, Tuple[str, int]]] = None) -> Tuple[Optional[str], str]:
+        """
+        Patikrina vieną transakciją. spent — šiame bloke jau išleisti išėjimai,
+        created — šiame bloke ankstesnių TX sukurti išėjimai.
+        Grąžina (None, "") jei galioja, kitaip (priežastis, paaiškinimas).
+        """
+        created = created if created is not None else {}
+        tx_id = _tx_id(tx)
+        try:
+            outpoints = parse_inputs(tx.get("inputs", ""))
+            amount = int(tx.get("amount", ""))
+        except ValueError as e:
+            return REJECT_INVALID, f"{tx_id}: {e}"
+        if not tx_id or not outpoints or amount < 1:
+            return REJECT_INVALID, f"{tx_id}: trūksta id, input'ų arba suma neteigiama"
+        if len(set(outpoints)) != len(outpoints):
+            return REJECT_SPENT, f"{tx_id}: tas pats input'as panaudotas du kartus"
+        sender = tx.get("sender", "")
+        total = 0
+        for outpoint in outpoints:
+            utxo = None if outpoint in spent else self._lookup(outpoint, created)
+            if utxo is None:
+                if outpoint in spent or outpoint in self._spent:
+                    return REJECT_SPENT, f"{tx_id}: input'as {outpoint[0]}:{outpoint[1]} jau išleistas"
+                return REJECT_MISSING, f"{tx_id}: input'as {outpoint[0]}:{outpoint[1]} nerastas"
+            if utxo[0] != sender:
+                return REJECT_INVALID, f"{tx_id}: input'as {outpoint[0]}:{outpoint[1]} priklauso ne siuntėjui"
+            total += utxo[1]
+        if total < amount:
+            return REJECT_INVALID, f"{tx_id}: input'ų suma {total} < {amount}"
+        if any(o in self._utxos or o in created for o in ((tx_id, 0), (tx_id, 1))):
+            return REJECT_INVALID, f"{tx_id}: išėjimas su tokiu id jau egzistuoja"
+        return None, ""
+
+    @staticmethod
+    def _outputs(tx: Dict[str, str], total_in: int) -> List[Tuple[Outpoint, Tuple[str, int]]]:
+        tx_id = _tx_id(tx)
+        amount = int(tx["amount"])
+        outputs = [((tx_id, 0), (tx.get("receiver", ""), amount))]
+        if total_in > amount:
+            outputs.append(((tx_id, 1), (tx.get("sender", ""), total_in - amount)))
+        return outputs
+
+    def filter_valid(self, txs: List[Dict[str, str]]) -> Tuple[List[Dict[str, str]], List[Tuple[Dict[str, str], str, str]]]:
+        """
+        Bloko surinkimui: grąžina (galiojančios TX pritaikymo tvarka, [(tx, priežastis, paaiškinimas)]).
+        TX, kuri išleidžia to paties bloko kitos TX išėjimą, perkeliama po jos.
+        """
+        spent: set = set()
+        created: Dict[Outpoint, Tuple[str, int]] = {}
+        valid: List[Dict[str, str]] = []
+        rejected: List[Tuple[Dict[str, str], str, str]] = []
+        pending = list(txs)
+        while True:
+            waiting = []
+            progressed = False
+            for tx in pending:
+                reason, message = self.check(tx, spent, created)
+                if reason is None:
+                    self._stage(tx, spent, created)
+                    valid.append(tx)
+                    progressed = True
+                elif reason == REJECT_MISSING:
+                    waiting.append((tx, reason, message))
+                else:
+                    rejected.append((tx, reason, message))
+            if not progressed or not waiting:
+                return valid, rejected + waiting
+            pending = [tx for tx, _, _ in waiting]
+
+    def _stage(self, tx: Dict[str, str], spent: set, created: Dict[Outpoint, Tuple[str, int]]) -> None:
+        outpoints = parse_inputs(tx.get("inputs", ""))
+        total_in = sum(self._lookup(o, created)[1] for o in outpoints)
+        spent.update(outpoints)
+        created.update(self._outputs(tx, total_in))
+
+    def apply_block(self, txs: List[Dict[str, str]]) -> None:
+        """
+        Patikrina ir pritaiko bloką (TX nurodyta tvarka). Jei bent viena TX negalioja —
+        ValueError, o būsena nepakeičiama.
+        """
+        spent: set = set()
+        created: Dict[Outpoint, Tuple[str, int]] = {}
+        for tx in txs:
+            reason, message = self.check(tx, spent, created)
+            if reason is not None:
+                raise ValueError(f"Blokas negalioja: {message}")
+            self._stage(tx, spent, created)
+        height = len(self._undo)
+        removed = []
+        # išleistas išėjimas gali būti „atgaivintas“ (32 bitų id sutapimas) — atšaukimui saugoma sena reikšmė
+        spent_before = [(o, self._spent.get(o)) for o in spent]
+        for outpoint in spent:
+            utxo = self._utxos.pop(outpoint, None)
+            if utxo is not None:    # to paties bloko sukurti ir išleisti išėjimai indekse nebuvo
+                removed.append((outpoint, utxo))
+            self._spent[outpoint] = height
+        added = [o for o in created if o not in spent]
+        for outpoint in added:
+            self._utxos[outpoint] = created[outpoint]
+        self._undo.append((removed, added, spent_before))
+
+    def rollback_last(self) -> None:
+        """Atšaukia paskutinį pritaikytą bloką."""
+        if not self._undo:
+            raise IndexError("Nėra pritaikytų blokų atšaukimui")
+        removed, added, spent = self._undo.pop()
+        for outpoint in added:
+            del self._utxos[outpoint]
+        for outpoint, before in spent:
+            if before is None:
+                del self._spent[outpoint]
+            else:
+                self._spent[outpoint] = before
+        for outpoint, utxo in removed:
+            self._utxos[outpoint] = utxo
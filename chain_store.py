@@ -0,0 +1,601 @@
+import json
+import mmap
+import os
+import queue
+import struct
+import sys
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from Header import BlockHeader
+
+# Append-only blokų žurnalas: blokai rašomi po vieną JSON eilutę į segmentų failus
+# (blocks_00000.jsonl, blocks_00001.jsonl, ...), o mažas tip.json saugo aukštį ir paskutinį hash.
+# Naujo bloko pridėjimas kainuoja O(1) nepriklausomai nuo grandinės ilgio.
+DEFAULT_STORE_DIR = "chain_store"
+SEGMENT_MAX_BLOCKS = 10_000
+GENESIS_PREV_HASH = "00000000"
+
+TIP_FILE = "tip.json"
+# Indeksai: heights.idx — aukštis -> (segmentas, poslinkis, ilgis), hashes.idx — aukštis -> bloko hash.
+# Abu iš fiksuoto ilgio įrašų, todėl N-tas įrašas randamas be kitų skaitymo.
+HEIGHT_INDEX_FILE = "heights.idx"
+HASH_INDEX_FILE = "hashes.idx"
+HEIGHT_RECORD = struct.Struct("<IQI")
+HASH_FIELD_SIZE = 64  # pakanka ir 256 bitų hash hex formatu
+HASH_RECORD = struct.Struct(f"<{HASH_FIELD_SIZE}s")
+
+# Segmentų formatai: "json" — viena JSON eilutė blokui; "binary" — įrašai su ilgio prefiksu,
+# kuriuose header saugomas BlockHeader.pack() formatu, o serialize laukas atkuriamas skaitant.
+BLOCK_FORMATS = ("json", "binary")
+DEFAULT_BLOCK_FORMAT = "json"
+RECORD_LENGTH = struct.Struct("<I")
+RECORD_JSON = 0     # blokas, kurio negalima tiksliai atkurti iš supakuoto header — saugomas kaip JSON
+RECORD_PACKED = 1
+RECORD_PACKED_EXTRA = 2   # kaip RECORD_PACKED, bet pabaigoje JSON [body, papildomi laukai] (pvz. "schedule")
+_BLOCK_KEYS = ["Block_hash", "header", "body"]
+_HEADER_KEYS = ["prev_hash", "timestamp", "version", "merkle_root", "nonce", "difficulty", "serialize"]
+
+
+def _fsync_dir(path: str) -> None:
+    # katalogo fsync užtikrina, kad os.replace išliktų po avarijos (Windows to nepalaiko)
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _block_hash(block: Dict[str, Any]) -> str:
+    return block.get("Block_hash") or block.get("block_hash") or ""
+
+
+def _compact_json(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _decode_packed(payload: bytes) -> Dict[str, Any]:
+    header = BlockHeader.unpack(payload, 1)
+    pos = 1 + header.packed_size
+    hash_len = payload[pos]
+    block_hash = payload[pos + 1:pos + 1 + hash_len].hex()
+    body = json.loads(payload[pos + 1 + hash_len:])
+    extra = None
+    if payload[0] == RECORD_PACKED_EXTRA:
+        body, extra = body
+    block = {
+        "Block_hash": block_hash,
+        "header": {
+            "prev_hash": header.prev_hash,
+            "timestamp": header.timestamp,
+            "version": header.version,
+            "merkle_root": header.merkle_root,
+            "nonce": header.nonce,
+            "difficulty": header.difficulty,
+            "serialize": f"{header.serialize()} ---> {block_hash}",
+        },
+        "body": body,
+    }
+    if header.target is not None:
+        block["header"]["target"] = header.target
+    if extra:
+        block.update(extra)
+    return block
+
+
+def encode_block_compact(block: Dict[str, Any]) -> bytes:
+    """
+    Kompaktiškas bloko įrašas: supakuotas header + hash baitai + body JSON.
+    Papildomi bloko laukai po body (pvz. planuotojo "schedule") saugomi kartu su body JSON.
+    Jei blokas neatkuriamas tiksliai, grąžinamas JSON įrašas.
+    """
+    try:
+        keys = list(block)
+        if keys[:3] == _BLOCK_KEYS and list(block["header"]) in (_HEADER_KEYS, _HEADER_KEYS + ["target"]):
+            h = block["header"]
+            header = BlockHeader(prev_hash=h["prev_hash"], timestamp=h["timestamp"], version=h["version"],
+                                 merkle_root=h["merkle_root"], nonce=h["nonce"], difficulty=h["difficulty"], target=h.get("target"))
+            hash_raw = bytes.fromhex(block["Block_hash"])
+            extra = {k: block[k] for k in keys[3:]}
+            kind, tail = (RECORD_PACKED_EXTRA, [block["body"], extra]) if extra else (RECORD_PACKED, block["body"])
+            payload = bytes([kind]) + header.pack() + bytes([len(hash_raw)]) + hash_raw + _compact_json(tail)
+            if _compact_json(_decode_packed(payload)) == _compact_json(block):
+                return payload
+    except (ValueError, TypeError, KeyError, struct.error, OverflowError):
+        pass
+    return bytes([RECORD_JSON]) + _compact_json(block)
+
+
+def decode_block_compact(payload: bytes) -> Dict[str, Any]:
+    if payload[0] in (RECORD_PACKED, RECORD_PACKED_EXTRA):
+        return _decode_packed(payload)
+    return json.loads(payload[1:])
+
+
+class ChainStore:
+    """
+    Blokų grandinės saugykla su O(1) pridėjimu.
+    Kiekvienas append įrašo vieną eilutę, padaro flush + fsync ir atomiškai atnaujina tip.json.
+    Jei procesas nutrūksta, atidarant neužbaigta paskutinė eilutė nukerpama.
+    Indeksai leidžia per O(1) paimti bloką pagal aukštį ar hash (get_block, get_block_by_hash).
+    """
+
+    def __init__(self, directory: str = DEFAULT_STORE_DIR, segment_max_blocks: int = SEGMENT_MAX_BLOCKS, fsync: bool = True, block_format: Optional[str] = None):
+        self.directory = directory
+        self.segment_max_blocks = segment_max_blocks
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self._tip = self._load_tip()
+        # formatas fiksuojamas tip.json; block_format taikomas tik tuščiai saugyklai
+        if block_format is not None:
+            if block_format not in BLOCK_FORMATS:
+                raise ValueError(f"Nežinomas blokų formatas: {block_format}")
+            if self._tip["height"] and block_format != self.block_format:
+                raise ValueError(f"Saugykla {directory} jau naudoja formatą {self.block_format}")
+            self._tip["format"] = block_format
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._hash_to_height: Optional[Dict[str, int]] = None
+        self._recover()
+        self._sync_index()
+
+    # --- tip / atkūrimas ---
+
+    @property
+    def block_format(self) -> str:
+        return self._tip.get("format", DEFAULT_BLOCK_FORMAT)
+
+    def _segment_path(self, segment: int) -> str:
+        ext = "bin" if self.block_format == "binary" else "jsonl"
+        return os.path.join(self.directory, f"blocks_{segment:05d}.{ext}")
+
+    def _encode(self, block: Dict[str, Any]) -> bytes:
+        if self.block_format == "binary":
+            payload = encode_block_compact(block)
+            return RECORD_LENGTH.pack(len(payload)) + payload
+        return _compact_json(block) + b"\n"
+
+    def _decode(self, record) -> Dict[str, Any]:
+        if self.block_format == "binary":
+            return decode_block_compact(bytes(record[RECORD_LENGTH.size:]))
+        return json.loads(record)
+
+    def _iter_records(self, f, limit: Optional[int] = None) -> Iterator[bytes]:
+        """Pilni segmento įrašai (su rėmeliu) iki limit baitų; neužbaigtas įrašas nutraukia iteraciją."""
+        read = 0
+        while limit is None or read < limit:
+            if self.block_format == "binary":
+                prefix = f.read(RECORD_LENGTH.size)
+                if len(prefix) < RECORD_LENGTH.size:
+                    return
+                (length,) = RECORD_LENGTH.unpack(prefix)
+                payload = f.read(length)
+                if len(payload) < length:
+                    return
+                record = prefix + payload
+            else:
+                record = f.readline()
+                if not record.endswith(b"\n"):
+                    return
+            read += len(record)
+            yield record
+
+    def _load_tip(self) -> Dict[str, Any]:
+        path = os.path.join(self.directory, TIP_FILE)
+        if os.path.isfile(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except Exception:
+                pass
+        return {"height": 0, "tip_hash": GENESIS_PREV_HASH, "segment": 0, "segment_blocks": 0, "segment_size": 0, "format": DEFAULT_BLOCK_FORMAT}
+
+    def _write_tip(self) -> None:
+        path = os.path.join(self.directory, TIP_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._tip, f)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        if self.fsync:
+            _fsync_dir(self.directory)
+
+    def _recover(self) -> None:
+        """
+        Sutvarko segmentus po nutrūkusio įrašymo: už tip.json užfiksuoto dydžio likę pilni (fsync'inti)
+        blokai priimami, neužbaigtas įrašas nukerpamas. Tai taikoma ir kitam segmentui, jei avarija
+        įvyko pradėjus naują segmentą, bet neatnaujinus tip.json — tik kai tip segmentas pilnas
+        (append naują segmentą pradeda tik tada); kiti segmentai už tip pašalinami.
+        """
+        path = self._segment_path(self._tip["segment"])
+        changed = False
+        if os.path.isfile(path):
+            size = os.path.getsize(path)
+            if size < self._tip["segment_size"]:
+                raise RuntimeError(f"Blokų žurnalas {path} trumpesnis nei nurodyta {TIP_FILE}")
+            changed = self._adopt_records(path, self._tip["segment_size"]) or changed
+        segment = self._tip["segment"] + 1
+        while os.path.isfile(self._segment_path(segment)):
+            path = self._segment_path(segment)
+            if segment == self._tip["segment"] + 1 and self._tip["segment_blocks"] >= self.segment_max_blocks:
+                saved = dict(self._tip)
+                self._tip.update(segment=segment, segment_blocks=0, segment_size=0)
+                if self._adopt_records(path, 0):
+                    changed = True
+                    segment += 1
+                    continue
+                self._tip = saved
+            # segmentas be nė vieno pilno bloko (ar už jo) — nereikalingas
+            os.remove(path)
+            segment += 1
+        if changed:
+            self._write_tip()
+
+    def _adopt_records(self, path: str, known: int) -> bool:
+        """Priima pilnus įrašus nuo poslinkio known ir nukerpa likutį; grąžina, ar tip pasikeitė."""
+        changed = False
+        with open(path, "rb+") as f:
+            f.seek(known)
+            offset = known
+            for raw in self._iter_records(f):
+                try:
+                    block = self._decode(raw)
+                except (ValueError, IndexError, struct.error):
+                    break
+                offset += len(raw)
+                self._tip["height"] += 1
+                self._tip["segment_blocks"] += 1
+                self._tip["tip_hash"] = _block_hash(block) or self._tip["tip_hash"]
+                changed = True
+            f.seek(0, os.SEEK_END)
+            if f.tell() != offset:
+                f.truncate(offset)
+        self._tip["segment_size"] = offset
+        return changed
+
+    def _index_path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _sync_index(self) -> None:
+        """Užtikrina, kad indeksuose būtų lygiai tiek įrašų, kiek blokų (po avarijos — perstato)."""
+        heights_path = self._index_path(HEIGHT_INDEX_FILE)
+        hashes_path = self._index_path(HASH_INDEX_FILE)
+        n_heights = os.path.getsize(heights_path) // HEIGHT_RECORD.size if os.path.isfile(heights_path) else 0
+        n_hashes = os.path.getsize(hashes_path) // HASH_RECORD.size if os.path.isfile(hashes_path) else 0
+        height = self._tip["height"]
+        if n_heights == height and n_hashes == height:
+            return
+        if n_heights >= height and n_hashes >= height:
+            # indeksas įrašytas, bet tip.json — ne: nukerpame perteklių
+            for path, rec in ((heights_path, HEIGHT_RECORD), (hashes_path, HASH_RECORD)):
+                with open(path, "rb+") as f:
+                    f.truncate(height * rec.size)
+            return
+        self.rebuild_index()
+
+    def rebuild_index(self) -> None:
+        """Perstato abu indeksus nuskaitydamas visus segmentus."""
+        self._close_maps()
+        self._hash_to_height = None
+        with open(self._index_path(HEIGHT_INDEX_FILE), "wb") as hf, open(self._index_path(HASH_INDEX_FILE), "wb") as xf:
+            for segment in range(self._tip["segment"] + 1):
+                path = self._segment_path(segment)
+                if not os.path.isfile(path):
+                    continue
+                limit = self._tip["segment_size"] if segment == self._tip["segment"] else None
+                offset = 0
+                with open(path, "rb") as f:
+                    for raw in self._iter_records(f, limit):
+                        hf.write(HEIGHT_RECORD.pack(segment, offset, len(raw)))
+                        xf.write(self._pack_hash(_block_hash(self._decode(raw))))
+                        offset += len(raw)
+            for f in (hf, xf):
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+
+    @staticmethod
+    def _pack_hash(block_hash: str) -> bytes:
+        raw = block_hash.encode("ascii")
+        if len(raw) > HASH_FIELD_SIZE:
+            raise ValueError(f"Bloko hash ilgesnis nei {HASH_FIELD_SIZE} simbolių: {block_hash}")
+        return HASH_RECORD.pack(raw)
+
+    def _close_maps(self) -> None:
+        for mm in self._maps.values():
+            mm.close()
+        self._maps.clear()
+
+    def _map_segment(self, segment: int, end: int) -> mmap.mmap:
+        mm = self._maps.get(segment)
+        if mm is None or len(mm) < end:
+            # aktyvus segmentas auga — perkuriame mmap, jei įrašas už jo ribų
+            if mm is not None:
+                mm.close()
+            with open(self._segment_path(segment), "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment] = mm
+        return mm
+
+    def close(self) -> None:
+        self._close_maps()
+
+    # --- skaitymas ---
+
+    def __len__(self) -> int:
+        return self._tip["height"]
+
+    @property
+    def height(self) -> int:
+        """Blokų skaičius grandinėje."""
+        return self._tip["height"]
+
+    def tip_hash(self) -> str:
+        """Paskutinio bloko hash (arba genesis prev_hash, jei grandinė tuščia)."""
+        return self._tip["tip_hash"]
+
+    def _resolve_height(self, height: int) -> int:
+        if height < 0:
+            height += self._tip["height"]
+        if not 0 <= height < self._tip["height"]:
+            raise IndexError(f"Bloko aukštis {height} už grandinės ribų (0..{self._tip['height'] - 1})")
+        return height
+
+    def get_block(self, height: int) -> Dict[str, Any]:
+        """Grąžina vieną bloką pagal aukštį (-1 — paskutinis), nedekoduojant kitų blokų."""
+        height = self._resolve_height(height)
+        with open(self._index_path(HEIGHT_INDEX_FILE), "rb") as f:
+            f.seek(height * HEIGHT_RECORD.size)
+            segment, offset, length = HEIGHT_RECORD.unpack(f.read(HEIGHT_RECORD.size))
+        mm = self._map_segment(segment, offset + length)
+        return self._decode(mm[offset:offset + length])
+
+    def get_block_hash(self, height: int) -> str:
+        """Bloko hash pagal aukštį, skaitant tik hashes.idx įrašą."""
+        height = self._resolve_height(height)
+        with open(self._index_path(HASH_INDEX_FILE), "rb") as f:
+            f.seek(height * HASH_RECORD.size)
+            return HASH_RECORD.unpack(f.read(HASH_RECORD.size))[0].rstrip(b"\0").decode("ascii")
+
+    def height_of(self, block_hash: str) -> Optional[int]:
+        """Bloko aukštis pagal hash (None, jei nėra). hashes.idx į atmintį įkeliamas vieną kartą."""
+        if self._hash_to_height is None:
+            self._hash_to_height = {}
+            for height, h in enumerate(self.block_hashes()):
+                self._hash_to_height.setdefault(h, height)
+        return self._hash_to_height.get(block_hash)
+
+    def get_block_by_hash(self, block_hash: str) -> Optional[Dict[str, Any]]:
+        height = self.height_of(block_hash)
+        return None if height is None else self.get_block(height)
+
+    def block_hashes(self) -> List[str]:
+        """Visų blokų hash'ai iš eilės (iš indekso, blokų nedekoduojant)."""
+        path = self._index_path(HASH_INDEX_FILE)
+        if not os.path.isfile(path) or self._tip["height"] == 0:
+            return []
+        with open(path, "rb") as f:
+            data = f.read(self._tip["height"] * HASH_RECORD.size)
+        return [rec[0].rstrip(b"\0").decode("ascii") for rec in HASH_RECORD.iter_unpack(data)]
+
+    def iter_blocks(self, start: int = 0) -> Iterator[Dict[str, Any]]:
+        """Srautu grąžina blokus nuo aukščio start iki paskutinio (ankstesni segmentai praleidžiami)."""
+        if start >= self._tip["height"]:
+            return
+        first_segment, first_offset = 0, 0
+        if start > 0:
+            with open(self._index_path(HEIGHT_INDEX_FILE), "rb") as f:
+                f.seek(start * HEIGHT_RECORD.size)
+                first_segment, first_offset, _ = HEIGHT_RECORD.unpack(f.read(HEIGHT_RECORD.size))
+        for segment in range(first_segment, self._tip["segment"] + 1):
+            path = self._segment_path(segment)
+            if not os.path.isfile(path):
+                continue
+            offset = first_offset if segment == first_segment else 0
+            limit = self._tip["segment_size"] - offset if segment == self._tip["segment"] else None
+            with open(path, "rb") as f:
+                f.seek(offset)
+                for raw in self._iter_records(f, limit):
+                    yield self._decode(raw)
+
+    # --- rašymas ---
+
+    def append(self, block: Dict[str, Any]) -> int:
+        """Prideda bloką ir grąžina jo aukštį (0 — pirmas blokas)."""
+        if self._tip["segment_blocks"] >= self.segment_max_blocks:
+            self._tip["segment"] += 1
+            self._tip["segment_blocks"] = 0
+            self._tip["segment_size"] = 0
+        line = self._encode(block)
+        block_hash = _block_hash(block)
+        packed_hash = self._pack_hash(block_hash)
+        offset = self._tip["segment_size"]
+        with open(self._segment_path(self._tip["segment"]), "ab") as f:
+            # failas gali būti ilgesnis nei užfiksuota tip.json (neužbaigtas įrašas) — blokas rašomas ties offset
+            if f.tell() != offset:
+                f.truncate(offset)
+            f.write(line)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        # indeksai rašomi po bloko, tip.json — paskutinis
+        for name, record in ((HEIGHT_INDEX_FILE, HEIGHT_RECORD.pack(self._tip["segment"], offset, len(line))), (HASH_INDEX_FILE, packed_hash)):
+            with open(self._index_path(name), "ab") as f:
+                f.write(record)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+        height = self._tip["height"]
+        if self._hash_to_height is not None:
+            self._hash_to_height.setdefault(block_hash, height)
+        self._tip["height"] += 1
+        self._tip["segment_blocks"] += 1
+        self._tip["segment_size"] += len(line)
+        self._tip["tip_hash"] = block_hash or self._tip["tip_hash"]
+        self._write_tip()
+        return height
+
+    def extend(self, blocks: Iterable[Dict[str, Any]]) -> int:
+        """
+        Prideda daug blokų vienu praėjimu: segmentai rašomi iš eilės, fsync — kartą kiekvienam
+        failui, indeksai ir tip.json įrašomi pabaigoje. Avarijos atveju _recover priima pilnus
+        įrašus kaip ir po append. Grąžina pridėtų blokų skaičių.
+        """
+        index_records = {HEIGHT_INDEX_FILE: bytearray(), HASH_INDEX_FILE: bytearray()}
+        count = 0
+        f = None
+        try:
+            for block in blocks:
+                if self._tip["segment_blocks"] >= self.segment_max_blocks:
+                    if f is not None:
+                        self._close_segment(f)
+                        f = None
+                    self._tip["segment"] += 1
+                    self._tip["segment_blocks"] = 0
+                    self._tip["segment_size"] = 0
+                if f is None:
+                    f = open(self._segment_path(self._tip["segment"]), "ab")
+                    # kaip append: neužbaigtas įrašas už tip.json užfiksuoto dydžio perrašomas
+                    if f.tell() != self._tip["segment_size"]:
+                        f.truncate(self._tip["segment_size"])
+                line = self._encode(block)
+                block_hash = _block_hash(block)
+                f.write(line)
+                index_records[HEIGHT_INDEX_FILE] += HEIGHT_RECORD.pack(self._tip["segment"], self._tip["segment_size"], len(line))
+                index_records[HASH_INDEX_FILE] += self._pack_hash(block_hash)
+                if self._hash_to_height is not None:
+                    self._hash_to_height.setdefault(block_hash, self._tip["height"])
+                self._tip["height"] += 1
+                self._tip["segment_blocks"] += 1
+                self._tip["segment_size"] += len(line)
+                self._tip["tip_hash"] = block_hash or self._tip["tip_hash"]
+                count += 1
+        finally:
+            # jau įrašyti blokai užfiksuojami ir tada, kai iteracija nutrūksta klaida
+            if f is not None:
+                self._close_segment(f)
+            if count:
+                for name, records in index_records.items():
+                    with open(self._index_path(name), "ab") as index_file:
+                        index_file.write(records)
+                        index_file.flush()
+                        if self.fsync:
+                            os.fsync(index_file.fileno())
+                self._write_tip()
+        return count
+
+    def _close_segment(self, f) -> None:
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+        f.close()
+
+    def reset(self, block_format: Optional[str] = None) -> None:
+        """Ištrina visus blokus (naujos grandinės pradžiai); block_format — naujos grandinės formatas."""
+        if block_format is not None and block_format not in BLOCK_FORMATS:
+            raise ValueError(f"Nežinomas blokų formatas: {block_format}")
+        self._close_maps()
+        self._hash_to_height = None
+        block_format = block_format or self.block_format
+        for name in os.listdir(self.directory):
+            if name.startswith("blocks_") or name in (TIP_FILE, HEIGHT_INDEX_FILE, HASH_INDEX_FILE):
+                os.remove(os.path.join(self.directory, name))
+        self._tip = self._load_tip()
+        self._tip["format"] = block_format
+
+    # --- chain.json suderinamumas ---
+
+    def import_chain_json(self, chain_path: str) -> int:
+        """Prideda visus blokus iš seno chain.json (vienu praėjimu, žr. extend); grąžina pridėtų blokų skaičių."""
+        with open(chain_path, "r", encoding="utf-8") as f:
+            chain = json.load(f) or []
+        return self.extend(chain)
+
+    def export_chain_json(self, chain_path: str = "chain.json") -> int:
+        """
+        Įrašo grandinę tokiu pat formatu kaip json.dump(chain, f, ensure_ascii=False, indent=2),
+        bet srautu — nereikia visos grandinės laikyti atmintyje.
+        """
+        count = 0
+        tmp_path = chain_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for block in self.iter_blocks():
+                text = json.dumps(block, ensure_ascii=False, indent=2)
+                f.write("[\n  " if count == 0 else ",\n  ")
+                f.write(text.replace("\n", "\n  "))
+                count += 1
+            f.write("\n]" if count else "[]")
+        os.replace(tmp_path, chain_path)
+        return count
+
+
+class BackgroundWriter:
+    """
+    Blokai į ChainStore rašomi atskiroje gijoje (eilės tvarka), kad kasybos ciklas nelauktų disko.
+    Rašymo klaida iškeliama kitame append() ir close() kvietime.
+    """
+
+    def __init__(self, store: ChainStore, max_pending: int = 64):
+        self.store = store
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(max_pending)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name="chain-store-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            block = self._queue.get()
+            if block is None:
+                return
+            if self._error is None:
+                try:
+                    self.store.append(block)
+                except BaseException as e:
+                    self._error = e
+
+    def _raise_error(self) -> None:
+        # po klaidos tolesni blokai nebeįrašomi (žurnale neturi likti tarpų)
+        if self._error is not None:
+            raise self._error
+
+    def append(self, block: Dict[str, Any]) -> None:
+        self._raise_error()
+        self._queue.put(block)
+
+    def close(self) -> None:
+        """Palaukia, kol visi eilėje esantys blokai įrašyti."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise_error()
+
+    def __enter__(self) -> "BackgroundWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def open_chain_store(directory: str = DEFAULT_STORE_DIR, legacy_chain_path: Optional[str] = "chain.json") -> ChainStore:
+    """Atidaro saugyklą; jei ji tuščia, o senas chain.json yra, blokai perkeliami iš jo."""
+    store = ChainStore(directory)
+    if len(store) == 0 and legacy_chain_path and os.path.isfile(legacy_chain_path):
+        try:
+            store.import_chain_json(legacy_chain_path)
+        except Exception as e:
+            print(f"Įspėjimas: nepavyko perkelti {legacy_chain_path} į {directory}: {e}")
+    return store
+
+
+if __name__ == "__main__":
+    # python chain_store.py [store_dir] [chain.json] — eksportuoja žurnalą į chain.json formatą
+    store_dir = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_STORE_DIR
+    chain_path = sys.argv[2] if len(sys.argv) > 2 else "chain.json"
+    n = ChainStore(store_dir).export_chain_json(chain_path)
+    print(f"Eksportuota {n} blokų į {chain_path}.")
@@ -0,0 +1,198 @@
+import hashlib
+import struct
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+import my_hash_function
+from my_hash_function import hash_generator, hash_int, hash_batch_hex, hash_bytes, hash_bytes_int, hash_nonce_batch, hash_nonce_batch_bytes, HashState
+
+# Hash funkcijų registras. Grandinės hash funkcija užrašoma BlockHeader.version aukštesniuose bituose:
+# version = formatas | (backend id << VERSION_BACKEND_SHIFT). Formatas (žemiausias baitas) — 1 tekstinis,
+# 2 dvejetainis, 3 dvejetainis su target; id 0 — custom32, todėl esamų blokų versijos nepasikeičia.
+VERSION_BACKEND_SHIFT = 8
+VERSION_LAYOUT_MASK = (1 << VERSION_BACKEND_SHIFT) - 1
+DEFAULT_BACKEND = "custom32"
+_NONCE = struct.Struct("<Q")   # kaip Header.HEADER_NONCE
+
+
+class HashBackend:
+    """
+    Bazinė sąsaja (ir custom32 — hash_generator — realizacija). Tekstas hash'inamas kaip simbolių kodai,
+    baitai — po vieną baitą; rezultatas — bits bitų skaičius, hex formatu hex_len simbolių.
+    """
+    name = DEFAULT_BACKEND
+    bits = my_hash_function.HASH_BITS
+    # mažų reikšmių pasiskirstymas netolygus — planuotojas (scheduler.py) nelaiko jų lengvesnėmis nei teoriškai
+    min_work_factor = 1.0
+
+    @property
+    def hex_len(self) -> int:
+        return self.bits // 4
+
+    def format(self, digest: int) -> str:
+        return f"{digest:0{self.hex_len}x}"
+
+    def hash_text(self, tekstas: str) -> str:
+        return hash_generator(tekstas)
+
+    def hash_text_int(self, tekstas: str) -> int:
+        return hash_int(tekstas)
+
+    def hash_texts(self, tekstai: Sequence[str]) -> List[str]:
+        """Daug tekstų vienu kvietimu (custom32 — numpy paketu, jei įdiegtas)."""
+        return hash_batch_hex(tekstai)
+
+    def hash_bytes(self, data: bytes) -> str:
+        return hash_bytes(data)
+
+    def hash_bytes_int(self, data: bytes) -> int:
+        return hash_bytes_int(data)
+
+    def text_state(self, prefix: str):
+        """Būsena po prefix: .digest_with(pabaiga) -> int (midstate kasybai)."""
+        return HashState().update(prefix)
+
+    def bytes_state(self, prefix: bytes):
+        """Būsena po prefix baitų: .digest_with_bytes(pabaiga) -> int."""
+        return HashState().update_bytes(prefix)
+
+    @property
+    def supports_batch(self) -> bool:
+        """Ar galimas numpy paketinis nonce hash'inimas (kasybos "batch" režimas)."""
+        return my_hash_function.np is not None
+
+    def nonce_batch(self, state, nonces, tail: str = ""):
+        return hash_nonce_batch(state, nonces, tail)
+
+    def nonce_batch_bytes(self, state, nonces):
+        return hash_nonce_batch_bytes(state, nonces)
+
+
+class _HashlibState:
+    __slots__ = ("_h",)
+
+    def __init__(self, h):
+        self._h = h
+
+    def digest_with(self, suffix: str) -> int:
+        h = self._h.copy()
+        h.update(suffix.encode("utf-8"))
+        return int.from_bytes(h.digest(), "big")
+
+    def digest_with_bytes(self, suffix: bytes) -> int:
+        h = self._h.copy()
+        h.update(suffix)
+        return int.from_bytes(h.digest(), "big")
+
+
+class HashlibBackend(HashBackend):
+    """
+    hashlib (C realizacija) funkcija; tekstas koduojamas UTF-8. Greito paketinio režimo nėra:
+    nonce_batch* hash'ina po vieną nonce ir grąžina int sąrašą.
+    """
+
+    min_work_factor = 0.0
+
+    def __init__(self, name: str, factory: Callable[..., "hashlib._Hash"], bits: int):
+        self.name = name
+        self.bits = bits
+        self._new = factory
+
+    def hash_text(self, tekstas: str) -> str:
+        return self._new(tekstas.encode("utf-8")).hexdigest()
+
+    def hash_text_int(self, tekstas: str) -> int:
+        return int.from_bytes(self._new(tekstas.encode("utf-8")).digest(), "big")
+
+    def hash_texts(self, tekstai: Sequence[str]) -> List[str]:
+        new = self._new
+        return [new(t.encode("utf-8")).hexdigest() for t in tekstai]
+
+    def hash_bytes(self, data: bytes) -> str:
+        return self._new(bytes(data)).hexdigest()
+
+    def hash_bytes_int(self, data: bytes) -> int:
+        return int.from_bytes(self._new(bytes(data)).digest(), "big")
+
+    def text_state(self, prefix: str) -> _HashlibState:
+        return _HashlibState(self._new(prefix.encode("utf-8")))
+
+    def bytes_state(self, prefix: bytes) -> _HashlibState:
+        return _HashlibState(self._new(bytes(prefix)))
+
+    @property
+    def supports_batch(self) -> bool:
+        return False
+
+    def nonce_batch(self, state, nonces, tail: str = "") -> List[int]:
+        finish = state.digest_with
+        return [finish(f"{int(nonce)}{tail}") for nonce in nonces]
+
+    def nonce_batch_bytes(self, state, nonces) -> List[int]:
+        finish = state.digest_with_bytes
+        pack = _NONCE.pack
+        return [finish(pack(int(nonce))) for nonce in nonces]
+
+
+BACKENDS: Dict[str, HashBackend] = {}
+_BY_ID: Dict[int, HashBackend] = {}
+_IDS: Dict[str, int] = {}
+
+
+def register_backend(backend: HashBackend, backend_id: int) -> HashBackend:
+    """Užregistruoja backend'ą; backend_id įrašomas į header versiją, todėl jo keisti negalima."""
+    if not 0 <= backend_id < 256:
+        raise ValueError("backend_id turi būti 0..255")
+    if backend_id in _BY_ID and _BY_ID[backend_id].name != backend.name:
+        raise ValueError(f"backend_id {backend_id} jau užimtas ({_BY_ID[backend_id].name})")
+    BACKENDS[backend.name] = backend
+    _BY_ID[backend_id] = backend
+    _IDS[backend.name] = backend_id
+    return backend
+
+
+register_backend(HashBackend(), 0)
+register_backend(HashlibBackend("sha256", hashlib.sha256, 256), 1)
+register_backend(HashlibBackend("blake2b-256", lambda data=b"": hashlib.blake2b(data, digest_size=32), 256), 2)
+
+
+def get_backend(backend: Union[str, HashBackend, None] = None) -> HashBackend:
+    """Backend'as pagal pavadinimą (None — DEFAULT_BACKEND); HashBackend grąžinamas toks pat."""
+    if isinstance(backend, HashBackend):
+        return backend
+    name = backend or DEFAULT_BACKEND
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Nežinomas hash backend'as: {name} (galimi: {', '.join(BACKENDS)})") from None
+
+
+def backend_id(backend: Union[str, HashBackend, None] = None) -> int:
+    return _IDS[get_backend(backend).name]
+
+
+def version_layout(version: int) -> int:
+    """Header formatas (1, 2, 3) be backend bitų."""
+    return version & VERSION_LAYOUT_MASK
+
+
+def backend_for_version(version: int) -> HashBackend:
+    bid = version >> VERSION_BACKEND_SHIFT
+    try:
+        return _BY_ID[bid]
+    except KeyError:
+        raise ValueError(f"Header versijoje {version} nežinomas hash backend'as (id {bid})") from None
+
+
+def make_version(layout: int, backend: Union[str, HashBackend, None] = None) -> int:
+    """Header versija formatui layout ir backend'ui (custom32 — tiesiog layout)."""
+    return version_layout(layout) | (backend_id(backend) << VERSION_BACKEND_SHIFT)
+
+
+def hex_lengths() -> List[int]:
+    """Visų užregistruotų backend'ų hex hash ilgiai (pvz. vieši raktai users.txt faile)."""
+    return sorted({b.hex_len for b in BACKENDS.values()})
+
+
+def backend_from_argv(argv) -> Optional[str]:
+    """--hash=sha256 -> "sha256"; jei nenurodyta — None."""
+    return next((a.split("=", 1)[1] for a in argv if a.startswith("--hash=")), None)
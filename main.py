@@ -3,15 +3,24 @@ import json
 import os
 import re
 import csv
+import time
+from multiprocessing import Pool
 
 from Body import BlockBody
-from Header import BlockHeader
-from merkel_root2 import build_block_body
-from block_body import pick_random_transactions, remove_transactions_from_csv
+from Header import BlockHeader, BINARY_HEADER_VERSION, TARGET_HEADER_VERSION, target_from_difficulty
+from merkel_root2 import build_block_body, compute_merkle_root_from_tx_list, DEFAULT_N as DEFAULT_BLOCK_TXS, DEFAULT_SEED
+from block_body import remove_transactions_from_csv, Mempool, Ledger
+from chain_store import ChainStore, BackgroundWriter, DEFAULT_STORE_DIR, open_chain_store
+from chain_state import ChainState, DEFAULT_GENESIS_UTXO_PATH, REJECT_MISSING
+from metrics import NULL_METRICS, metrics_from_argv
+from hash_backends import backend_for_version, backend_from_argv, make_version, get_backend
+from scheduler import BlockScheduler, SCHEDULE_KEY, DEFAULT_RETARGET_EVERY
 
 # Statinis pasirinkimas: keiskite čia į True arba False
 DEFAULT_USE_TREE: bool = False
 DEFAULT_MINE: bool = True
+# True — bloke saugomi visi Merkle lygiai (merkle_tree_levels); False — tik lapai (įrodymams pakanka)
+DEFAULT_STORE_LEVELS: bool = False
 
 def _format_levels_as_json(levels):
     """
@@ -23,27 +32,133 @@ def _format_levels_as_json(levels):
         for idx, lvl in enumerate(levels)
     ]
 
-def build_genesis_block_from_csv(csv_path: str, prev_hash: str = "00000000", use_tree: bool = DEFAULT_USE_TREE, mine: bool = DEFAULT_MINE, difficulty: int = 3, max_nonce: int = 10_000_000, users_path: str = None):
-    txs = None
-    levels = None
+def _header_version(binary: bool, target: int = None, hash_backend: str = None) -> int:
+    """
+    Header versija: 1 — tekstinis; dvejetainis — BINARY_HEADER_VERSION arba, su target, TARGET_HEADER_VERSION.
+    hash_backend (hash_backends pavadinimas) įrašomas į aukštesnius versijos bitus.
+    """
+    if not binary:
+        layout = 1
+    else:
+        layout = TARGET_HEADER_VERSION if target is not None else BINARY_HEADER_VERSION
+    return make_version(layout, hash_backend)
+
+def _assemble_block(header: BlockHeader, found_hash: str, merkle_root: str, txs, levels, store_levels: bool = DEFAULT_STORE_LEVELS):
+    """Bloko žodynas iš iškasto header; levels (jei ne None) — lapai arba visi Merkle lygiai."""
+    serialize = header.serialize()
 
+    # Pagrindinis blokas
+    block = {
+        "Block_hash": found_hash,
+        "header": {
+            "prev_hash": header.prev_hash,
+            "timestamp": header.timestamp,
+            "version": header.version,
+            "merkle_root": header.merkle_root,
+            "nonce": header.nonce,
+            "difficulty": header.difficulty,
+            "serialize": f'{serialize} ---> {found_hash}'
+        },
+        "body": {
+            "merkle_root": merkle_root
+        }
+    }
+    if header.target is not None:
+        block["header"]["target"] = header.target
+
+    # Jei pasirenkame tree, pridedame lapus (arba visus lygius) JSON formatu
+    if levels is not None:
+        block["body"]["transaction_ids"] = [(tx.get("transaction_id") or tx.get("id") or "") for tx in txs]
+        if store_levels:
+            block["body"]["merkle_tree_levels"] = _format_levels_as_json(levels)
+        else:
+            block["body"]["merkle_leaves"] = levels[0][:]
+    return block
+
+def _nonce_limit(max_nonce: int, scheduler: BlockScheduler = None) -> int:
+    # su planuotoju target gali būti sunkesnis nei max_nonce leidžia — riba ne mažesnė nei scheduler.nonce_budget()
+    if scheduler is None:
+        return max_nonce
+    return max(max_nonce, scheduler.nonce_budget())
+
+def _select_valid_transactions(mempool: Mempool, chain_state: ChainState, n: int, seed: int, drop=None):
+    """
+    Atsitiktinės mempool transakcijos, atrinktos pagal UTXO būseną. Niekada nebegaliosiančios
+    (dvigubas išleidimas, netaisyklingos) pašalinamos iš mempool (drop, numatyta mempool.remove).
+    Jei atsitiktinėje imtyje galiojančių nėra, mempool peržiūrimas pradine tvarka.
+    """
+    txs, rejected = chain_state.filter_valid(mempool.sample(n, seed=seed))
+    if not txs:
+        txs, rejected = chain_state.filter_valid(mempool.rows_in_order())
+        txs = txs[:n]
+    dead = {(tx.get("transaction_id") or tx.get("id") or "") for tx, reason, _ in rejected if reason != REJECT_MISSING}
+    if dead:
+        print(f"Atmesta {len(dead)} negaliojančių transakcijų (pvz. {rejected[0][2]})")
+        (drop or mempool.remove)(dead)
+    if not txs:
+        raise RuntimeError("Mempool nėra galiojančių transakcijų (visų input'ai nerasti UTXO būsenoje)")
+    return txs
+
+def _body_from_mempool(mempool: Mempool, chain_state: ChainState = None, use_tree: bool = DEFAULT_USE_TREE, metrics=NULL_METRICS, backend=None, drop=None):
+    """Bloko transakcijos iš mempool ir jų Merkle root: (txs, merkle_root, lygiai arba None)."""
+    with metrics.stage("sample"):
+        if chain_state is not None:
+            txs = _select_valid_transactions(mempool, chain_state, DEFAULT_BLOCK_TXS, DEFAULT_SEED, drop)
+        else:
+            txs = mempool.sample(DEFAULT_BLOCK_TXS, seed=DEFAULT_SEED)
+    with metrics.stage("merkle"):
+        result = compute_merkle_root_from_tx_list(txs, show_tree=use_tree, backend=backend)
     if use_tree:
-        block_body = build_block_body(csv_path, show_tree=True)
+        return txs, result[0], result[1]
+    return txs, result, None
+
+def build_genesis_block_from_csv(csv_path: str, prev_hash: str = "00000000", use_tree: bool = DEFAULT_USE_TREE, mine: bool = DEFAULT_MINE, difficulty: int = 3, max_nonce: int = 10_000_000, users_path: str = None, mempool: Mempool = None, store_levels: bool = DEFAULT_STORE_LEVELS, version: int = 1, ledger: Ledger = None, chain_state: ChainState = None, metrics=NULL_METRICS, target: int = None, scheduler: BlockScheduler = None):
+    """
+    Sukuria (ir, jei mine=True, iškasa) vieną bloką.
+    Jei pateiktas mempool, transakcijos imamos ir šalinamos iš jo (CSV neskaitomas kiekvienam blokui).
+    Su use_tree bloke saugomi lapų hash'ai ir transaction_ids (merkel_root2.proof_from_block),
+    o pilni lygiai — tik jei store_levels=True.
+    Jei pateiktas ledger, balansai atnaujinami jame (users.txt neperskaitomas kiekvienam blokui).
+    Jei pateiktas chain_state (kartu su mempool), į bloką dedamos tik UTXO patikrą praėjusios transakcijos,
+    o iškastas blokas pritaikomas būsenai.
+    metrics — etapų laikmačiai (metrics.Metrics); pagal nutylėjimą išjungti.
+    target — skaitinis PoW tikslas (hash < target) vietoj difficulty nulių prefikso.
+    Hash funkcija (header'iui ir Merkle medžiui) parenkama pagal version (hash_backends).
+    Jei pateiktas scheduler (scheduler.BlockScheduler), target imamas iš jo, o jo sprendimai
+    įrašomi bloke po SCHEDULE_KEY.
+    """
+    txs = None
+    levels = None
+    backend = backend_for_version(version)
+    if scheduler is not None:
+        target = scheduler.target
+        max_nonce = _nonce_limit(max_nonce, scheduler)
+
+    if mempool is not None:
+        txs, merkle_root, levels = _body_from_mempool(mempool, chain_state, use_tree, metrics, backend)
+    elif use_tree:
+        with metrics.stage("body"):
+            block_body = build_block_body(csv_path, show_tree=True, backend=backend)
         merkle_root = block_body.get("merkle_root")
         txs = block_body.get("transactions", [])
         levels = block_body.get("levels", None)
     else:
-        body = BlockBody.from_csv(csv_path)
+        with metrics.stage("body"):
+            body = BlockBody.from_csv(csv_path, backend=backend.name)
         merkle_root = body.merkle_root
 
     # Sukuriame header
     # sukonstruojame header su pageidaujamu difficulty (naudojama kasybai, jei mine=True)
-    header = BlockHeader.create_with_current_time(prev_hash=prev_hash, merkle_root=merkle_root, difficulty=difficulty)
+    header = BlockHeader.create_with_current_time(prev_hash=prev_hash, merkle_root=merkle_root, version=version, difficulty=difficulty, target=target)
 
     # Mine pakeis header.nonce.
     try:
         if mine:
-            found_hash = header.mine(max_nonce=max_nonce)
+            mine_start = time.perf_counter()
+            with metrics.stage("mine"):
+                found_hash = header.mine(max_nonce=max_nonce)
+            mine_seconds = time.perf_counter() - mine_start
+            metrics.inc("hashes", header.nonce + 1)
         else:
             found_hash = header.hash()
     except RuntimeError as e:
@@ -51,64 +166,59 @@ def build_genesis_block_from_csv(csv_path: str, prev_hash: str = "00000000", use
         sys.exit(1)
 
     # Patikriname rastą hash 
-    if mine and not BlockHeader.validate_hash(found_hash, header.difficulty):
+    if mine and not BlockHeader.validate_hash(found_hash, header.difficulty, header.target):
         print("Kasyba nebuvo sėkminga: rastas hash neatitinka difficulty reikalavimo.")
         sys.exit(1)
 
-    serialize = f"{header.prev_hash}|{header.timestamp}|{header.version}|{header.merkle_root}|{header.nonce}|{header.difficulty}"
-
-    # Pagrindinis blokas
-    block = {
-        "Block_hash": found_hash,
-        "header": {
-            "prev_hash": header.prev_hash,
-            "timestamp": header.timestamp,
-            "version": header.version,
-            "merkle_root": header.merkle_root,
-            "nonce": header.nonce,
-            "difficulty": header.difficulty,
-            "serialize": f'{serialize} ---> {found_hash}'
-        },
-        "body": {
-            "merkle_root": merkle_root
-        }
-    }
+    block = _assemble_block(header, found_hash, merkle_root, txs, levels if use_tree else None, store_levels)
+    if scheduler is not None and mine:
+        block[SCHEDULE_KEY] = scheduler.record_block(header.nonce + 1, mine_seconds)
 
-    # Jei pasirenkame tree, pridedame jį JSON formatu
-    if use_tree and levels is not None:
-        block["body"]["merkle_tree_levels"] = _format_levels_as_json(levels)
+    if chain_state is not None and mempool is not None:
+        with metrics.stage("utxo"):
+            chain_state.apply_block(txs)
+    metrics.inc("transactions", len(txs or ()))
 
     # Pašaliname į bloką įtrauktas transakcijas iš CSV 
-    if txs:
-        tx_ids_in_block = set()
-        for tx in txs:
-            if not tx:
-                continue
-            if isinstance(tx, dict):
-                tid = tx.get("transaction_id") or tx.get("id")
-            elif isinstance(tx, str):
-                tid = tx
-            else:
-                tid = getattr(tx, "transaction_id", None)
-            if tid:
-                tx_ids_in_block.add(tid)
-
-        if tx_ids_in_block and os.path.isfile(csv_path):
+    with metrics.stage("remove"):
+        if txs:
+            tx_ids_in_block = set()
+            for tx in txs:
+                if not tx:
+                    continue
+                if isinstance(tx, dict):
+                    tid = tx.get("transaction_id") or tx.get("id")
+                elif isinstance(tx, str):
+                    tid = tx
+                else:
+                    tid = getattr(tx, "transaction_id", None)
+                if tid:
+                    tx_ids_in_block.add(tid)
+
+            if tx_ids_in_block and mempool is not None:
+                mempool.remove(tx_ids_in_block)
+            elif tx_ids_in_block and os.path.isfile(csv_path):
+                try:
+                    remove_transactions_from_csv(csv_path, tx_ids_in_block)
+                except Exception as e:
+                    print(f"Įspėjimas: nepavyko pašalinti transakcijų iš CSV: {e}")
+
+    with metrics.stage("balances"):
+        if ledger is not None and txs:
             try:
-                remove_transactions_from_csv(csv_path, tx_ids_in_block)
+                ledger.apply_block(txs, allow_negative=False)
             except Exception as e:
-                print(f"Įspėjimas: nepavyko pašalinti transakcijų iš CSV: {e}")
-
-    # Naujas: atnaujinti users.txt jei pateiktas kelias
-    if users_path and txs:
-        try:
-            from block_body import load_balances_from_users_txt, apply_transactions_simple, save_balances_to_users_txt
-            balances, meta = load_balances_from_users_txt(users_path, key_by="public_key")
-            # txs turi turėti laukus 'sender','receiver','amount' (atitinka transactions_min.csv)
-            apply_transactions_simple(txs, balances, allow_negative=False)
-            save_balances_to_users_txt(users_path, balances, meta)
-        except Exception as e:
-            print(f"Įspėjimas: nepavyko atnaujinti users.txt: {e}")
+                print(f"Įspėjimas: nepavyko atnaujinti balansų: {e}")
+        # Naujas: atnaujinti users.txt jei pateiktas kelias
+        elif users_path and txs:
+            try:
+                from block_body import load_balances_from_users_txt, apply_transactions_simple, save_balances_to_users_txt
+                balances, meta = load_balances_from_users_txt(users_path, key_by="public_key")
+                # txs turi turėti laukus 'sender','receiver','amount' (atitinka transactions_min.csv)
+                apply_transactions_simple(txs, balances, allow_negative=False)
+                save_balances_to_users_txt(users_path, balances, meta)
+            except Exception as e:
+                print(f"Įspėjimas: nepavyko atnaujinti users.txt: {e}")
 
     return block
 
@@ -125,36 +235,174 @@ def _count_transactions_in_csv(csv_path: str) -> int:
         # count non-empty rows
         return sum(1 for row in reader if row and any(cell.strip() for cell in row))
 
-# Pridėta: įrašyti vienos eilutės hash grandinę į failą
-def _write_hashes_line_from_chainfile(chain_path="chain.json", line_path="hashes_line.txt"):
+def _write_hashes_line_from_store(store: ChainStore, line_path="hashes_line.txt"):
+    """Įrašo vienos eilutės hash grandinę; hash'us ima iš žurnalo indekso (blokų nedekoduojant)."""
     try:
-        chain = []
-        if os.path.isfile(chain_path):
-            with open(chain_path, "r", encoding="utf-8") as f:
-                chain = json.load(f) or []
-        parts = ["00000000"]
-        for b in chain:
-            h = b.get("Block_hash") or b.get("block_hash") or ""
-            if h:
-                parts.append(h)
-        line = " <--- ".join(parts)
+        parts = ["00000000"] + [h for h in store.block_hashes() if h]
         with open(line_path, "w", encoding="utf-8") as f:
-            f.write(line)
+            f.write(" <--- ".join(parts))
     except Exception as e:
         print(f"Įspėjimas: nepavyko įrašyti vienos eilutės hash failo: {e}")
 
-def mine_chain_from_csv(csv_path: str, users_path: str = "users.txt", use_tree: bool = True, difficulty: int = 3, max_nonce: int = 10_000_000, block_limit: int = None, output_path: str = "chain.json", print_to_console: bool = False, print_each_block: bool = False):
+def _mine_header(header: BlockHeader, max_nonce: int):
+    """Kasybos proceso darbas: grąžina (nonce, hash, kasybos trukmė sekundėmis)."""
+    start = time.perf_counter()
+    found_hash = header.mine(max_nonce=max_nonce)
+    return header.nonce, found_hash, time.perf_counter() - start
+
+def _prepare_block_body(mempool: Mempool, chain_state: ChainState = None, use_tree: bool = DEFAULT_USE_TREE, metrics=NULL_METRICS, backend=None, reserved: list = None):
+    """
+    Kito bloko turinys pipeline režimui: (txs, merkle_root, lygiai, rezervuoti id). UTXO būsena ir
+    mempool atnaujinami iš karto (ta pačia tvarka kaip build_genesis_block_from_csv), kad kitas blokas
+    galėtų būti ruošiamas dar neiškasus šio. Transakcijos mempool tik rezervuojamos (Mempool.reserve):
+    iškasus — commit, nepavykus — release ir chain_state.rollback_last. Jei pateiktas reserved sąrašas,
+    id kaupiami jame (ir kai paruošti nepavyksta, pvz. atmestos transakcijos jau rezervuotos).
+    """
+    reserved = [] if reserved is None else reserved
+
+    def _drop(tx_ids):
+        reserved.extend(mempool.reserve(tx_ids))
+
+    txs, merkle_root, levels = _body_from_mempool(mempool, chain_state, use_tree, metrics, backend, _drop)
+    if chain_state is not None:
+        with metrics.stage("utxo"):
+            chain_state.apply_block(txs)
+    with metrics.stage("remove"):
+        _drop(tx.get("transaction_id") or tx.get("id") for tx in txs)
+    return txs, merkle_root, levels, reserved
+
+def _mine_blocks_pipelined(chain: list, store: ChainStore, mempool: Mempool, ledger: Ledger = None, chain_state: ChainState = None, use_tree: bool = True, difficulty: int = 3, max_nonce: int = 10_000_000, block_limit: int = None, store_levels: bool = DEFAULT_STORE_LEVELS, version: int = 1, print_each_block: bool = False, metrics=NULL_METRICS, target: int = None, scheduler: BlockScheduler = None):
+    """
+    Blokų gamyba trimis lygiagrečiais etapais: header kasamas atskirame procese, tuo metu šiame
+    procese iš mempool ruošiamas kito bloko turinys ir Merkle root, o iškasti blokai į store
+    rašomi fono gijoje (BackgroundWriter). Header priklauso tik nuo ankstesnio hash, todėl
+    transakcijų parinkimas, UTXO būsena ir balansai sutampa su nuosekliu režimu.
+    Jei kasyba nepavyksta, neiškastų blokų transakcijos grąžinamos į mempool, o UTXO būsena atšaukiama.
+    scheduler — kaip build_genesis_block_from_csv (target kitam header nustatomas iškasus ankstesnį).
+    """
+    prev_hash = "00000000"
+    idx = 0
+    prepare_error = None
+    stray = []      # nepavykusio paruošimo rezervuoti id (atmestos TX) — likimas kaip ankstesnio bloko
+    backend = backend_for_version(version)
+
+    def _prepare_next(height: int):
+        nonlocal prepare_error
+        if len(mempool) == 0 or (block_limit is not None and height >= block_limit):
+            return None
+        reserved = []
+        try:
+            return _prepare_block_body(mempool, chain_state, use_tree, metrics, backend, reserved)
+        except Exception as e:
+            prepare_error = (height, e)
+            stray.extend(reserved)
+            return None
+
+    def _undo(body):
+        # atvirkštine tvarka: paskutinis pritaikytas blokas atšaukiamas pirmas
+        if body is None:
+            return
+        if chain_state is not None:
+            chain_state.rollback_last()
+        mempool.release(body[3])
+
+    prepared = _prepare_next(0)
+    with Pool(1) as pool, BackgroundWriter(store) as writer:
+        while prepared is not None:
+            current = prepared
+            txs, merkle_root, levels, reserved = current
+            if scheduler is not None:
+                target = scheduler.target
+            header = BlockHeader.create_with_current_time(prev_hash=prev_hash, merkle_root=merkle_root, version=version, difficulty=difficulty, target=target)
+            print(f"Kasant bloką #{idx} (transakcijų bloke: {len(txs)}, liko: {len(mempool)})...")
+            pending = pool.apply_async(_mine_header, (header, _nonce_limit(max_nonce, scheduler)))
+            # kol kasama — ruošiamas kitas blokas
+            prepared = _prepare_next(idx + 1)
+            try:
+                with metrics.stage("mine_wait"):
+                    header.nonce, found_hash, seconds = pending.get()
+            except Exception as e:
+                print(f"Klaida kasant bloką #{idx}: {e}")
+                _undo(prepared)
+                _undo(current)
+                mempool.release(stray)
+                return
+            mempool.commit(reserved)
+            mempool.commit(stray)
+            metrics.observe("mine", seconds)
+            metrics.inc("hashes", header.nonce + 1)
+            metrics.inc("transactions", len(txs))
+
+            block = _assemble_block(header, found_hash, merkle_root, txs, levels if use_tree else None, store_levels)
+            if scheduler is not None:
+                block[SCHEDULE_KEY] = scheduler.record_block(header.nonce + 1, seconds)
+            with metrics.stage("balances"):
+                if ledger is not None and txs:
+                    try:
+                        ledger.apply_block(txs, allow_negative=False)
+                    except Exception as e:
+                        print(f"Įspėjimas: nepavyko atnaujinti balansų: {e}")
+
+            chain.append(block)
+            with metrics.stage("chain_write"):
+                writer.append(block)
+            metrics.end_block(height=idx, hash=found_hash, nonce=header.nonce)
+            if print_each_block:
+                try:
+                    print(json.dumps(block, ensure_ascii=False, indent=2))
+                except Exception:
+                    pass
+
+            prev_hash = found_hash
+            idx += 1
+    # paruošti nepavyko dar nekasant (pvz. pirmo bloko) — atmestos TX pašalinamos kaip nuosekliame režime
+    mempool.commit(stray)
+
+    if prepare_error is not None:
+        print(f"Klaida kasant bloką #{prepare_error[0]}: {prepare_error[1]}")
+    elif len(mempool) == 0:
+        print("Nėra daugiau transakcijų CSV faile. Baigiama kasyba.")
+    else:
+        print(f"Pasiektas block limit: {block_limit}. Sustojama.")
+
+def mine_chain_from_csv(csv_path: str, users_path: str = "users.txt", use_tree: bool = True, difficulty: int = 3, max_nonce: int = 10_000_000, block_limit: int = None, output_path: str = "chain.json", print_to_console: bool = False, print_each_block: bool = False, store_dir: str = DEFAULT_STORE_DIR, store_levels: bool = DEFAULT_STORE_LEVELS, binary: bool = False, genesis_utxos_path: str = DEFAULT_GENESIS_UTXO_PATH, metrics=NULL_METRICS, pipelined: bool = False, target: int = None, hash_backend: str = None, block_time: float = None, retarget_every: int = DEFAULT_RETARGET_EVERY):
     """
     Kasa blokus iteratyviai tol kol CSV tuščias.
     Grąžina list'ą blokų ir išsaugo į output_path.
+    Kiekvienas iškastas blokas iš karto pridedamas į append-only žurnalą store_dir
+    (nauja grandinė — žurnalas išvalomas pradžioje), o output_path eksportuojamas pabaigoje.
     Jei print_to_console True, taip pat išveda rezultatus į konsolę.
+    binary=True — dvejetainiai header'iai (BINARY_HEADER_VERSION) ir kompaktiškas žurnalo formatas.
+    Jei yra genesis_utxos_path (transaction_generator.py jį sukuria), transakcijų input'ai
+    tikrinami pagal UTXO būseną (chain_state.ChainState).
+    metrics — etapų laikai ir kiekvieno bloko santrauka (metrics.Metrics.end_block).
+    pipelined=True — kol blokas kasamas atskirame procese, ruošiamas kitas, o blokai į žurnalą
+    rašomi fone (_mine_blocks_pipelined); grandinės transakcijos ir balansai tokie patys.
+    target — skaitinis PoW tikslas (žr. BlockHeader.target); su binary — TARGET_HEADER_VERSION header'iai.
+    hash_backend — grandinės hash funkcija (hash_backends: "custom32", "sha256", "blake2b-256").
+    block_time — norimas bloko laikas sekundėmis: target perskaičiuojamas kas retarget_every blokų
+    pagal išmatuotą hash greitį (scheduler.BlockScheduler), pradinis — target arba iš difficulty.
     """
     chain = []
     prev_hash = "00000000"
     idx = 0
-
-    while True:
-        remaining = _count_transactions_in_csv(csv_path)
+    store = ChainStore(store_dir)
+    store.reset(block_format="binary" if binary else "json")
+    # CSV nuskaitomas vieną kartą; pašalinimai kaupiami žurnale ir CSV perrašomas retkarčiais
+    mempool = Mempool(csv_path) if os.path.isfile(csv_path) else None
+    # balansai laikomi atmintyje, users.txt perrašomas retkarčiais ir pabaigoje
+    ledger = Ledger(users_path) if users_path and os.path.isfile(users_path) else None
+    chain_state = ChainState.from_genesis_csv(genesis_utxos_path) if genesis_utxos_path and os.path.isfile(genesis_utxos_path) else None
+    scheduler = None
+    if block_time is not None:
+        backend = get_backend(hash_backend)
+        start_target = target if target is not None else target_from_difficulty(difficulty, backend.bits)
+        scheduler = BlockScheduler.for_backend(backend, block_time, start_target, retarget_every, max_tries=max_nonce)
+        target = scheduler.target
+
+    while not pipelined:
+        with metrics.stage("count"):
+            remaining = len(mempool) if mempool is not None else 0
         if remaining == 0:
             print("Nėra daugiau transakcijų CSV faile. Baigiama kasyba.")
             break
@@ -164,12 +412,15 @@ def mine_chain_from_csv(csv_path: str, users_path: str = "users.txt", use_tree:
 
         print(f"Kasant bloką #{idx} (liko transakcijų: {remaining})...")
         try:
-            block = build_genesis_block_from_csv(csv_path, prev_hash=prev_hash, use_tree=use_tree, mine=True, difficulty=difficulty, max_nonce=max_nonce, users_path=users_path)
+            block = build_genesis_block_from_csv(csv_path, prev_hash=prev_hash, use_tree=use_tree, mine=True, difficulty=difficulty, max_nonce=max_nonce, users_path=users_path, mempool=mempool, store_levels=store_levels, version=_header_version(binary, target, hash_backend), ledger=ledger, chain_state=chain_state, metrics=metrics, target=target, scheduler=scheduler)
         except Exception as e:
             print(f"Klaida kasant bloką #{idx}: {e}")
             break
 
         chain.append(block)
+        with metrics.stage("chain_write"):
+            store.append(block)
+        metrics.end_block(height=idx, hash=block.get("Block_hash"), nonce=block["header"]["nonce"])
         # jeigu reikalaujama, išvedame kiekvieną bloką į konsolę (valdo print_each_block)
         if print_each_block:
             try:
@@ -181,21 +432,33 @@ def mine_chain_from_csv(csv_path: str, users_path: str = "users.txt", use_tree:
         prev_hash = block.get("Block_hash", prev_hash)
         idx += 1
 
+    if pipelined and mempool is not None:
+        _mine_blocks_pipelined(chain, store, mempool, ledger, chain_state, use_tree=use_tree, difficulty=difficulty, max_nonce=max_nonce, block_limit=block_limit, store_levels=store_levels, version=_header_version(binary, target, hash_backend), print_each_block=print_each_block, metrics=metrics, target=target, scheduler=scheduler)
+    elif pipelined:
+        print("Nėra daugiau transakcijų CSV faile. Baigiama kasyba.")
+
+    if mempool is not None:
+        mempool.close()
+    if ledger is not None:
+        ledger.close()
+
     # Išsaugome grandinę JSON formatu
     try:
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(chain, f, ensure_ascii=False, indent=2)
+        with metrics.stage("export"):
+            store.export_chain_json(output_path)
         print(f"Grandinė išsaugota į {output_path} ({len(chain)} blokai).")
     except Exception as e:
         print(f"Įspėjimas: nepavyko įrašyti grandinės: {e}")
 
     # Nauja: sukurti vienos eilutės hash failą (pvz. hashes_line.txt)
     try:
-        _write_hashes_line_from_chainfile(chain_path=output_path, line_path="hashes_line.txt")
+        _write_hashes_line_from_store(store, line_path="hashes_line.txt")
         print("Hash grandinė įrašyta į hashes_line.txt")
     except Exception:
         pass
 
+    metrics.export_prometheus()
+
     # jei pageidaujama, atspausdiname pilną grandinę (vieną kartą)
     if print_to_console:
         try:
@@ -221,42 +484,62 @@ if __name__ == "__main__":
 
     # nauja: jei nurodote 'console' arba '--console' bet kuriame argv, išvesime į konsolę taip pat
     print_to_console = ("console" in sys.argv) or ("--console" in sys.argv)
+    # --no-export: single režime blokas tik pridedamas į žurnalą, chain.json neperrašomas
+    export_json = "--no-export" not in sys.argv
+    # --full-tree: bloke saugoti visus Merkle lygius (kaip anksčiau), ne tik lapus
+    store_levels = "--full-tree" in sys.argv
+    # --binary: header hash'inamas dvejetainiu formatu, grandinės žurnalas rašomas kompaktiškai
+    binary = "--binary" in sys.argv
+    # --metrics=metrics.jsonl / --prometheus=metrics.prom: etapų laikai ir bloko santraukos
+    metrics = metrics_from_argv(sys.argv)
+    # --pipeline: kitas blokas ruošiamas, kol kasamas dabartinis (tik chain režimui)
+    pipelined = "--pipeline" in sys.argv
+    # --target=HEX: skaitinis PoW tikslas (hash < target) vietoj difficulty, pvz. --target=00180000
+    target = next((int(a.split("=", 1)[1], 16) for a in sys.argv if a.startswith("--target=")), None)
+    # --hash=sha256 / --hash=blake2b-256: grandinės hash funkcija (numatytoji — custom32)
+    hash_backend = backend_from_argv(sys.argv)
+    # --block-time=S: target perskaičiuojamas kas --retarget=K blokų (numatyta 10), kad blokas būtų kasamas ~S sekundžių
+    block_time = next((float(a.split("=", 1)[1]) for a in sys.argv if a.startswith("--block-time=")), None)
+    retarget_every = next((int(a.split("=", 1)[1]) for a in sys.argv if a.startswith("--retarget=")), DEFAULT_RETARGET_EVERY)
 
     try:
         if mode == "single":
-            # Paruošiame grandinės failą (jei egzistuoja, nuskaitome paskutinį hash)
+            # Paskutinį hash imame iš žurnalo tip.json (seną chain.json perkeliame pirmą kartą)
             chain_path = "chain.json"
-            prev_hash = "00000000"
-            chain = []
-            if os.path.isfile(chain_path):
-                try:
-                    with open(chain_path, "r", encoding="utf-8") as cf:
-                        chain = json.load(cf) or []
-                    if chain:
-                        prev_hash = chain[-1].get("Block_hash", prev_hash)
-                except Exception:
-                    print("Įspėjimas: nepavyko perskaityti esamos grandinės, bus sukurtas naujas.")
-                    chain = []
+            store = open_chain_store(DEFAULT_STORE_DIR, legacy_chain_path=chain_path)
+            prev_hash = store.tip_hash()
+            scheduler = None
+            if block_time is not None:
+                # planuotojo būsena atkuriama iš paskutinių grandinės blokų metaduomenų
+                backend = get_backend(hash_backend)
+                start_target = target if target is not None else target_from_difficulty(3, backend.bits)
+                scheduler = BlockScheduler.for_backend(backend, block_time, start_target, retarget_every, max_tries=10_000_000)
+                scheduler.restore(store.iter_blocks(max(0, len(store) - retarget_every)))
+                target = scheduler.target
 
             # Iškasame vieną bloką, naudojant prev_hash iš grandinės (jei yra)
-            block = build_genesis_block_from_csv(csv_path, prev_hash=prev_hash, users_path=users_path, use_tree=True, mine=True, difficulty=3, max_nonce=10_000_000)
+            block = build_genesis_block_from_csv(csv_path, prev_hash=prev_hash, users_path=users_path, use_tree=True, mine=True, difficulty=3, max_nonce=10_000_000, store_levels=store_levels, version=_header_version(binary, target, hash_backend), metrics=metrics, target=target, scheduler=scheduler)
 
             # Rašome vieną block.txt
             with open("block.txt", "w", encoding="utf-8") as f:
                 f.write(json.dumps(block, ensure_ascii=False, indent=2))
 
-            # Pridedame bloką prie chain.json
-            chain.append(block)
+            # Pridedame bloką prie žurnalo (O(1)) ir, jei reikia, eksportuojame chain.json
             try:
-                with open(chain_path, "w", encoding="utf-8") as cf:
-                    json.dump(chain, cf, ensure_ascii=False, indent=2)
-                print(f"Blokas pridėtas prie {chain_path}.")
+                with metrics.stage("chain_write"):
+                    store.append(block)
+                metrics.end_block(height=len(store) - 1, hash=block.get("Block_hash"), nonce=block["header"]["nonce"])
+                if export_json:
+                    store.export_chain_json(chain_path)
+                    print(f"Blokas pridėtas prie {chain_path}.")
+                else:
+                    print(f"Blokas pridėtas prie {DEFAULT_STORE_DIR}.")
             except Exception as e:
                 print(f"Įspėjimas: nepavyko įrašyti grandinės: {e}")
 
             # Nauja: atnaujinti vienos eilutės hash failą
             try:
-                _write_hashes_line_from_chainfile(chain_path=chain_path, line_path="hashes_line.txt")
+                _write_hashes_line_from_store(store, line_path="hashes_line.txt")
                 print("Hash grandinė įrašyta į hashes_line.txt")
             except Exception:
                 pass
@@ -271,8 +554,10 @@ if __name__ == "__main__":
             print("Viena bloko operacija užbaigta.")
         else:
             # kasa grandinę tol kol CSV tuščias
-            mine_chain_from_csv(csv_path, users_path=users_path, use_tree=True, difficulty=3, max_nonce=10_000_000, block_limit=None, output_path="chain.json", print_to_console=print_to_console)
+            mine_chain_from_csv(csv_path, users_path=users_path, use_tree=True, difficulty=3, max_nonce=10_000_000, block_limit=None, output_path="chain.json", print_to_console=print_to_console, store_levels=store_levels, binary=binary, metrics=metrics, pipelined=pipelined, target=target, hash_backend=hash_backend, block_time=block_time, retarget_every=retarget_every)
 
     except Exception as e:
         print(f"Klaida: {e}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
+    finally:
+        metrics.close()
\ No newline at end of file
@@ -1,6 +1,8 @@
 from typing import Iterable, List, Any, Dict, Tuple
-from my_hash_function import hash_generator
+from collections import OrderedDict
+from hash_backends import HashBackend, get_backend
 import os
+from multiprocessing import Pool
 from block_body import pick_random_transactions
 import sys
 import json
@@ -9,29 +11,146 @@ import json
 DEFAULT_TREE: bool = True
 DEFAULT_N = 5   # numatytasis atsitiktinių transakcijų skaičius
 DEFAULT_SEED = 12345
+# nuo kiek transakcijų lygiagretus skaičiavimas atsiperka (mažiau — procesų paleidimas brangesnis)
+PARALLEL_MIN_TXS = 20_000
+PARALLEL_MIN_CHUNK = 1024
+# kiek lapų hash'ų laikoma LRU keše (0 — kešas išjungtas)
+DEFAULT_LEAF_CACHE_SIZE = 200_000
+# Visos funkcijos priima backend (pavadinimą arba hash_backends.HashBackend; None — custom32),
+# pvz. BlockHeader(...).backend, kad Merkle medis naudotų tą pačią hash funkciją kaip grandinė.
 
-def compute_merkle_root_from_tx_list(tx_list: Iterable[Any], show_tree: bool = DEFAULT_TREE):
+def _next_level(current: List[str], backend: HashBackend = None) -> List[str]:
+    """Vienas Merkle lygis aukštyn; nelyginis paskutinis mazgas poruojamas su savimi."""
+    pairs: List[str] = []
+    for i in range(0, len(current), 2):
+        left = current[i]
+        right = current[i + 1] if i + 1 < len(current) else left
+        pairs.append(left + right)
+    return get_backend(backend).hash_texts(pairs)
+
+def _leaf_str(item: Any) -> str:
+    """Transakcijos eilutė, iš kurios skaičiuojamas Merkle lapo hash."""
+    if not isinstance(item, dict):
+        raise TypeError("Kiekvienas elementas turi būti dict (CSV eilutė).")
+    sender = item.get("sender", "")
+    receiver = item.get("receiver", "")
+    amount = item.get("amount", "")
+    inputs_field = item.get("inputs", "")
+    inputs_list = inputs_field.split(";") if inputs_field else []
+    parts = [sender, receiver, str(amount)] + [p for p in inputs_list if p]
+    return "|".join(parts)
+
+class LeafHashCache:
+    """
+    Ribotas LRU kešas: transaction_id -> (laukų kortežas, lapo hash).
+    Tos pačios transakcijos kandidatuose ir vėlesniuose blokuose nehash'inamos iš naujo.
+    Laukai palyginami prie kiekvieno pataikymo (32 bitų ID gali kartotis), o
+    invalidate(tx_id) išmeta įrašą iš karto, kai žinoma, kad eilutė pasikeitė.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_LEAF_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[str, Tuple[tuple, str]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, tx_id: str, fields: tuple):
+        entry = self._data.get(tx_id)
+        if entry is None or entry[0] != fields:
+            self.misses += 1
+            return None
+        self._data.move_to_end(tx_id)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, tx_id: str, fields: tuple, h: str) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[tx_id] = (fields, h)
+        self._data.move_to_end(tx_id)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, tx_ids) -> None:
+        """Pašalina vieną ID arba ID rinkinį."""
+        if isinstance(tx_ids, str):
+            tx_ids = (tx_ids,)
+        for tx_id in tx_ids:
+            self._data.pop(tx_id, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+# bendras kešas, kurį Merkle funkcijos naudoja automatiškai
+LEAF_CACHE = LeafHashCache()
+
+def _tx_id_of(item: Any) -> str:
+    return (item.get("transaction_id") or item.get("id") or "") if isinstance(item, dict) else ""
+
+def _leaf_fields(item: Dict[str, Any], backend: HashBackend) -> tuple:
+    # backend pavadinimas laukuose — kito backend'o hash'as kešo neatitiks
+    return (item.get("sender", ""), item.get("receiver", ""), item.get("amount", ""), item.get("inputs", ""), backend.name)
+
+def leaf_hash(item: Any, backend: HashBackend = None) -> str:
+    backend = get_backend(backend)
+    tx_id = _tx_id_of(item)
+    if tx_id:
+        fields = _leaf_fields(item, backend)
+        h = LEAF_CACHE.get(tx_id, fields)
+        if h is None:
+            h = backend.hash_text(_leaf_str(item))
+            LEAF_CACHE.put(tx_id, fields, h)
+        return h
+    return backend.hash_text(_leaf_str(item))
+
+def leaf_hashes(tx_list: Iterable[Any], backend: HashBackend = None) -> List[str]:
+    """Lapų hash'ai sąrašui: kešo nepataikymai hash'inami vienu paketu."""
+    backend = get_backend(backend)
+    items = list(tx_list)
+    out: List[str] = [""] * len(items)
+    missing: List[int] = []
+    for i, item in enumerate(items):
+        tx_id = _tx_id_of(item)
+        h = LEAF_CACHE.get(tx_id, _leaf_fields(item, backend)) if tx_id else None
+        if h is None:
+            missing.append(i)
+        else:
+            out[i] = h
+    if missing:
+        hashed = backend.hash_texts([_leaf_str(items[i]) for i in missing])
+        for i, h in zip(missing, hashed):
+            out[i] = h
+            tx_id = _tx_id_of(items[i])
+            if tx_id:
+                LEAF_CACHE.put(tx_id, _leaf_fields(items[i], backend), h)
+    return out
+
+def compute_merkle_root_from_tx_list(tx_list: Iterable[Any], show_tree: bool = DEFAULT_TREE, workers: int = 1, backend: HashBackend = None):
     """
     Apskaičiuoja Merkle root.
     Jei show_tree=True, papildomai surenka lygius ir grąžina (root, levels).
     Jei show_tree=False, grąžina tik root (string).
+    workers > 1 (arba None — visi branduoliai) dideliems sąrašams naudoja compute_merkle_root_parallel.
     """
     if tx_list is None:
         raise ValueError("tx_list negali būti None")
+    backend = get_backend(backend)
+    if workers != 1:
+        tx_list = list(tx_list)
+        if len(tx_list) >= PARALLEL_MIN_TXS:
+            return compute_merkle_root_parallel(tx_list, show_tree=show_tree, workers=workers, backend=backend)
 
-    def _leaf_hash(item: Any) -> str:
-        if not isinstance(item, dict):
-            raise TypeError("Kiekvienas elementas turi būti dict (CSV eilutė).")
-        sender = item.get("sender", "")
-        receiver = item.get("receiver", "")
-        amount = item.get("amount", "")
-        inputs_field = item.get("inputs", "")
-        inputs_list = inputs_field.split(";") if inputs_field else []
-        parts = [sender, receiver, str(amount)] + [p for p in inputs_list if p]
-        tx_str = "|".join(parts)
-        return hash_generator(tx_str)
-
-    leaves: List[str] = [_leaf_hash(it) for it in tx_list]
+    # lapai imami iš kešo, likę ir lygiai hash'inami paketais (numpy, jei įdiegtas)
+    leaves: List[str] = leaf_hashes(tx_list, backend)
 
     if not leaves:
         raise ValueError("Nėra lapų Merkle root skaičiavimui")
@@ -39,13 +158,7 @@ def compute_merkle_root_from_tx_list(tx_list: Iterable[Any], show_tree: bool = D
     # Minimalus skaičiavimas be medžio išsaugojimo
     def _compute_root_min(current_level: List[str]) -> str:
         while len(current_level) > 1:
-            next_level: List[str] = []
-            for i in range(0, len(current_level), 2):
-                left = current_level[i]
-                right = current_level[i + 1] if i + 1 < len(current_level) else left
-                parent = hash_generator(left + right)
-                next_level.append(parent)
-            current_level = next_level
+            current_level = _next_level(current_level, backend)
         return current_level[0]
 
     # jei nereikia medžio, grąžiname tik root
@@ -56,25 +169,322 @@ def compute_merkle_root_from_tx_list(tx_list: Iterable[Any], show_tree: bool = D
     levels: List[List[str]] = [leaves[:]]
     current = leaves[:]
     while len(current) > 1:
-        next_level: List[str] = []
-        for i in range(0, len(current), 2):
-            left = current[i]
-            right = current[i + 1] if i + 1 < len(current) else left
-            parent = hash_generator(left + right)
-            next_level.append(parent)
+        next_level = _next_level(current, backend)
         levels.append(next_level[:])
         current = next_level
 
     root = current[0]
     return root, levels
 
-def build_block_body(csv_path: str, n: int = DEFAULT_N, seed: int = DEFAULT_SEED, show_tree: bool = DEFAULT_TREE) -> Dict[str, Any]:
+def _subtree_levels(args) -> List[List[str]]:
+    """
+    Vieno 2^k dydžio gabalo lygiai 0..k (vykdoma darbiniame procese).
+    Paskutinis nepilnas gabalas tęsiamas poruojant mazgą su savimi iki k aukščio —
+    lygiai taip pat, kaip jis būtų poruojamas pilname medyje.
+    """
+    chunk, height, backend_name = args
+    backend = get_backend(backend_name)
+    current = backend.hash_texts([_leaf_str(it) for it in chunk])
+    levels = [current]
+    for _ in range(height):
+        current = _next_level(current, backend)
+        levels.append(current)
+    return levels
+
+def _pick_chunk_size(n: int, workers: int) -> int:
+    # bent po kelis gabalus kiekvienam procesui, gabalo dydis — dvejeto laipsnis
+    size = PARALLEL_MIN_CHUNK
+    while size * workers * 4 < n:
+        size *= 2
+    return size
+
+def compute_merkle_root_parallel(tx_list: List[Any], show_tree: bool = False, workers: int = None, chunk_size: int = None, pool=None, backend: HashBackend = None):
+    """
+    Lygiagretus Merkle root: lapai ir apatiniai pomedžiai (2^k dydžio gabalai) skaičiuojami
+    procesų pool'e, viršutiniai lygiai sujungiami tėviniame procese.
+    Rezultatas bit-for-bit sutampa su compute_merkle_root_from_tx_list.
+    pool — jau sukurtas multiprocessing.Pool (kitaip sukuriamas laikinas).
+    """
+    tx_list = list(tx_list)
+    if not tx_list:
+        raise ValueError("Nėra lapų Merkle root skaičiavimui")
+    backend = get_backend(backend)
+    workers = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or _pick_chunk_size(len(tx_list), workers)
+    if chunk_size & (chunk_size - 1):
+        raise ValueError("chunk_size turi būti dvejeto laipsnis")
+    if len(tx_list) <= chunk_size or workers == 1:
+        return compute_merkle_root_from_tx_list(tx_list, show_tree=show_tree, backend=backend)
+
+    height = chunk_size.bit_length() - 1
+    # į worker'ius siunčiamas tik backend pavadinimas (registras yra kiekviename procese)
+    jobs = [(tx_list[i:i + chunk_size], height, backend.name) for i in range(0, len(tx_list), chunk_size)]
+    if pool is None:
+        with Pool(min(workers, len(jobs))) as tmp_pool:
+            parts = tmp_pool.map(_subtree_levels, jobs)
+    else:
+        parts = pool.map(_subtree_levels, jobs)
+
+    # apatiniai lygiai — gabalų lygių sujungimas, toliau — įprastas kilimas nuo gabalų šaknų
+    levels: List[List[str]] = [[h for part in parts for h in part[j]] for j in range(height + 1)]
+    for item, h in zip(tx_list, levels[0]):
+        tx_id = _tx_id_of(item)
+        if tx_id:
+            LEAF_CACHE.put(tx_id, _leaf_fields(item, backend), h)
+    current = levels[-1]
+    while len(current) > 1:
+        current = _next_level(current, backend)
+        levels.append(current)
+    if not show_tree:
+        return current[0]
+    return current[0], levels
+
+class MerkleTree:
+    """
+    Ilgalaikis Merkle medis: saugomi visų lygių hash'ai, todėl pridedant, keičiant ar šalinant
+    transakciją perskaičiuojamas tik jos kelias iki šaknies (O(log n) hash'ų).
+    root visada lygus compute_merkle_root_from_tx_list(tree.transactions, show_tree=False),
+    įskaitant nelyginio paskutinio mazgo poravimą su savimi.
+    """
+
+    def __init__(self, tx_list: Iterable[Any] = (), backend: HashBackend = None):
+        self.backend = get_backend(backend)
+        self.transactions: List[Dict[str, Any]] = list(tx_list)
+        self.levels: List[List[str]] = []
+        self._index: Dict[str, int] = {}    # transaction_id -> vieta transactions
+        for i, tx in enumerate(self.transactions):
+            self._index_tx(tx, i)
+        if self.transactions:
+            current = leaf_hashes(self.transactions, self.backend)
+            self.levels.append(current)
+            while len(current) > 1:
+                current = _next_level(current, self.backend)
+                self.levels.append(current)
+
+    @staticmethod
+    def _tx_id(tx: Dict[str, Any]) -> str:
+        return tx.get("transaction_id") or tx.get("id") or ""
+
+    def _index_tx(self, tx: Dict[str, Any], i: int) -> None:
+        tx_id = self._tx_id(tx)
+        if tx_id:
+            self._index[tx_id] = i
+
+    def _unindex_tx(self, tx: Dict[str, Any], i: int) -> None:
+        tx_id = self._tx_id(tx)
+        if self._index.get(tx_id) == i:
+            del self._index[tx_id]
+
+    def __len__(self) -> int:
+        return len(self.transactions)
+
+    @property
+    def root(self) -> str:
+        if not self.levels:
+            raise ValueError("Nėra lapų Merkle root skaičiavimui")
+        return self.levels[-1][0]
+
+    def index_of(self, tx_id: str) -> int:
+        if tx_id not in self._index:
+            raise KeyError(f"Transakcijos {tx_id} medyje nėra")
+        return self._index[tx_id]
+
+    def _resolve(self, key) -> int:
+        if isinstance(key, int):
+            if not 0 <= key < len(self.transactions):
+                raise IndexError(f"Lapo indeksas {key} už ribų")
+            return key
+        return self.index_of(key)
+
+    def _update_path(self, index: int) -> None:
+        """Perskaičiuoja mazgus nuo lapo index iki šaknies ir pritaiko lygių ilgius."""
+        level = 0
+        while len(self.levels[level]) > 1:
+            current = self.levels[level]
+            parent = index // 2
+            left = current[2 * parent]
+            right = current[2 * parent + 1] if 2 * parent + 1 < len(current) else left
+            if len(self.levels) == level + 1:
+                self.levels.append([])
+            upper = self.levels[level + 1]
+            size = (len(current) + 1) // 2
+            del upper[size:]
+            upper.extend([""] * (size - len(upper)))
+            upper[parent] = self.backend.hash_text(left + right)
+            index = parent
+            level += 1
+        del self.levels[level + 1:]
+
+    def append(self, tx: Dict[str, Any]) -> int:
+        """Prideda transakciją medžio gale; grąžina jos indeksą."""
+        index = len(self.transactions)
+        if not self.levels:
+            self.levels.append([])
+        self.levels[0].append(leaf_hash(tx, self.backend))
+        self.transactions.append(tx)
+        self._index_tx(tx, index)
+        self._update_path(index)
+        return index
+
+    def extend(self, tx_list: Iterable[Any]) -> None:
+        for tx in tx_list:
+            self.append(tx)
+
+    def replace(self, key, tx: Dict[str, Any]) -> None:
+        """Pakeičia transakciją (pagal indeksą arba transaction_id) toje pačioje vietoje."""
+        index = self._resolve(key)
+        self._unindex_tx(self.transactions[index], index)
+        self.transactions[index] = tx
+        self._index_tx(tx, index)
+        self.levels[0][index] = leaf_hash(tx, self.backend)
+        self._update_path(index)
+
+    def remove(self, key) -> Dict[str, Any]:
+        """
+        Pašalina transakciją (pagal indeksą arba transaction_id).
+        Paskutinė transakcija perkeliama į atsilaisvinusią vietą, todėl perskaičiuojami tik du keliai.
+        """
+        index = self._resolve(key)
+        last = len(self.transactions) - 1
+        removed = self.transactions[index]
+        self._unindex_tx(removed, index)
+        if index != last:
+            moved = self.transactions[last]
+            self._unindex_tx(moved, last)
+            self.transactions[index] = moved
+            self._index_tx(moved, index)
+            self.levels[0][index] = self.levels[0][last]
+        self.transactions.pop()
+        self.levels[0].pop()
+        if not self.transactions:
+            self.levels.clear()
+            return removed
+        if index != last:
+            self._update_path(index)
+        # naujas paskutinis lapas — pritaikomi lygių ilgiai
+        self._update_path(len(self.transactions) - 1)
+        return removed
+
+    def levels_copy(self) -> List[List[str]]:
+        """Lygiai tokiu pačiu formatu kaip compute_merkle_root_from_tx_list(..., show_tree=True)."""
+        return [lvl[:] for lvl in self.levels]
+
+    @classmethod
+    def from_leaves(cls, leaves: List[str], tx_ids: List[str] = None, backend: HashBackend = None) -> "MerkleTree":
+        """
+        Atkuria medį iš saugomų lapų hash'ų (pvz. bloko merkle_leaves), transakcijų neturint.
+        tx_ids (lygiagretus sąrašas) leidžia ieškoti lapų pagal transaction_id.
+        """
+        if tx_ids is not None and len(tx_ids) != len(leaves):
+            raise ValueError("tx_ids ir leaves ilgiai nesutampa")
+        tree = cls(backend=backend)
+        ids = tx_ids if tx_ids is not None else [""] * len(leaves)
+        tree.transactions = [{"transaction_id": tid} for tid in ids]
+        for i, tx in enumerate(tree.transactions):
+            tree._index_tx(tx, i)
+        if leaves:
+            current = list(leaves)
+            tree.levels.append(current)
+            while len(current) > 1:
+                current = _next_level(current, tree.backend)
+                tree.levels.append(current)
+        return tree
+
+    def proof(self, key) -> Dict[str, Any]:
+        """
+        Įtraukimo įrodymas (O(log n) hash'ų) transakcijai pagal indeksą arba transaction_id.
+        siblings — kaimyniniai mazgai nuo lapo iki šaknies; lyginis index reiškia, kad
+        mazgas kairėje. Nelyginis paskutinis mazgas turi kaimynu save patį.
+        """
+        index = self._resolve(key)
+        siblings: List[str] = []
+        i = index
+        for level in self.levels[:-1]:
+            j = i ^ 1
+            siblings.append(level[j] if j < len(level) else level[i])
+            i //= 2
+        return {
+            "transaction_id": self._tx_id(self.transactions[index]),
+            "index": index,
+            "leaf": self.levels[0][index],
+            "siblings": siblings,
+        }
+
+
+def merkle_proof(tx_list: Iterable[Any], tx_id: str, backend: HashBackend = None) -> Dict[str, Any]:
+    """Vienkartinis įrodymas transakcijai tx_id iš transakcijų sąrašo."""
+    return MerkleTree(tx_list, backend).proof(tx_id)
+
+
+def proof_from_block(block: Dict[str, Any], tx_id: str, backend: HashBackend = None) -> Dict[str, Any]:
+    """
+    Įrodymas iš saugomo bloko: naudojami body merkle_leaves + transaction_ids,
+    o senesniems blokams — pilni merkle_tree_levels (jei juose yra transaction_ids).
+    """
+    body = block.get("body", {})
+    leaves = body.get("merkle_leaves")
+    if leaves is None and body.get("merkle_tree_levels"):
+        leaves = body["merkle_tree_levels"][0]["hashes"]
+    if leaves is None:
+        raise ValueError("Bloke nėra Merkle lapų")
+    tx_ids = body.get("transaction_ids")
+    if tx_ids is None:
+        raise ValueError("Bloke nėra transaction_ids — įrodymo pagal ID sudaryti negalima")
+    return MerkleTree.from_leaves(leaves, tx_ids, backend).proof(tx_id)
+
+
+def _proof_root(leaf: str, index: int, siblings: List[str], backend: HashBackend) -> str:
+    node = leaf
+    for sibling in siblings:
+        node = backend.hash_text(node + sibling if index % 2 == 0 else sibling + node)
+        index //= 2
+    return node
+
+
+def verify_merkle_proof(proof: Dict[str, Any], merkle_root: str, tx: Dict[str, Any] = None, backend: HashBackend = None) -> bool:
+    """
+    Patikrina, ar proof veda į merkle_root.
+    Jei pateikta tx, papildomai tikrinama, kad proof lapas yra būtent šios transakcijos hash.
+    """
+    backend = get_backend(backend)
+    if tx is not None and leaf_hash(tx, backend) != proof["leaf"]:
+        return False
+    return _proof_root(proof["leaf"], proof["index"], proof["siblings"], backend) == merkle_root
+
+
+def verify_merkle_proofs(proofs: List[Dict[str, Any]], merkle_roots, backend: HashBackend = None) -> List[bool]:
+    """
+    Paketinis tikrinimas: merkle_roots — vienas root visiems arba sąrašas (po vieną kiekvienam proof).
+    Visų įrodymų to paties lygio poros hash'inamos kartu (backend.hash_texts).
+    """
+    backend = get_backend(backend)
+    if isinstance(merkle_roots, str):
+        merkle_roots = [merkle_roots] * len(proofs)
+    elif len(merkle_roots) != len(proofs):
+        raise ValueError("merkle_roots ir proofs ilgiai nesutampa")
+    nodes = [p["leaf"] for p in proofs]
+    indexes = [p["index"] for p in proofs]
+    depth = max((len(p["siblings"]) for p in proofs), default=0)
+    for level in range(depth):
+        active = [k for k, p in enumerate(proofs) if level < len(p["siblings"])]
+        pairs = []
+        for k in active:
+            sibling = proofs[k]["siblings"][level]
+            pairs.append(nodes[k] + sibling if indexes[k] % 2 == 0 else sibling + nodes[k])
+        for k, h in zip(active, backend.hash_texts(pairs)):
+            nodes[k] = h
+            indexes[k] //= 2
+    return [node == root for node, root in zip(nodes, merkle_roots)]
+
+def build_block_body(csv_path: str, n: int = DEFAULT_N, seed: int = DEFAULT_SEED, show_tree: bool = DEFAULT_TREE, streaming: bool = False, workers: int = 1, backend: HashBackend = None) -> Dict[str, Any]:
     """
     Pasirenka atsitiktines transakcijas, apskaičiuoja Merkle root.
     Jei show_tree=True, grąžina ir levels.
+    streaming=True — transakcijos renkamos vienu praėjimu per CSV (dideliems failams).
+    workers — žr. compute_merkle_root_from_tx_list.
     """
-    txs = pick_random_transactions(csv_path=csv_path, n=n, seed=seed)
-    result = compute_merkle_root_from_tx_list(txs, show_tree=show_tree)
+    txs = pick_random_transactions(csv_path=csv_path, n=n, seed=seed, streaming=streaming)
+    result = compute_merkle_root_from_tx_list(txs, show_tree=show_tree, workers=workers, backend=backend)
     if show_tree:
         merkle_root, levels = result
         return {"transactions": txs, "merkle_root": merkle_root, "levels": levels}
@@ -0,0 +1,154 @@
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Optional
+
+# Kasybos etapų laikmačiai ir skaitikliai.
+# Metrics kaupia bendrus etapų laikus/skaitiklius ir kiekvieno bloko santrauką (end_block),
+# kurią gali rašyti į JSON-lines failą; export_prometheus įrašo Prometheus teksto formatą.
+# NULL_METRICS turi tą pačią sąsają, bet nieko nedaro — naudojamas, kai metrikos išjungtos.
+METRIC_PREFIX = "blockchain"
+
+
+class Metrics:
+    def __init__(self, jsonl_path: Optional[str] = None, prometheus_path: Optional[str] = None):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.enabled = True
+        self.counters: Dict[str, float] = {}
+        self.timers: Dict[str, list] = {}          # etapas -> [kartai, suma sekundėmis, ilgiausias]
+        self._block_stages: Dict[str, float] = {}  # dabartinio bloko etapų laikai
+        self._block_counters: Dict[str, float] = {}
+        self.blocks = 0
+        self._jsonl = open(jsonl_path, "a", encoding="utf-8") if jsonl_path else None
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name: str, seconds: float) -> None:
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [1, seconds, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+            if seconds > timer[2]:
+                timer[2] = seconds
+        self._block_stages[name] = self._block_stages.get(name, 0.0) + seconds
+
+    def inc(self, name: str, value: float = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+        self._block_counters[name] = self._block_counters.get(name, 0) + value
+
+    def end_block(self, **fields: Any) -> Dict[str, Any]:
+        """
+        Užbaigia bloko santrauką: etapų laikai ir skaitikliai nuo ankstesnio end_block
+        bei hashes_per_sec (hashes / mine laikas). Įrašo į JSON-lines failą, jei nurodytas.
+        """
+        record: Dict[str, Any] = {"block": self.blocks, "time": time.time()}
+        record.update(fields)
+        record["stages"] = {k: round(v, 6) for k, v in self._block_stages.items()}
+        record["counters"] = dict(self._block_counters)
+        hashes = self._block_counters.get("hashes", 0)
+        mine_seconds = self._block_stages.get("mine", 0.0)
+        if hashes and mine_seconds > 0:
+            record["hashes_per_sec"] = hashes / mine_seconds
+        self.blocks += 1
+        self._block_stages = {}
+        self._block_counters = {}
+        if self._jsonl is not None:
+            self._jsonl.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._jsonl.flush()
+        return record
+
+    def snapshot(self) -> Dict[str, Any]:
+        mine = self.timers.get("mine")
+        hashes = self.counters.get("hashes", 0)
+        return {
+            "blocks": self.blocks,
+            "counters": dict(self.counters),
+            "stages": {k: {"count": c, "seconds": s, "max_seconds": m} for k, (c, s, m) in self.timers.items()},
+            "hashes_per_sec": hashes / mine[1] if mine and mine[1] > 0 else None,
+        }
+
+    def export_prometheus(self, path: Optional[str] = None) -> None:
+        """Įrašo metrikas Prometheus teksto formatu (atomiškai, kad skaitytojas nematytų pusės failo)."""
+        path = path or self.prometheus_path
+        if not path:
+            return
+        p = METRIC_PREFIX
+        lines = [
+            f"# TYPE {p}_stage_seconds_total counter",
+            *(f'{p}_stage_seconds_total{{stage="{k}"}} {s:.6f}' for k, (_, s, _) in self.timers.items()),
+            f"# TYPE {p}_stage_calls_total counter",
+            *(f'{p}_stage_calls_total{{stage="{k}"}} {c}' for k, (c, _, _) in self.timers.items()),
+            f"# TYPE {p}_stage_max_seconds gauge",
+            *(f'{p}_stage_max_seconds{{stage="{k}"}} {m:.6f}' for k, (_, _, m) in self.timers.items()),
+            f"# TYPE {p}_events_total counter",
+            *(f'{p}_events_total{{name="{k}"}} {v}' for k, v in self.counters.items()),
+            f"# TYPE {p}_blocks_total counter",
+            f"{p}_blocks_total {self.blocks}",
+        ]
+        rate = self.snapshot()["hashes_per_sec"]
+        if rate is not None:
+            lines += [f"# TYPE {p}_hashes_per_second gauge", f"{p}_hashes_per_second {rate:.1f}"]
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+    def close(self) -> None:
+        self.export_prometheus()
+        if self._jsonl is not None:
+            self._jsonl.close()
+            self._jsonl = None
+
+
+class NullMetrics:
+    """Išjungtos metrikos: kiekvienas kvietimas — tuščia funkcija, stage — vienas bendras nullcontext."""
+    enabled = False
+    blocks = 0
+    _null = nullcontext()
+
+    def stage(self, name: str):
+        return self._null
+
+    def observe(self, name: str, seconds: float) -> None:
+        pass
+
+    def inc(self, name: str, value: float = 1) -> None:
+        pass
+
+    def end_block(self, **fields: Any) -> Dict[str, Any]:
+        return {}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {}
+
+    def export_prometheus(self, path: Optional[str] = None) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+def metrics_from_argv(argv) -> "Metrics | NullMetrics":
+    """--metrics=kelias.jsonl ir/arba --prometheus=kelias.prom įjungia metrikas; kitaip NULL_METRICS."""
+    jsonl_path = prom_path = None
+    for arg in argv:
+        if arg.startswith("--metrics="):
+            jsonl_path = arg.split("=", 1)[1]
+        elif arg.startswith("--prometheus="):
+            prom_path = arg.split("=", 1)[1]
+    if not jsonl_path and not prom_path:
+        return NULL_METRICS
+    return Metrics(jsonl_path=jsonl_path, prometheus_path=prom_path)
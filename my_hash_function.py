@@ -1,9 +1,23 @@
+from typing import List, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # numpy neprivalomas — be jo naudojami paprasti Python ciklai
+    np = None
+
+D1 = 828930167
+MASK32 = 0xFFFFFFFF
+HASH_BITS = 32  # hash_generator rezultato dydis (8 hex simboliai)
+# nuo kiek įvesčių verta naudoti numpy paketinį hash'inimą
+BATCH_MIN_SIZE = 32
+
+
 def hash_generator(tekstas):
 
     # Paverčiam tekstą į sąrašą skaičių (ASCII)
     skaiciai = [ord(c) for c in tekstas]   # skaiciu masyvas
-    
-    d1 = 828930167
+
+    d1 = D1
     suma = d1  # pradinis sumos reikšmė
 
     for i, skaicius in enumerate(skaiciai):
@@ -16,6 +30,184 @@ def hash_generator(tekstas):
     hash = f"{suma:08x}" # skaiciaus formatavimas i hex su 8 simboliais
     return hash
 
+
+def hash_int(tekstas: str) -> int:
+    """hash_generator rezultatas kaip 32 bitų sveikasis skaičius: int(hash_generator(t), 16), be hex formatavimo."""
+    return _finalize(_absorb(D1, tekstas))
+
+
+class HashState:
+    """
+    Inkrementinė hash_generator būsena (midstate).
+    Prefiksą galima sugerti vieną kartą, nukopijuoti būseną ir kiekvienam
+    variantui pridėti tik besikeičiančią pabaigą (pvz. nonce).
+    HashState().update(a).update(b).hexdigest() == hash_generator(a + b)
+    """
+    __slots__ = ("suma",)
+
+    def __init__(self, suma: int = D1):
+        self.suma = suma
+
+    def update(self, tekstas: str) -> "HashState":
+        self.suma = _absorb(self.suma, tekstas)
+        return self
+
+    def copy(self) -> "HashState":
+        return HashState(self.suma)
+
+    def digest(self) -> int:
+        """Galutinis 32 bitų hash kaip sveikasis skaičius (po maišymo pabaigoje)."""
+        return _finalize(self.suma)
+
+    def hexdigest(self) -> str:
+        return f"{_finalize(self.suma):08x}"
+
+    def hexdigest_with(self, suffix: str) -> str:
+        """hexdigest() būsenai su pridėtu suffix, pačios būsenos nekeičiant."""
+        return f"{_finalize(_absorb(self.suma, suffix)):08x}"
+
+    def digest_with(self, suffix: str) -> int:
+        """Kaip hexdigest_with, bet sveikasis skaičius — kasybos cikle hex neformatuojamas."""
+        return _finalize(_absorb(self.suma, suffix))
+
+    def update_bytes(self, data: bytes) -> "HashState":
+        """Kaip update(), bet kiekvienas baitas sugeriamas kaip vienas simbolis."""
+        self.suma = _absorb_bytes(self.suma, data)
+        return self
+
+    def hexdigest_with_bytes(self, suffix: bytes) -> str:
+        return f"{_finalize(_absorb_bytes(self.suma, suffix)):08x}"
+
+    def digest_with_bytes(self, suffix: bytes) -> int:
+        return _finalize(_absorb_bytes(self.suma, suffix))
+
+
+def _absorb(suma: int, tekstas: str) -> int:
+    # XOR rezultatą galima apkarpyti iki 32 bitų prieš daugybą — mod 2^32 rezultatas nepasikeičia
+    d1 = D1
+    for c in tekstas:
+        suma = ((suma ^ (ord(c) * d1)) * d1) & MASK32
+    return suma
+
+
+def _absorb_bytes(suma: int, data: bytes) -> int:
+    d1 = D1
+    for c in data:
+        suma = ((suma ^ (c * d1)) * d1) & MASK32
+    return suma
+
+
+def hash_bytes(data: bytes) -> str:
+    """
+    hash_generator baitams (dvejetainiam header formatui).
+    hash_bytes(t.encode("latin-1")) == hash_generator(t), kai t — tik latin-1 simboliai.
+    """
+    return f"{_finalize(_absorb_bytes(D1, data)):08x}"
+
+
+def hash_bytes_int(data: bytes) -> int:
+    """hash_bytes rezultatas kaip sveikasis skaičius."""
+    return _finalize(_absorb_bytes(D1, data))
+
+
+def _finalize(suma: int) -> int:
+    return (suma << 13 | suma >> (32 - 13)) & MASK32
+
+
+def hash_prefix(tekstas: str) -> HashState:
+    """Sugeria prefiksą ir grąžina būseną, kurią galima tęsti su skirtingomis pabaigomis."""
+    return HashState().update(tekstas)
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError("Paketiniam hash'inimui reikia numpy (pip install numpy)")
+
+
+def _absorb_codes(suma, codes):
+    # suma: uint64 masyvas (N,), codes: uint64 masyvas (N, L) — vienas stulpelis vienam simboliui
+    d1 = np.uint64(D1)
+    mask = np.uint64(MASK32)
+    for j in range(codes.shape[1]):
+        suma = ((suma ^ ((codes[:, j] * d1) & mask)) * d1) & mask
+    return suma
+
+
+def _finalize_batch(suma):
+    mask = np.uint64(MASK32)
+    return (((suma << np.uint64(13)) | (suma >> np.uint64(32 - 13))) & mask).astype(np.uint32)
+
+
+def hash_batch(tekstai: Sequence[str]):
+    """
+    Paketinis hash_generator: grąžina numpy uint32 masyvą su 32 bitų hash'ais
+    (bit-for-bit toks pat kaip int(hash_generator(t), 16)).
+    Vienodo ilgio tekstai apdorojami kartu — vienas Python ciklo žingsnis vienam simboliui.
+    """
+    _require_numpy()
+    out = np.empty(len(tekstai), dtype=np.uint32)
+    by_len = {}
+    for idx, t in enumerate(tekstai):
+        by_len.setdefault(len(t), []).append(idx)
+    for length, idxs in by_len.items():
+        suma = np.full(len(idxs), D1, dtype=np.uint64)
+        if length:
+            joined = "".join(tekstai[i] for i in idxs).encode("utf-32-le")
+            codes = np.frombuffer(joined, dtype=np.uint32).reshape(len(idxs), length).astype(np.uint64)
+            suma = _absorb_codes(suma, codes)
+        out[idxs] = _finalize_batch(suma)
+    return out
+
+
+def hash_batch_hex(tekstai: Sequence[str]) -> List[str]:
+    """Kaip [hash_generator(t) for t in tekstai], bet dideliems kiekiams naudoja numpy."""
+    if np is None or len(tekstai) < BATCH_MIN_SIZE:
+        return [hash_generator(t) for t in tekstai]
+    return [f"{d:08x}" for d in hash_batch(tekstai).tolist()]
+
+
+def hash_nonce_batch(state: HashState, nonces, tail: str = ""):
+    """
+    Hash'ina state + f"{nonce}{tail}" kiekvienam nonce iš masyvo vienu metu.
+    Grąžina numpy uint32 masyvą tokia pačia tvarka kaip nonces.
+    """
+    _require_numpy()
+    nonces = np.asarray(nonces, dtype=np.int64)
+    if nonces.size and nonces.min() < 0:
+        raise ValueError("nonce negali būti neigiamas")
+    out = np.empty(nonces.shape[0], dtype=np.uint32)
+    tail_codes = [ord(c) for c in tail]
+    d1 = np.uint64(D1)
+    mask = np.uint64(MASK32)
+    # skaitmenų kiekis kiekvienam nonce (0 → 1 skaitmuo)
+    digits = np.ones(nonces.shape[0], dtype=np.int64)
+    bound = 10
+    while nonces.size and bound <= nonces.max():
+        digits += nonces >= bound
+        bound *= 10
+    for k in np.unique(digits).tolist():
+        sel = digits == k
+        sub = nonces[sel]
+        suma = np.full(sub.shape[0], state.suma, dtype=np.uint64)
+        for j in range(k):
+            code = ((sub // 10 ** (k - 1 - j)) % 10 + 48).astype(np.uint64)
+            suma = ((suma ^ ((code * d1) & mask)) * d1) & mask
+        for c in tail_codes:
+            suma = ((suma ^ np.uint64((c * D1) & MASK32)) * d1) & mask
+        out[sel] = _finalize_batch(suma)
+    return out
+
+def hash_nonce_batch_bytes(state: HashState, nonces):
+    """
+    Dvejetainio header variantas: hash'ina state + nonce kaip 8 baitų little-endian
+    kiekvienam nonce. Visi nonce vienodo ilgio, todėl grupuoti nereikia.
+    """
+    _require_numpy()
+    nonces = np.ascontiguousarray(nonces, dtype="<u8")
+    codes = nonces.view(np.uint8).reshape(nonces.shape[0], 8).astype(np.uint64)
+    suma = np.full(nonces.shape[0], state.suma, dtype=np.uint64)
+    return _finalize_batch(_absorb_codes(suma, codes))
+
 if __name__ == "__main__":
     import sys
 
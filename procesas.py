@@ -1,89 +1,234 @@
 import time
 import sys
 import os
-import json
-from typing import Optional, List
-from multiprocessing import Process, Manager, Lock
+from typing import Optional, List, Tuple
+from dataclasses import replace
+from multiprocessing import Process, Lock, Condition, Value, Array
 
-from Header import BlockHeader
+from Header import BlockHeader, BINARY_HEADER_VERSION, TARGET_HEADER_VERSION, target_from_difficulty
 from block_body import pick_random_transactions, remove_transactions_from_csv
 from merkel_root2 import compute_merkle_root_from_tx_list
+from chain_store import ChainStore, DEFAULT_STORE_DIR, open_chain_store
+from metrics import NULL_METRICS, metrics_from_argv
+from hash_backends import backend_for_version, backend_from_argv, make_version, get_backend
+from scheduler import BlockScheduler, SCHEDULE_KEY, DEFAULT_RETARGET_EVERY
 
-def generate_candidates(csv_path: str, prev_hash: str = "00000000", n_candidates: int = 5, txs_per: int = 100, seed: Optional[int] = None, difficulty: int = 3) -> List[BlockHeader]:
+DEFAULT_WORKERS = os.cpu_count() or 1
+# bandymų riba blokui (visų kandidatų suma) planuotojo target apatinei ribai — kaip main.py max_nonce
+MAX_TRIES = 10_000_000
+
+def generate_candidates(csv_path: str, prev_hash: str = "00000000", n_candidates: int = 5, txs_per: int = 100, seed: Optional[int] = None, difficulty: int = 3, version: int = 1, metrics=NULL_METRICS, target: Optional[int] = None) -> List[BlockHeader]:
     candidates = []
+    backend = backend_for_version(version)
     for i in range(n_candidates):
         seed_i = (seed + i) if (seed is not None) else None
-        txs = pick_random_transactions(csv_path=csv_path, n=txs_per, seed=seed_i)
-        merkle_root = compute_merkle_root_from_tx_list(txs)
-        header = BlockHeader.create_with_current_time(prev_hash=prev_hash, merkle_root=merkle_root, difficulty=difficulty)
+        with metrics.stage("sample"):
+            txs = pick_random_transactions(csv_path=csv_path, n=txs_per, seed=seed_i)
+        with metrics.stage("merkle"):
+            merkle_root = compute_merkle_root_from_tx_list(txs, show_tree=False, backend=backend)
+        header = BlockHeader.create_with_current_time(prev_hash=prev_hash, merkle_root=merkle_root, version=version, difficulty=difficulty, target=target)
         setattr(header, "_txs", txs)
         candidates.append(header)
     return candidates
 
-def mine_candidate_mp(i, header, winner, stats, lock, deadline):
-    start_time = time.time()
-    while time.time() < deadline and winner["header"] is None:
-        header.nonce += 1
-        stats[i]["tries"] += 1
-        h = header.hash()
-        if BlockHeader.validate_hash(h, header.difficulty):
-            with lock:
-                if winner["header"] is None:
-                    winner["header"] = header
-                    winner["hash"] = h
-                    winner["idx"] = i   # <-- pridėtas indeksas
-                    stats[i]["found"] = True
-                    stats[i]["time"] = time.time() - start_time
-
-            break
+class SharedMiningState:
+    """
+    Kasybos procesų bendra atmintis be Manager proxy: stabdymo vėliava, laimėtojo vieta
+    ir po vieną bandymų skaitiklį kiekvienam worker'iui (atnaujinama paketais, ne kas nonce).
+    """
 
-def try_mine_parallel_multiprocessing(candidates: List[BlockHeader], time_limit_sec: float):
-    manager = Manager()
-    winner = manager.dict({"header": None, "hash": None, "idx": None})
-    # kiekvienas įrašas dabar manager.dict, kad mutacijos iš subprocess'ų būtų matomos
-    stats = manager.list([manager.dict({"tries": 0, "found": False, "time": None}) for _ in range(len(candidates))])
-    lock = Lock()
+    def __init__(self, n_slots: int):
+        self.stop = Value("b", 0, lock=False)
+        self.win_idx = Value("i", -1, lock=False)
+        self.win_nonce = Value("q", 0, lock=False)
+        self.win_time = Value("d", 0.0, lock=False)
+        self.tries = Array("q", n_slots, lock=False)
+        self.lock = Lock()
 
-    deadline = time.time() + time_limit_sec
+    def claim(self, cand_idx: int, nonce: int, elapsed: float) -> bool:
+        """Įrašo laimėtoją, jei jo dar nėra; grąžina True, jei šis worker'is laimėjo."""
+        with self.lock:
+            if self.win_idx.value >= 0:
+                return False
+            self.win_idx.value = cand_idx
+            self.win_nonce.value = nonce
+            self.win_time.value = elapsed
+        self.stop.value = 1
+        return True
 
-    processes = []
-    for i, header in enumerate(candidates):
-        p = Process(target=mine_candidate_mp, args=(i, header, winner, stats, lock, deadline))
-        processes.append(p)
-        p.start()
+    def winner(self, candidates: List[BlockHeader]):
+        """Grąžina (header, hash, idx) arba (None, None, None), jei niekas nerado."""
+        idx = self.win_idx.value
+        if idx < 0:
+            return None, None, None
+        header = replace(candidates[idx], nonce=self.win_nonce.value)
+        setattr(header, "_txs", getattr(candidates[idx], "_txs", []))
+        return header, header.hash(), idx
 
-    # Laukiame tik iki laiko limito arba kol randamas laimėtojas
-    while time.time() < deadline:
-        if winner["header"] is not None:
-            break
-        time.sleep(0.01)  # nedidelis delay, kad CPU nebūtų perkrautas
+    def stats(self, slots: List[Tuple[int, int, int]], n_candidates: int) -> List[dict]:
+        """Sujungia worker'ių skaitiklius į įprastą ataskaitą kiekvienam kandidatui."""
+        stats_list = [{"tries": 0, "found": False, "time": None} for _ in range(n_candidates)]
+        for slot, (cand_idx, _, _) in enumerate(slots):
+            stats_list[cand_idx]["tries"] += self.tries[slot]
+        if self.win_idx.value >= 0:
+            stats_list[self.win_idx.value]["found"] = True
+            stats_list[self.win_idx.value]["time"] = self.win_time.value
+        return stats_list
 
-    # Nutraukiame likusius procesus
-    for p in processes:
-        if p.is_alive():
-            p.terminate()
+def assign_workers(n_candidates: int, n_workers: int) -> List[Tuple[int, int, int]]:
+    """
+    Padalina nonce erdvę tarp worker'ių: grąžina (kandidato idx, offset, step) kiekvienam worker'iui.
+    Kiekvienas kandidatas gauna bent vieną worker'į, o jo worker'iai tikrina nesikertančius
+    nonce: offset, offset + step, offset + 2*step, ...
+    """
+    n_workers = max(n_workers, n_candidates)
+    slots = []
+    for c in range(n_candidates):
+        step = n_workers // n_candidates + (1 if c < n_workers % n_candidates else 0)
+        for offset in range(step):
+            slots.append((c, offset, step))
+    return slots
 
-    # Konvertuoti į įprastus dict'ai, kad pagrindinis procesas gautų reikšmes
-    stats_list = [dict(s) for s in stats]
-    return winner["header"], winner["hash"], winner["idx"], stats_list
+def pool_worker_mp(slot, cand_idx, header, offset, step, shared, rounds):
+    """
+    Ilgai gyvenantis kasybos procesas: laukia raundo, kasa iki rounds.deadline
+    ir išsaugo savo nonce žymeklį, kad kitas raundas tęstų nuo ten, kur baigė.
+    """
+    tries = shared.tries
+    stop = shared.stop
+    deadline = rounds.deadline
+    nonce = header.nonce + 1 + offset
+    seen = 0
+    rounds.ready[slot] = 1
 
+    def progress(n):
+        tries[slot] += n
+        # stop — bendros atminties vėliava: visi worker'iai ją patikrina kas kelis šimtus bandymų
+        return stop.value or time.time() >= deadline.value
 
+    while True:
+        with rounds.cond:
+            while rounds.round_no.value == seen and not rounds.shutdown.value:
+                rounds.cond.wait()
+        if rounds.shutdown.value:
+            return
+        seen = rounds.round_no.value
+        start_time = time.time()
+        if not stop.value:
+            h = header.mine_stride(nonce, step, progress=progress)
+            if h is not None:
+                shared.claim(cand_idx, header.nonce, time.time() - start_time)
+            # mine_stride palieka header.nonce = paskutinis patikrintas nonce
+            nonce = header.nonce + step
+        rounds.cursors[slot] = nonce
+        rounds.done_round[slot] = seen
 
-def append_block_to_chain(block: dict, chain_path: str = "chain.json"):
-    chain = []
-    if os.path.isfile(chain_path):
-        try:
-            with open(chain_path, "r", encoding="utf-8") as f:
-                chain = json.load(f) or []
-        except Exception:
-            chain = []
-    chain.append(block)
-    with open(chain_path, "w", encoding="utf-8") as f:
-        json.dump(chain, f, ensure_ascii=False, indent=2)
+class _RoundState:
+    """Raundų sinchronizacija tarp MiningPool ir jo worker'ių."""
+
+    def __init__(self, n_slots: int):
+        self.cond = Condition()
+        self.round_no = Value("i", 0, lock=False)
+        self.shutdown = Value("b", 0, lock=False)
+        self.deadline = Value("d", 0.0, lock=False)
+        self.ready = Array("b", n_slots, lock=False)
+        self.done_round = Array("i", n_slots, lock=False)
+        self.cursors = Array("q", n_slots, lock=False)
+
+class MiningPool:
+    """
+    Kasybos procesų pool'as, paleidžiamas vieną kartą kandidatų rinkiniui.
+    Kiekvienas run_round tik nustato naują deadline — worker'iai tęsia nuo savo nonce žymeklio,
+    todėl pakartotiniai raundai nekartoja jau atlikto darbo ir nemoka už procesų paleidimą.
+    """
+
+    def __init__(self, candidates: List[BlockHeader], n_workers: Optional[int] = None):
+        self.candidates = candidates
+        self.slots = assign_workers(len(candidates), n_workers or len(candidates))
+        self.shared = SharedMiningState(len(self.slots))
+        self.rounds = _RoundState(len(self.slots))
+        self.processes = []
+        for slot, (cand_idx, offset, step) in enumerate(self.slots):
+            args = (slot, cand_idx, candidates[cand_idx], offset, step, self.shared, self.rounds)
+            p = Process(target=pool_worker_mp, args=args, daemon=True)
+            self.processes.append(p)
+            p.start()
+        # paleidimo kaina neįskaičiuojama į pirmo raundo laiko limitą
+        wait_until = time.time() + 30.0
+        while time.time() < wait_until and not all(self.rounds.ready):
+            time.sleep(0.005)
+
+    def run_round(self, time_limit_sec: float):
+        """Kasa dar time_limit_sec sekundžių; grąžina (header, hash, idx, stats) kaip try_mine_*."""
+        shared, rounds = self.shared, self.rounds
+        if shared.win_idx.value < 0:
+            shared.stop.value = 0
+            deadline = time.time() + time_limit_sec
+            rounds.deadline.value = deadline
+            with rounds.cond:
+                rounds.round_no.value += 1
+                rounds.cond.notify_all()
+
+            # Laukiame tik iki laiko limito arba kol randamas laimėtojas
+            while time.time() < deadline and shared.win_idx.value < 0:
+                time.sleep(0.01)  # nedidelis delay, kad CPU nebūtų perkrautas
+            shared.stop.value = 1
+
+            # worker'iai sustoja per kelis šimtus bandymų ir išsaugo žymeklius. Laukiama, kol patvirtins
+            # visi gyvi worker'iai — kitaip vėluojantis worker'is kitame raunde tęstų seną raundą
+            # ir jo žymeklis (ar laimėtojas) būtų priskirtas ne tam raundui.
+            current = rounds.round_no.value
+            while any(rounds.done_round[s] != current and p.is_alive() for s, p in enumerate(self.processes)):
+                time.sleep(0.001)
+
+        header, block_hash, idx = shared.winner(self.candidates)
+        return header, block_hash, idx, shared.stats(self.slots, len(self.candidates))
+
+    def cursors(self) -> List[int]:
+        """Kitas netikrintas nonce kiekvienam worker'iui."""
+        return list(self.rounds.cursors)
+
+    def close(self) -> None:
+        with self.rounds.cond:
+            self.rounds.shutdown.value = 1
+            self.rounds.cond.notify_all()
+        for p in self.processes:
+            p.join(timeout=1.0)
+            if p.is_alive():
+                p.terminate()
+
+    def __enter__(self) -> "MiningPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def try_mine_parallel_multiprocessing(candidates: List[BlockHeader], time_limit_sec: float):
+    # po vieną procesą kiekvienam kandidatui
+    return try_mine_partitioned_multiprocessing(candidates, time_limit_sec, n_workers=len(candidates))
+
+def try_mine_partitioned_multiprocessing(candidates: List[BlockHeader], time_limit_sec: float, n_workers: int = DEFAULT_WORKERS):
+    """
+    Kaip try_mine_parallel_multiprocessing, bet kiekvieno kandidato nonce erdvė padalinama
+    tarp kelių worker'ių (žr. assign_workers), todėl ir vienas kandidatas išnaudoja visus branduolius.
+    """
+    with MiningPool(candidates, n_workers) as pool:
+        return pool.run_round(time_limit_sec)
+
+
+def append_block_to_chain(block: dict, chain_path: str = "chain.json", store: Optional[ChainStore] = None, export_json: bool = True):
+    """
+    Prideda bloką į append-only žurnalą (O(1)); chain.json perrašomas tik jei export_json=True.
+    """
+    if store is None:
+        store = open_chain_store(DEFAULT_STORE_DIR, legacy_chain_path=chain_path)
+    store.append(block)
+    if export_json:
+        store.export_chain_json(chain_path)
 
 def build_block_dict(header: BlockHeader, block_hash: str) -> dict:
     txs = getattr(header, "_txs", [])
-    serialize = f"{header.prev_hash}|{header.timestamp}|{header.version}|{header.merkle_root}|{header.nonce}|{header.difficulty}"
+    serialize = header.serialize()
     block = {
         "Block_hash": block_hash,
         "header": {
@@ -101,72 +246,131 @@ def build_block_dict(header: BlockHeader, block_hash: str) -> dict:
             "transactions": txs
         }
     }
+    if header.target is not None:
+        block["header"]["target"] = header.target
     return block
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python procesas.py <tx_csv> [time_limit_seconds] [difficulty]")
+        print("Usage: python procesas.py <tx_csv> [time_limit_seconds] [difficulty] [workers] [--no-export] [--binary] [--metrics=kelias.jsonl] [--prometheus=kelias.prom] [--target=HEX] [--hash=sha256] [--block-time=S] [--retarget=K]")
         sys.exit(1)
 
-    csv_path = sys.argv[1]
-    initial_time_limit = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
-    difficulty = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    # --no-export: blokas tik pridedamas į žurnalą, chain.json neperrašomas
+    export_json = "--no-export" not in sys.argv
+    # --target=HEX: skaitinis PoW tikslas (hash < target) vietoj difficulty nulių
+    target = next((int(a.split("=", 1)[1], 16) for a in sys.argv if a.startswith("--target=")), None)
+    # --block-time=S: target perskaičiuojamas kas --retarget=K blokų pagal visų worker'ių hash greitį,
+    # raundo terminas — iš laukiamo bandymų skaičiaus (vietoj time_limit dvigubinimo)
+    block_time = next((float(a.split("=", 1)[1]) for a in sys.argv if a.startswith("--block-time=")), None)
+    retarget_every = next((int(a.split("=", 1)[1]) for a in sys.argv if a.startswith("--retarget=")), DEFAULT_RETARGET_EVERY)
+    metrics = metrics_from_argv(sys.argv)
+    args = [a for a in sys.argv if a not in ("--no-export", "--binary") and not a.startswith(("--metrics=", "--prometheus=", "--target=", "--hash=", "--block-time=", "--retarget="))]
+    csv_path = args[1]
+    initial_time_limit = float(args[2]) if len(args) > 2 else 5.0
+    difficulty = int(args[3]) if len(args) > 3 else 3
+    # jei nurodytas worker'ių skaičius, kandidatų nonce erdvė dalinama tarp jų
+    n_workers = int(args[4]) if len(args) > 4 else None
 
-    prev_hash = "00000000"
+    store = open_chain_store(DEFAULT_STORE_DIR, legacy_chain_path="chain.json")
+    prev_hash = store.tip_hash()
+    scheduler = None
+    if block_time is not None:
+        # kiekvienas paleidimas kasa vieną bloką — planuotojo būsena atkuriama iš paskutinių blokų metaduomenų
+        backend = get_backend(backend_from_argv(sys.argv))
+        start_target = target if target is not None else target_from_difficulty(difficulty, backend.bits)
+        scheduler = BlockScheduler.for_backend(backend, block_time, start_target, retarget_every, max_tries=MAX_TRIES)
+        scheduler.restore(store.iter_blocks(max(0, len(store) - retarget_every)))
+        target = scheduler.target
+    # --binary: kandidatų header'iai hash'inami dvejetainiu formatu (BINARY_HEADER_VERSION)
+    if "--binary" in sys.argv:
+        version = TARGET_HEADER_VERSION if target is not None else BINARY_HEADER_VERSION
+    else:
+        version = 1
+    # --hash=sha256: hash funkcija įrašoma į header versiją (hash_backends)
+    version = make_version(version, backend_from_argv(sys.argv))
     print(f"\n Pradedamas kasimo procesas")
     print(f"CSV: {csv_path}")
     print(f"Kandidatai: 5 blokai po 100 transakcijų")
-    print(f"Pradinė trukmė: {initial_time_limit}s, sunkumas: {difficulty}\n")
+    print(f"Pradinė trukmė: {initial_time_limit}s, sunkumas: {difficulty}")
+    if n_workers:
+        print(f"Worker'iai: {n_workers} (nonce erdvė dalinama)")
+    if scheduler is not None:
+        print(f"Bloko laikas: {block_time}s, target: {scheduler.target:x} (laukiama bandymų: {scheduler.expected_tries():.0f})")
+    print()
 
-    candidates = generate_candidates(csv_path, prev_hash, 5, 100, 12345, difficulty)
+    candidates = generate_candidates(csv_path, prev_hash, 5, 100, 12345, difficulty, version, metrics, target)
     for i, c in enumerate(candidates, start=1):
         print(f" Kandidatas #{i}: merkle_root={c.merkle_root}")
 
     print("\n Pradedamas kasybos raundas...\n")
 
-    time_limit = initial_time_limit
+    time_limit = scheduler.round_deadline() if scheduler is not None else initial_time_limit
     max_attempts = 6
+    total_tries = 0
+    total_seconds = 0.0
     winner_header = None
     winner_hash = None
 
-    for attempt in range(max_attempts):
-        print(f" Bandymas #{attempt+1}: laiko limitas = {time_limit:.1f}s")
-        start = time.time()
-        winner_header, winner_hash, winner_idx, stats = try_mine_parallel_multiprocessing(candidates, time_limit)
-        duration = time.time() - start
-
-        # parodyti kiek kiekvienas bandė
-        for i, s in enumerate(stats):
-            print(f"   • Kandidatas #{i+1}: bandymai = {s['tries']}")
-
-        if winner_header:
-            winner_idx += 1  # 1-based
-            time_taken = stats[winner_idx-1]['time']
-            tries_done = stats[winner_idx-1]['tries']
-            if time_taken is None:
-                time_taken = 0.0
-            print(f"\nLaimėjo kandidatas #{winner_idx} su hash: {winner_hash}")
-            print(f"    Rado per {time_taken:.3f}s, atlikęs {tries_done} bandymų")
-            break
-        else:
-            print(f" Niekas neiškasė per {duration:.2f}s – didiname laiką iki {time_limit*2:.1f}s\n")
-            time_limit *= 2
+    # procesai paleidžiami vieną kartą; kiekvienas bandymas tęsia nuo ankstesnio nonce
+    with MiningPool(candidates, n_workers or len(candidates)) as pool:
+        for attempt in range(max_attempts):
+            print(f" Bandymas #{attempt+1}: laiko limitas = {time_limit:.1f}s")
+            start = time.time()
+            with metrics.stage("mine"):
+                winner_header, winner_hash, winner_idx, stats = pool.run_round(time_limit)
+            duration = time.time() - start
+            metrics.inc("rounds")
+            # stats bandymai kaupiami per visus raundus — šio raundo bandymai yra skirtumas
+            round_tries = sum(s["tries"] for s in stats) - total_tries
+            total_tries += round_tries
+            total_seconds += duration
 
+            # parodyti kiek kiekvienas bandė (iš viso per visus raundus)
+            for i, s in enumerate(stats):
+                print(f"   • Kandidatas #{i+1}: bandymai = {s['tries']}")
+
+            if winner_header:
+                winner_idx += 1  # 1-based
+                time_taken = stats[winner_idx-1]['time']
+                tries_done = stats[winner_idx-1]['tries']
+                if time_taken is None:
+                    time_taken = 0.0
+                print(f"\nLaimėjo kandidatas #{winner_idx} su hash: {winner_hash}")
+                print(f"    Rado per {time_taken:.3f}s, atlikęs {tries_done} bandymų")
+                break
+            elif scheduler is not None:
+                # terminas iš išmatuoto greičio ir laukiamų bandymų, ne aklas dvigubinimas
+                scheduler.observe_round(round_tries, duration)
+                time_limit = scheduler.round_deadline()
+                print(f" Niekas neiškasė per {duration:.2f}s ({round_tries / max(duration, 1e-9):.0f} H/s) – kitas terminas {time_limit:.1f}s\n")
+            else:
+                print(f" Niekas neiškasė per {duration:.2f}s – didiname laiką iki {time_limit*2:.1f}s\n")
+                time_limit *= 2
+
+    metrics.inc("hashes", total_tries)
     if winner_header:
         block = build_block_dict(winner_header, winner_hash)
-        append_block_to_chain(block, "chain.json")
+        if scheduler is not None:
+            block[SCHEDULE_KEY] = scheduler.record_block(total_tries, total_seconds, deadline=round(time_limit, 3), rounds=attempt + 1, workers=n_workers or len(candidates))
+        with metrics.stage("chain_write"):
+            append_block_to_chain(block, "chain.json", store=store, export_json=export_json)
 
+        txs = getattr(winner_header, "_txs", [])
         try:
-            txs = getattr(winner_header, "_txs", [])
             tx_ids = {tx.get("transaction_id") or tx.get("id") for tx in txs if isinstance(tx, dict)}
             if tx_ids:
-                remove_transactions_from_csv(csv_path, tx_ids)
+                with metrics.stage("remove"):
+                    remove_transactions_from_csv(csv_path, tx_ids)
         except Exception:
             pass
 
-        print("\n Blokas įtrauktas į grandinę (chain.json)")
+        metrics.inc("transactions", len(txs))
+        metrics.end_block(height=len(store) - 1, hash=winner_hash, nonce=winner_header.nonce, workers=n_workers or len(candidates))
+
+        print(f"\n Blokas įtrauktas į grandinę ({DEFAULT_STORE_DIR}{', chain.json' if export_json else ''})")
     else:
         print("\n Nei vienas blokas neiškastas – padidinkite ribas rankiniu būdu.")
+    metrics.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,145 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from my_hash_function import HASH_BITS
+
+# Kasybos laiko planuotojas: matuoja faktinį hash greitį (bandymai / sekundės, visų worker'ių suma),
+# kas retarget_every blokų perskaičiuoja skaitinį target taip, kad laukiamas bloko laikas būtų
+# target_block_time, ir raundų terminus skaičiuoja iš laukiamo bandymų skaičiaus (2^bits / target).
+# work_factor — išmatuotų ir teorinių bandymų santykis: custom32 mažų reikšmių pasiskirstymas netolygus,
+# todėl su mažu target realiai reikia daugiau bandymų nei 2^bits / target. Tokiam backend'ui
+# work_factor nemažinamas žemiau backend.min_work_factor (vienas „laimingas“ langas neišmatuoja lengvumo).
+# Jei nurodytas max_tries (kasybos nonce riba), target nemažinamas tiek, kad laukiami bandymai
+# (× work_factor × MIN_TARGET_MARGIN) netilptų į ribą.
+# Kiekvieno bloko sprendimai grąžinami kaip žodynas, saugomas bloke po SCHEDULE_KEY.
+SCHEDULE_KEY = "schedule"
+DEFAULT_RETARGET_EVERY = 10
+MAX_ADJUST = 4.0         # per vieną perskaičiavimą target keičiamas ne daugiau nei 4 kartus
+DEADLINE_FACTOR = 3.0    # raundo terminas — 3 laukiami bloko laikai (P(nerasta) ≈ e^-3 ≈ 5 %)
+MIN_DEADLINE = 0.05      # sekundės; trumpesni raundai — vien procesų sinchronizacijos kaina
+MIN_TARGET_MARGIN = 20   # laukiami bandymai × 20 turi tilpti į max_tries (P(nerasta) ≈ e^-20)
+
+
+class BlockScheduler:
+    """
+    target_block_time — norimas vieno bloko kasybos laikas sekundėmis.
+    target — pradinis skaitinis target (BlockHeader.target); bits — hash dydis bitais (backend.bits).
+    max_tries — didžiausias bandymų skaičius blokui (None — neribojama); min_work_factor — žr. viršuje.
+    record_block() kviečiamas po kiekvieno iškasto bloko; kas retarget_every blokų target pakeičiamas.
+    """
+
+    def __init__(self, target_block_time: float, target: int, retarget_every: int = DEFAULT_RETARGET_EVERY, bits: int = HASH_BITS, max_adjust: float = MAX_ADJUST, deadline_factor: float = DEADLINE_FACTOR, max_tries: Optional[int] = None, min_work_factor: float = 0.0):
+        if target_block_time <= 0:
+            raise ValueError("target_block_time turi būti > 0")
+        if retarget_every < 1:
+            raise ValueError("retarget_every turi būti >= 1")
+        self.target_block_time = target_block_time
+        self.retarget_every = retarget_every
+        self.bits = bits
+        self.max_adjust = max_adjust
+        self.deadline_factor = deadline_factor
+        self.max_tries = max_tries
+        self.min_work_factor = min_work_factor
+        self.work_factor = max(1.0, min_work_factor)
+        self.target = self._clamp_target(target)
+        self.hash_rate: Optional[float] = None           # paskutinis išmatuotas greitis (bandymai/s)
+        self._window: List[Tuple[int, float, float]] = []  # (bandymai, sekundės, teoriniai bandymai) nuo paskutinio perskaičiavimo
+
+    @classmethod
+    def for_backend(cls, backend, target_block_time: float, target: int, retarget_every: int = DEFAULT_RETARGET_EVERY, max_tries: Optional[int] = None) -> "BlockScheduler":
+        """Planuotojas hash_backends backend'ui (bits ir min_work_factor imami iš jo)."""
+        return cls(target_block_time, target, retarget_every, bits=backend.bits, max_tries=max_tries, min_work_factor=backend.min_work_factor)
+
+    def min_target(self) -> int:
+        """Mažiausias target, su kuriuo blokas dar iškasamas per max_tries bandymų."""
+        if not self.max_tries:
+            return 1
+        return max(1, -(-int((1 << self.bits) * self.work_factor * MIN_TARGET_MARGIN) // self.max_tries))
+
+    def nonce_budget(self) -> int:
+        """Bandymų riba blokui su dabartiniu target: laukiami bandymai × work_factor × MIN_TARGET_MARGIN."""
+        return int(self.expected_tries() * self.work_factor * MIN_TARGET_MARGIN)
+
+    def _clamp_target(self, target: int) -> int:
+        return max(self.min_target(), min(int(target), 1 << self.bits))
+
+    def expected_tries(self, target: Optional[int] = None) -> float:
+        """Vidutinis bandymų skaičius blokui su target (hash tolygiai pasiskirstęs 0..2^bits)."""
+        return (1 << self.bits) / (target or self.target)
+
+    def expected_seconds(self) -> float:
+        if not self.hash_rate:
+            return self.target_block_time
+        return self.expected_tries() * self.work_factor / self.hash_rate
+
+    def round_deadline(self) -> float:
+        """Raundo laiko limitas: deadline_factor laukiamų bloko laikų pagal išmatuotą greitį."""
+        return max(MIN_DEADLINE, self.deadline_factor * self.expected_seconds())
+
+    def observe_round(self, tries: int, seconds: float) -> None:
+        """Atnaujina greitį po raundo (ir nesėkmingo) — kitas terminas skaičiuojamas pagal jį."""
+        if tries > 0 and seconds > 0:
+            self.hash_rate = tries / seconds
+
+    def _window_rate(self) -> Optional[float]:
+        tries = sum(t for t, _, _ in self._window)
+        seconds = sum(s for _, s, _ in self._window)
+        return tries / seconds if tries and seconds > 0 else None
+
+    def _window_work_factor(self) -> float:
+        tries = sum(t for t, _, _ in self._window)
+        expected = sum(e for _, _, e in self._window)
+        return tries / expected if tries and expected > 0 else self.work_factor
+
+    def record_block(self, tries: int, seconds: float, **extra: Any) -> Dict[str, Any]:
+        """
+        Užregistruoja iškastą bloką (bandymai ir kasybos trukmė) ir, jei reikia, perskaičiuoja target.
+        Grąžina sprendimų žodyną bloko metaduomenims (extra laukai pridedami, pvz. deadline, rounds).
+        """
+        used_target = self.target
+        self._window.append((int(tries), float(seconds), self.expected_tries(used_target)))
+        rate = self._window_rate()
+        if rate:
+            self.hash_rate = rate
+        retarget = len(self._window) >= self.retarget_every and rate is not None
+        if retarget:
+            self.work_factor = max(self._window_work_factor(), self.min_work_factor)
+            # target, su kuriuo laukiami bandymai = greitis * target_block_time, bet ne daugiau nei max_adjust karto
+            wanted = (1 << self.bits) * self.work_factor / (rate * self.target_block_time)
+            wanted = min(max(wanted, used_target / self.max_adjust), used_target * self.max_adjust)
+            self.target = self._clamp_target(wanted)
+            self._window = []
+        meta = {
+            "target": used_target,
+            "target_block_time": self.target_block_time,
+            "block_time": round(float(seconds), 6),
+            "tries": int(tries),
+            "expected_tries": round(self.expected_tries(used_target), 1),
+            "hash_rate": round(self.hash_rate, 1) if self.hash_rate else None,
+            "work_factor": round(self.work_factor, 4),
+            "min_target": self.min_target(),
+            "retarget": retarget,
+            "next_target": self.target,
+        }
+        meta.update(extra)
+        return meta
+
+    def restore(self, blocks: Iterable[Dict[str, Any]]) -> "BlockScheduler":
+        """
+        Atkuria būseną iš paskutinių grandinės blokų metaduomenų (pvz. procesas.py — vienas blokas per paleidimą):
+        target — paskutinio bloko next_target, langas — blokai nuo paskutinio perskaičiavimo.
+        """
+        for block in blocks:
+            meta = block.get(SCHEDULE_KEY)
+            if not isinstance(meta, dict) or "next_target" not in meta:
+                continue
+            if meta.get("work_factor"):
+                self.work_factor = max(meta["work_factor"], self.min_work_factor)
+            self.target = self._clamp_target(meta["next_target"])
+            if meta.get("hash_rate"):
+                self.hash_rate = meta["hash_rate"]
+            if meta.get("retarget"):
+                self._window = []
+            else:
+                expected = meta.get("expected_tries") or self.expected_tries(meta.get("target"))
+                self._window.append((int(meta.get("tries", 0)), float(meta.get("block_time", 0.0)), float(expected)))
+        return self
@@ -0,0 +1,36 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from block_body import save_balances_to_users_txt
+from transaction_generator import UTXOGenerator
+from user import User
+
+
+def _users(n, rng):
+    return [User(name=f"#{i + 1} Vartotojas", public_key=f"{rng.getrandbits(32):08x}", balance=rng.randint(100, 1_000_000)) for i in range(n)]
+
+
+@pytest.fixture
+def make_dataset(tmp_path):
+    """
+    Sukuria fiksuoto seed duomenų rinkinį kataloge tmp_path: genesis_utxos.csv, tx.csv,
+    transactions.txt ir users.txt. Grąžina katalogą.
+    """
+    def _make(n_txs=600, n_users=50, seed=1):
+        rng = random.Random(seed)
+        random.seed(seed)
+        users = _users(n_users, rng)
+        gen = UTXOGenerator(users)
+        gen.create_genesis_utxos(n_per_user=3)
+        gen.save_utxos_csv(str(tmp_path / "genesis_utxos.csv"))
+        gen.generate_and_export(n_txs, str(tmp_path / "transactions.txt"), str(tmp_path / "tx.csv"))
+        save_balances_to_users_txt(str(tmp_path / "users.txt"),
+                                   {u.public_key: float(u.balance) for u in users},
+                                   {u.public_key: (u.name, u.public_key, str(u.balance)) for u in users})
+        return tmp_path
+    return _make
@@ -0,0 +1,103 @@
+import csv
+import os
+import random
+import shutil
+
+from block_body import (Ledger, Mempool, apply_transactions_simple, load_balances_from_users_txt,
+                        save_balances_to_users_txt)
+
+
+def _read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def _ids(rows):
+    return [r["transaction_id"] for r in rows]
+
+
+def test_mempool_removals_survive_reopen_without_close(make_dataset):
+    data = make_dataset(n_txs=300)
+    csv_path = str(data / "tx.csv")
+    original = _read_csv(csv_path)
+    removed = set(_ids(random.Random(5).sample(original, 40)))
+
+    mempool = Mempool(csv_path, compact_every=10_000)
+    assert mempool.remove(list(removed)[:25]) == 25
+    assert mempool.remove(list(removed)[25:] + ["nera"]) == 15
+    survivors = [r for r in original if r["transaction_id"] not in removed]
+    assert _ids(mempool.rows_in_order()) == _ids(survivors)
+    # avarija: close() nekviestas, CSV dar neperrašytas
+    assert _read_csv(csv_path) == original
+
+    reopened = Mempool(csv_path, compact_every=10_000)
+    assert len(reopened) == len(survivors)
+    assert reopened.rows_in_order() == survivors
+    assert not any(t in reopened for t in removed)
+
+
+def test_mempool_compact_keeps_original_order(make_dataset):
+    data = make_dataset(n_txs=300)
+    csv_path = str(data / "tx.csv")
+    original = _read_csv(csv_path)
+    removed = set(_ids(random.Random(6).sample(original, 70)))
+
+    mempool = Mempool(csv_path, compact_every=50)
+    for tx_id in sorted(removed):
+        mempool.remove([tx_id])   # 50-as pašalinimas kompaktuoja automatiškai
+    mempool.close()
+    survivors = [r for r in original if r["transaction_id"] not in removed]
+    assert _read_csv(csv_path) == survivors
+    assert not os.path.exists(mempool.journal_path)
+    assert Mempool(csv_path).rows_in_order() == survivors
+
+
+def test_mempool_reserve_commit_release(make_dataset):
+    data = make_dataset(n_txs=100)
+    csv_path = str(data / "tx.csv")
+    original = _read_csv(csv_path)
+    ids = _ids(original)
+
+    mempool = Mempool(csv_path, compact_every=10_000)
+    assert mempool.reserve(ids[:10] + ["nera"]) == sorted(ids[:10])
+    assert len(mempool) == len(original) - 10
+    # rezervuotos eilutės kompaktuojant lieka CSV
+    mempool.compact()
+    assert _read_csv(csv_path) == original
+    assert mempool.commit(ids[:4]) == 4
+    assert mempool.release(ids[4:10]) == 6
+    assert mempool.rows_in_order() == original[4:]
+    mempool.close()
+    assert _read_csv(csv_path) == original[4:]
+
+
+def _baseline_users(users_path, blocks):
+    # pradinis kelias: kiekvienam blokui load -> apply -> save users.txt
+    for txs in blocks:
+        balances, meta = load_balances_from_users_txt(users_path, key_by="public_key")
+        apply_transactions_simple(txs, balances, allow_negative=False)
+        save_balances_to_users_txt(users_path, balances, meta)
+
+
+def test_ledger_journal_replay_matches_baseline(make_dataset, tmp_path):
+    data = make_dataset(n_txs=400)
+    rows = _read_csv(data / "tx.csv")
+    blocks = [rows[i:i + 25] for i in range(0, len(rows), 25)]
+    baseline = tmp_path / "baseline_users.txt"
+    shutil.copy(data / "users.txt", baseline)
+    _baseline_users(str(baseline), blocks)
+
+    users_path = str(data / "users.txt")
+    ledger = Ledger(users_path, snapshot_every=6)
+    for txs in blocks:
+        ledger.apply_block(txs)
+    # avarija po kelių blokų nuo paskutinio snapshot: users.txt atsilieka, žurnalas — ne
+    assert os.path.exists(ledger.journal_path)
+    with open(ledger.journal_path, "a", encoding="utf-8") as jf:
+        jf.write('{"neužbaigta": ')
+
+    replayed = Ledger(users_path, snapshot_every=6)
+    assert replayed.balances == ledger.balances
+    replayed.close()
+    assert (data / "users.txt").read_text(encoding="utf-8") == baseline.read_text(encoding="utf-8")
+    assert not os.path.exists(replayed.journal_path)
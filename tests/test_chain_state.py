@@ -0,0 +1,81 @@
+import csv
+
+import pytest
+
+from chain_state import REJECT_MISSING, REJECT_SPENT, ChainState
+
+
+def _rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def _snapshot(state):
+    # visas indeksas: outpoint -> (savininkas, suma), savininko išėjimai ir išleistų išėjimų aukščiai
+    by_owner = {}
+    for outpoint, (owner, amount) in state._utxos.items():
+        by_owner.setdefault(owner, {})[outpoint] = amount
+    return dict(state._utxos), by_owner, dict(state._spent), state.height
+
+
+@pytest.fixture
+def chain(make_dataset):
+    data = make_dataset(n_txs=400)
+    return ChainState.from_genesis_csv(str(data / "genesis_utxos.csv")), _rows(data / "tx.csv")
+
+
+def test_apply_then_rollback_restores_index_exactly(chain):
+    state, rows = chain
+    snapshots = [_snapshot(state)]
+    pending = rows
+    while pending and state.height < 12:
+        valid, rejected = state.filter_valid(pending[:40])
+        assert valid
+        state.apply_block(valid)
+        snapshots.append(_snapshot(state))
+        applied = {t["transaction_id"] for t in valid}
+        pending = [t for t in pending if t["transaction_id"] not in applied]
+    assert state.height == len(snapshots) - 1 > 1
+    assert snapshots[-1] != snapshots[0]
+    while state.height:
+        state.rollback_last()
+        assert _snapshot(state) == snapshots[state.height]
+    with pytest.raises(IndexError):
+        state.rollback_last()
+
+
+def _spendable_tx(state, tx_id, amount=1):
+    outpoint, (owner, _) = next(iter(state._utxos.items()))
+    return {"transaction_id": tx_id, "sender": owner, "receiver": "gavejas", "amount": str(amount), "inputs": f"{outpoint[0]}:{outpoint[1]}"}
+
+
+def test_double_spend_inside_block_is_rejected(chain):
+    state, _ = chain
+    first = _spendable_tx(state, "aaaa0001")
+    second = dict(first, transaction_id="aaaa0002", receiver="kitas")
+    before = _snapshot(state)
+    with pytest.raises(ValueError):
+        state.apply_block([first, second])
+    assert _snapshot(state) == before
+    valid, rejected = state.filter_valid([first, second])
+    assert valid == [first]
+    assert [(tx["transaction_id"], reason) for tx, reason, _ in rejected] == [("aaaa0002", REJECT_SPENT)]
+    # tas pats input'as dviejose vienos TX vietose
+    doubled = dict(first, transaction_id="aaaa0003", inputs=f"{first['inputs']};{first['inputs']}")
+    assert state.check(doubled)[0] == REJECT_SPENT
+
+
+def test_spent_in_earlier_block_and_chained_outputs(chain):
+    state, _ = chain
+    first = _spendable_tx(state, "bbbb0001")
+    state.apply_block([first])
+    assert state.check(dict(first, transaction_id="bbbb0002"))[0] == REJECT_SPENT
+    # to paties bloko išėjimą išleidžianti TX perkeliama po tėvinės
+    child = {"transaction_id": "bbbb0003", "sender": "gavejas", "receiver": "x", "amount": "1", "inputs": "bbbb0001:0"}
+    grandchild = {"transaction_id": "bbbb0004", "sender": "x", "receiver": "y", "amount": "1", "inputs": "bbbb0003:0"}
+    missing = {"transaction_id": "bbbb0005", "sender": "y", "receiver": "z", "amount": "1", "inputs": "ffffffff:0"}
+    valid, rejected = state.filter_valid([grandchild, missing, child])
+    assert valid == [child, grandchild]
+    assert [reason for _, reason, _ in rejected] == [REJECT_MISSING]
+    state.apply_block(valid)
+    assert ("bbbb0003", 0) not in state and state.get(("bbbb0004", 0)) == ("y", 1)
@@ -0,0 +1,191 @@
+import os
+import shutil
+
+import pytest
+
+from chain_store import ChainStore, HASH_INDEX_FILE, HASH_RECORD, HEIGHT_INDEX_FILE, HEIGHT_RECORD, TIP_FILE, open_chain_store
+from Header import BlockHeader
+from main import _assemble_block
+
+FORMATS = ["json", "binary"]
+
+
+def _blocks(n, version=2):
+    blocks = []
+    prev_hash = "00000000"
+    for i in range(n):
+        header = BlockHeader(prev_hash=prev_hash, timestamp=1_700_000_000 + i, version=version, merkle_root=f"{i:08x}", nonce=i, difficulty=1)
+        found_hash = header.hash()
+        blocks.append(_assemble_block(header, found_hash, header.merkle_root, [], None))
+        prev_hash = found_hash
+    return blocks
+
+
+def _segment(store, segment):
+    return store._segment_path(segment)
+
+
+def _files(directory):
+    return {name: (directory / name).read_bytes() for name in sorted(os.listdir(directory))}
+
+
+@pytest.mark.parametrize("block_format", FORMATS)
+def test_torn_last_record_is_truncated(tmp_path, block_format):
+    blocks = _blocks(5)
+    store = ChainStore(str(tmp_path), fsync=False, block_format=block_format)
+    for block in blocks[:4]:
+        store.append(block)
+    path = _segment(store, 0)
+    size = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(store._encode(blocks[4])[:-3])
+    store.close()
+
+    store = ChainStore(str(tmp_path), fsync=False)
+    assert len(store) == 4
+    assert os.path.getsize(path) == size
+    assert list(store.iter_blocks()) == blocks[:4]
+    store.append(blocks[4])
+    assert list(store.iter_blocks()) == blocks
+    assert store.tip_hash() == blocks[4]["Block_hash"]
+
+
+@pytest.mark.parametrize("block_format", FORMATS)
+def test_tip_behind_log_adopts_full_records(tmp_path, block_format):
+    blocks = _blocks(6)
+    store = ChainStore(str(tmp_path), fsync=False, block_format=block_format)
+    for block in blocks[:2]:
+        store.append(block)
+    shutil.copy(tmp_path / TIP_FILE, tmp_path / "tip.old")
+    for block in blocks[2:]:
+        store.append(block)
+    store.close()
+    # avarija: blokai ir indeksai įrašyti, tip.json — ne
+    os.replace(tmp_path / "tip.old", tmp_path / TIP_FILE)
+
+    store = ChainStore(str(tmp_path), fsync=False)
+    assert len(store) == 6
+    assert store.tip_hash() == blocks[-1]["Block_hash"]
+    assert list(store.iter_blocks()) == blocks
+    assert [store.get_block(h) for h in range(6)] == blocks
+    assert [store.height_of(b["Block_hash"]) for b in blocks] == list(range(6))
+
+
+@pytest.mark.parametrize("block_format", FORMATS)
+def test_orphan_next_segment_adopted_when_tip_segment_full(tmp_path, block_format):
+    blocks = _blocks(5)
+    store = ChainStore(str(tmp_path), segment_max_blocks=3, fsync=False, block_format=block_format)
+    for block in blocks[:3]:
+        store.append(block)
+    shutil.copy(tmp_path / TIP_FILE, tmp_path / "tip.old")
+    store.append(blocks[3])
+    next_path = _segment(store, 1)
+    with open(next_path, "ab") as f:
+        f.write(store._encode(blocks[4])[:5])
+    store.close()
+    os.replace(tmp_path / "tip.old", tmp_path / TIP_FILE)
+
+    store = ChainStore(str(tmp_path), segment_max_blocks=3, fsync=False)
+    assert len(store) == 4
+    assert store.tip_hash() == blocks[3]["Block_hash"]
+    assert list(store.iter_blocks()) == blocks[:4]
+    assert store.get_block(3) == blocks[3]
+    store.append(blocks[4])
+    assert list(store.iter_blocks()) == blocks
+
+
+@pytest.mark.parametrize("block_format", FORMATS)
+def test_orphan_next_segment_removed_when_tip_segment_not_full(tmp_path, block_format):
+    blocks = _blocks(4)
+    store = ChainStore(str(tmp_path), segment_max_blocks=3, fsync=False, block_format=block_format)
+    for block in blocks[:2]:
+        store.append(block)
+    # append šio segmento dar nebaigė — kitas segmentas negali būti tikras tęsinys
+    next_path = _segment(store, 1)
+    with open(next_path, "wb") as f:
+        f.write(store._encode(blocks[3]))
+    store.close()
+
+    store = ChainStore(str(tmp_path), segment_max_blocks=3, fsync=False)
+    assert len(store) == 2
+    assert not os.path.exists(next_path)
+    assert list(store.iter_blocks()) == blocks[:2]
+    store.append(blocks[2])
+    store.append(blocks[3])
+    assert list(store.iter_blocks()) == blocks
+
+
+@pytest.mark.parametrize("block_format", FORMATS)
+def test_index_lookups_across_segments(tmp_path, block_format):
+    blocks = _blocks(10)
+    store = ChainStore(str(tmp_path), segment_max_blocks=4, fsync=False, block_format=block_format)
+    for block in blocks:
+        store.append(block)
+    hashes = [b["Block_hash"] for b in blocks]
+    assert os.path.getsize(tmp_path / HEIGHT_INDEX_FILE) == 10 * HEIGHT_RECORD.size
+    assert store.block_hashes() == hashes
+    assert [store.get_block_hash(h) for h in range(10)] == hashes
+    assert [store.get_block(h) for h in range(10)] == blocks
+    assert store.get_block(-1) == blocks[-1]
+    assert [store.height_of(h) for h in hashes] == list(range(10))
+    assert store.get_block_by_hash(hashes[5]) == blocks[5]
+    assert store.height_of("ffffffff") is None
+    assert store.get_block_by_hash("ffffffff") is None
+    assert list(store.iter_blocks(6)) == blocks[6:]
+    with pytest.raises(IndexError):
+        store.get_block(10)
+    # po append hash -> aukštis žemėlapis papildomas
+    extra = _blocks(11)[10]
+    store.append(extra)
+    assert store.height_of(extra["Block_hash"]) == 10
+
+
+@pytest.mark.parametrize("block_format", FORMATS)
+def test_missing_index_is_rebuilt(tmp_path, block_format):
+    blocks = _blocks(7)
+    store = ChainStore(str(tmp_path), segment_max_blocks=3, fsync=False, block_format=block_format)
+    for block in blocks:
+        store.append(block)
+    store.close()
+    before = _files(tmp_path)
+    os.remove(tmp_path / HEIGHT_INDEX_FILE)
+    with open(tmp_path / HASH_INDEX_FILE, "rb+") as f:
+        f.truncate(3 * HASH_RECORD.size)
+
+    store = ChainStore(str(tmp_path), segment_max_blocks=3, fsync=False)
+    assert _files(tmp_path) == before
+    assert [store.get_block(h) for h in range(7)] == blocks
+
+
+@pytest.mark.parametrize("block_format", FORMATS)
+def test_bulk_import_matches_append(tmp_path, block_format, monkeypatch):
+    blocks = _blocks(10)
+    appended = ChainStore(str(tmp_path / "appended"), segment_max_blocks=4, fsync=False, block_format=block_format)
+    for block in blocks:
+        appended.append(block)
+    appended.export_chain_json(str(tmp_path / "chain.json"))
+
+    fsyncs = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: fsyncs.append(fd) or real_fsync(fd))
+    imported = ChainStore(str(tmp_path / "imported"), segment_max_blocks=4, block_format=block_format)
+    assert imported.import_chain_json(str(tmp_path / "chain.json")) == 10
+    # 3 segmentai + 2 indeksai + tip.json (+ katalogas), o ne po kelis kiekvienam blokui
+    assert len(fsyncs) <= 7
+    assert _files(tmp_path / "imported") == _files(tmp_path / "appended")
+    assert [imported.height_of(b["Block_hash"]) for b in blocks] == list(range(10))
+
+
+def test_open_chain_store_imports_legacy_chain_json(tmp_path):
+    blocks = _blocks(5)
+    source = ChainStore(str(tmp_path / "source"), fsync=False)
+    for block in blocks:
+        source.append(block)
+    source.export_chain_json(str(tmp_path / "chain.json"))
+
+    store = open_chain_store(str(tmp_path / "store"), str(tmp_path / "chain.json"))
+    assert len(store) == 5
+    assert store.tip_hash() == blocks[-1]["Block_hash"]
+    assert list(store.iter_blocks()) == blocks
+    # netuščia saugykla antrą kartą neimportuojama
+    assert len(open_chain_store(str(tmp_path / "store"), str(tmp_path / "chain.json"))) == 5
@@ -0,0 +1,95 @@
+import hashlib
+import struct
+
+import pytest
+
+import my_hash_function
+from chain_store import ChainStore
+from hash_backends import (HashlibBackend, VERSION_BACKEND_SHIFT, backend_for_version, backend_id, get_backend, make_version,
+                           register_backend, version_layout)
+from Header import BlockHeader, MINE_MODES
+from main import mine_chain_from_csv
+from validator import check_block, validate_store
+
+HASHLIB_BACKENDS = ["sha256", "blake2b-256"]
+
+
+@pytest.mark.parametrize("name", HASHLIB_BACKENDS)
+def test_hashlib_nonce_batch_fallback_matches_single_nonce(name):
+    backend = get_backend(name)
+    assert not backend.supports_batch
+    nonces = [0, 9, 10, 99, 100, 12345, 2 ** 40]
+    prefix = "0a0b0c0d|1700000000|257|deadbeef|"
+    state = backend.text_state(prefix)
+    assert backend.nonce_batch(state, nonces, "|2") == [backend.hash_text_int(f"{prefix}{n}|2") for n in nonces]
+    raw_prefix = bytes(range(60))
+    bstate = backend.bytes_state(raw_prefix)
+    assert backend.nonce_batch_bytes(bstate, nonces) == [backend.hash_bytes_int(raw_prefix + struct.pack("<Q", n)) for n in nonces]
+    if my_hash_function.np is not None:
+        array = my_hash_function.np.array(nonces, dtype=my_hash_function.np.int64)
+        assert backend.nonce_batch(state, array, "|2") == backend.nonce_batch(state, nonces, "|2")
+        assert backend.nonce_batch_bytes(bstate, array) == backend.nonce_batch_bytes(bstate, nonces)
+
+
+def test_hashlib_backends_match_hashlib():
+    data = "ąbc|123"
+    assert get_backend("sha256").hash_text(data) == hashlib.sha256(data.encode("utf-8")).hexdigest()
+    assert get_backend("blake2b-256").hash_bytes(b"abc") == hashlib.blake2b(b"abc", digest_size=32).hexdigest()
+    assert get_backend("sha256").hash_texts(["a", "b"]) == [get_backend("sha256").hash_text(t) for t in "ab"]
+
+
+@pytest.mark.parametrize("name", HASHLIB_BACKENDS)
+@pytest.mark.parametrize("layout,target", [(1, None), (2, None), (3, 1 << 250)])
+def test_hashlib_headers_mine_same_nonce_in_all_modes(name, layout, target):
+    found = set()
+    for mode in MINE_MODES:
+        header = BlockHeader(prev_hash="0a0b0c0d", timestamp=1_700_000_000, version=make_version(layout, name),
+                             merkle_root="deadbeef", difficulty=2, target=target)
+        h = header.mine(max_nonce=1_000_000, mode=mode)
+        assert len(h) == 64 and h == header.hash()
+        assert header.validate_proof_of_work()
+        found.add(header.nonce)
+    assert len(found) == 1
+
+
+def test_version_roundtrip_and_unknown_ids():
+    for name in ("custom32",) + tuple(HASHLIB_BACKENDS):
+        for layout in (1, 2, 3):
+            version = make_version(layout, name)
+            assert version_layout(version) == layout
+            assert backend_for_version(version).name == name
+    assert make_version(2, "custom32") == 2
+    unknown = 1 | (77 << VERSION_BACKEND_SHIFT)
+    with pytest.raises(ValueError):
+        backend_for_version(unknown)
+    with pytest.raises(ValueError):
+        get_backend("md5")
+    with pytest.raises(ValueError):
+        register_backend(HashlibBackend("kitas", hashlib.sha256, 256), backend_id("sha256"))
+    with pytest.raises(ValueError):
+        register_backend(HashlibBackend("kitas", hashlib.sha256, 256), 256)
+    # blokas su nežinomu backend id — validatoriaus klaida, ne išimtis
+    block = {"Block_hash": "00", "header": {"prev_hash": "0a0b0c0d", "timestamp": 1, "version": unknown,
+                                            "merkle_root": "deadbeef", "nonce": 0, "difficulty": 1}, "body": {}}
+    errors = check_block((0, block))
+    assert errors and "77" in errors[0][1]
+
+
+@pytest.mark.parametrize("name", HASHLIB_BACKENDS)
+@pytest.mark.parametrize("binary,pipelined", [(False, False), (True, True)])
+def test_hashlib_chain_mines_and_validates(make_dataset, monkeypatch, name, binary, pipelined):
+    monkeypatch.chdir(make_dataset(n_txs=200))
+    chain = mine_chain_from_csv("tx.csv", users_path="users.txt", difficulty=2, block_limit=6, output_path="chain.json",
+                                store_dir="chain_store", binary=binary, genesis_utxos_path="genesis_utxos.csv",
+                                pipelined=pipelined, hash_backend=name)
+    assert len(chain) == 6
+    store = ChainStore("chain_store")
+    assert len(store) == 6
+    for block in store.iter_blocks():
+        assert backend_for_version(block["header"]["version"]).name == name
+        assert len(block["Block_hash"]) == 64 and block["Block_hash"].startswith("00")
+        # validatorius perskaičiuoja Merkle root tuo pačiu backend'u
+        assert block["body"].get("merkle_leaves") or block["body"].get("transactions")
+    result = validate_store(store, workers=1, full=True)
+    assert result.ok, result.errors
+    assert result.valid_height == 6
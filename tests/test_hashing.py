@@ -0,0 +1,136 @@
+import random
+
+import pytest
+
+import Header
+import my_hash_function
+from Header import BlockHeader, MINE_MODES, target_from_difficulty
+from my_hash_function import (BATCH_MIN_SIZE, HashState, hash_batch, hash_batch_hex, hash_bytes, hash_generator, hash_int,
+                              hash_nonce_batch, hash_nonce_batch_bytes, hash_prefix)
+
+np = my_hash_function.np
+needs_numpy = pytest.mark.skipif(np is None, reason="paketiniam hash'inimui reikia numpy")
+
+TEXTS = ["", "a", "abc", "00000000|1700000000|1|deadbeef|", "ąčęėįšųūž€", "x" * 300]
+
+
+def _legacy_mine(prev_hash, timestamp, version, merkle_root, difficulty, max_nonce=1_000_000):
+    # pradinis BlockHeader.mine: tekstinis serialize ir "0" * difficulty prefiksas
+    for nonce in range(max_nonce):
+        h = hash_generator(f"{prev_hash}|{timestamp}|{version}|{merkle_root}|{nonce}|{difficulty}")
+        if h.startswith("0" * difficulty):
+            return nonce, h
+    raise AssertionError("nonce nerastas")
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_hash_state_and_int_match_hash_generator(text):
+    assert f"{hash_int(text):08x}" == hash_generator(text)
+    for cut in (0, len(text) // 2, len(text)):
+        state = hash_prefix(text[:cut])
+        assert state.hexdigest_with(text[cut:]) == hash_generator(text)
+        assert state.digest_with(text[cut:]) == hash_int(text)
+        assert state.copy().update(text[cut:]).hexdigest() == hash_generator(text)
+        # hexdigest_with būsenos nekeičia
+        assert state.hexdigest() == hash_generator(text[:cut])
+    assert HashState().update(text).digest() == hash_int(text)
+
+
+def test_bytes_hashing_matches_latin1_text():
+    text = "prefix|12345|ÿ"
+    data = text.encode("latin-1")
+    assert hash_bytes(data) == hash_generator(text)
+    state = HashState().update_bytes(data[:4])
+    assert state.hexdigest_with_bytes(data[4:]) == hash_generator(text)
+    assert state.digest_with_bytes(data[4:]) == hash_int(text)
+
+
+@needs_numpy
+def test_hash_batch_matches_hash_generator():
+    rng = random.Random(7)
+    texts = TEXTS + ["".join(chr(rng.randint(32, 0x17F)) for _ in range(rng.randint(0, 40))) for _ in range(200)]
+    assert hash_batch(texts).tolist() == [hash_int(t) for t in texts]
+    assert hash_batch([]).tolist() == []
+
+
+@pytest.mark.parametrize("n", [0, 1, BATCH_MIN_SIZE - 1, BATCH_MIN_SIZE, BATCH_MIN_SIZE + 1, 200])
+def test_hash_batch_hex_fallback_boundary(n, monkeypatch):
+    texts = [f"tx-{i}" * (i % 3 + 1) for i in range(n)]
+    expected = [hash_generator(t) for t in texts]
+    assert hash_batch_hex(texts) == expected
+    # be numpy — visada po vieną
+    monkeypatch.setattr(my_hash_function, "np", None)
+    assert hash_batch_hex(texts) == expected
+
+
+@needs_numpy
+def test_hash_batch_hex_uses_numpy_from_min_size(monkeypatch):
+    calls = []
+    real = my_hash_function.hash_batch
+    monkeypatch.setattr(my_hash_function, "hash_batch", lambda t: calls.append(len(t)) or real(t))
+    hash_batch_hex(["a"] * (BATCH_MIN_SIZE - 1))
+    hash_batch_hex(["a"] * BATCH_MIN_SIZE)
+    assert calls == [BATCH_MIN_SIZE]
+
+
+@needs_numpy
+@pytest.mark.parametrize("tail", ["", "|3", "|3|ffff"])
+def test_hash_nonce_batch_mixed_digit_counts(tail):
+    prefix = "00000000|1700000000|1|deadbeef|"
+    state = hash_prefix(prefix)
+    nonces = list(range(0, 120)) + [999, 1000, 1001, 99_999, 100_000, 10 ** 12 - 1, 10 ** 12, 2 ** 62]
+    random.Random(3).shuffle(nonces)
+    got = hash_nonce_batch(state, np.array(nonces, dtype=np.int64), tail).tolist()
+    assert got == [hash_int(f"{prefix}{n}{tail}") for n in nonces]
+    assert hash_nonce_batch(state, np.array([], dtype=np.int64), tail).tolist() == []
+    with pytest.raises(ValueError):
+        hash_nonce_batch(state, np.array([1, -1]), tail)
+
+
+@needs_numpy
+def test_hash_nonce_batch_bytes_matches_packed_nonce():
+    prefix = bytes(range(40))
+    state = HashState().update_bytes(prefix)
+    nonces = [0, 1, 255, 256, 2 ** 32, 2 ** 62, 12345678901]
+    got = hash_nonce_batch_bytes(state, np.array(nonces, dtype=np.uint64)).tolist()
+    assert got == [int(hash_bytes(prefix + n.to_bytes(8, "little")), 16) for n in nonces]
+
+
+@pytest.mark.parametrize("version,target", [(1, None), (1, 1 << 22), (2, None), (3, 1 << 22)])
+def test_mine_modes_find_same_nonce(version, target):
+    nonces = set()
+    for mode in MINE_MODES:
+        header = BlockHeader(prev_hash="0a0b0c0d", timestamp=1_700_000_000, version=version, merkle_root="deadbeef", difficulty=2, target=target)
+        h = header.mine(max_nonce=5_000_000, mode=mode)
+        assert h == header.hash()
+        assert header.validate_proof_of_work()
+        nonces.add(header.nonce)
+    assert len(nonces) == 1
+
+
+def test_mine_batch_across_digit_boundary(monkeypatch):
+    # mažas paketas, kad paketai kirstų 9 -> 10 -> 100 skaitmenų ribas
+    monkeypatch.setattr(Header, "BATCH_SIZE", 7)
+    for start in (0, 95, 995):
+        found = []
+        for mode in MINE_MODES:
+            header = BlockHeader(prev_hash="0a0b0c0d", timestamp=1_700_000_001, version=1, merkle_root="cafebabe", difficulty=1)
+            header.mine(max_nonce=1_000_000, start_nonce=start, mode=mode)
+            found.append(header.nonce)
+        assert found[0] == found[1] == found[2] >= start
+
+
+def test_legacy_difficulty_headers_still_validate():
+    nonce, legacy_hash = _legacy_mine("0a0b0c0d", 1_700_000_000, 1, "deadbeef", 3)
+    header = BlockHeader(prev_hash="0a0b0c0d", timestamp=1_700_000_000, version=1, merkle_root="deadbeef", nonce=nonce, difficulty=3)
+    assert header.serialize() == f"0a0b0c0d|1700000000|1|deadbeef|{nonce}|3"
+    assert header.hash() == legacy_hash
+    assert BlockHeader.validate_hash(legacy_hash, 3)
+    assert not BlockHeader.validate_hash(legacy_hash, 3 + len(legacy_hash))
+    assert header.validate_proof_of_work()
+    for mode in MINE_MODES:
+        fresh = BlockHeader(prev_hash="0a0b0c0d", timestamp=1_700_000_000, version=1, merkle_root="deadbeef", difficulty=3)
+        assert fresh.mine(mode=mode) == legacy_hash
+        assert fresh.nonce == nonce
+    # difficulty ir atitinkamas target sutaria
+    assert (int(legacy_hash, 16) < target_from_difficulty(3)) == BlockHeader.validate_hash(legacy_hash, 3)
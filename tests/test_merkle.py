@@ -0,0 +1,200 @@
+import random
+from multiprocessing import Pool
+
+import pytest
+
+import merkel_root2
+from hash_backends import get_backend
+from merkel_root2 import (LEAF_CACHE, LeafHashCache, MerkleTree, compute_merkle_root_from_tx_list, compute_merkle_root_parallel,
+                          leaf_hash, leaf_hashes, merkle_proof, proof_from_block, verify_merkle_proof, verify_merkle_proofs)
+
+
+def _tx(i, amount=None):
+    return {"transaction_id": f"{i:08x}", "sender": f"s{i % 7}", "receiver": f"r{i % 5}",
+            "amount": str(amount if amount is not None else i * 3 + 1), "inputs": f"{i:08x}:0;{i + 1:08x}:1"}
+
+
+def _reference_levels(txs, backend="custom32"):
+    # be kešo ir be paketų: kiekvienas mazgas hash'inamas atskirai, nelyginis paskutinis poruojamas su savimi
+    backend = get_backend(backend)
+    level = [backend.hash_text(merkel_root2._leaf_str(tx)) for tx in txs]
+    levels = [level]
+    while len(level) > 1:
+        level = [backend.hash_text(level[i] + (level[i + 1] if i + 1 < len(level) else level[i])) for i in range(0, len(level), 2)]
+        levels.append(level)
+    return levels
+
+
+@pytest.fixture(autouse=True)
+def _clean_leaf_cache():
+    LEAF_CACHE.clear()
+    yield
+    LEAF_CACHE.clear()
+
+
+def test_odd_level_duplicates_last_node():
+    backend = get_backend("custom32")
+    txs = [_tx(i) for i in range(3)]
+    a, b, c = (backend.hash_text(merkel_root2._leaf_str(tx)) for tx in txs)
+    expected = backend.hash_text(backend.hash_text(a + b) + backend.hash_text(c + c))
+    assert MerkleTree(txs).root == expected
+    assert compute_merkle_root_from_tx_list(txs, show_tree=False) == expected
+
+
+@pytest.mark.parametrize("backend", ["custom32", "sha256"])
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_random_updates_match_rebuild(backend, seed):
+    rng = random.Random(seed)
+    next_id = 0
+    tree = MerkleTree(backend=backend)
+    for _ in range(250):
+        op = rng.random()
+        if not tree or op < 0.5:
+            tree.append(_tx(next_id))
+            next_id += 1
+        elif op < 0.75:
+            i = rng.randrange(len(tree))
+            old = tree.transactions[i]
+            key = i if rng.random() < 0.5 else old["transaction_id"]
+            tree.replace(key, dict(old, amount=str(rng.randint(1, 10 ** 6))))
+        else:
+            i = rng.randrange(len(tree))
+            key = i if rng.random() < 0.5 else tree.transactions[i]["transaction_id"]
+            tree.remove(key)
+        if not tree:
+            assert tree.levels == []
+            continue
+        expected = _reference_levels(tree.transactions, backend)
+        assert tree.levels_copy() == expected
+        assert tree.root == expected[-1][0]
+        assert MerkleTree(tree.transactions, backend).root == tree.root
+        assert all(tree.index_of(tx["transaction_id"]) == i for i, tx in enumerate(tree.transactions))
+
+
+def test_cache_hit_equals_fresh_hash():
+    backend = get_backend("custom32")
+    tx = _tx(1)
+    fresh = backend.hash_text(merkel_root2._leaf_str(tx))
+    assert leaf_hash(tx) == fresh
+    assert LEAF_CACHE.stats()["misses"] == 1
+    assert leaf_hash(dict(tx)) == fresh
+    assert leaf_hashes([tx, _tx(2)]) == [fresh, backend.hash_text(merkel_root2._leaf_str(_tx(2)))]
+    assert LEAF_CACHE.stats()["hits"] == 2
+    # tas pats ID su kitais laukais — ne kešuotas hash
+    changed = dict(tx, amount="999")
+    assert leaf_hash(changed) == backend.hash_text(merkel_root2._leaf_str(changed)) != fresh
+
+
+def test_backend_change_does_not_reuse_cached_digest():
+    txs = [_tx(i) for i in range(5)]
+    custom = compute_merkle_root_from_tx_list(txs, show_tree=True)
+    sha = compute_merkle_root_from_tx_list(txs, show_tree=True, backend="sha256")
+    assert sha[1] == _reference_levels(txs, "sha256")
+    assert custom[1] == _reference_levels(txs, "custom32")
+    assert leaf_hash(txs[0], "blake2b-256") == get_backend("blake2b-256").hash_text(merkel_root2._leaf_str(txs[0]))
+    assert MerkleTree(txs, "custom32").root == custom[0]
+
+
+def test_leaf_cache_lru_and_invalidate():
+    cache = LeafHashCache(maxsize=2)
+    cache.put("a", (1,), "ha")
+    cache.put("b", (2,), "hb")
+    assert cache.get("a", (1,)) == "ha"
+    cache.put("c", (3,), "hc")   # išstumiamas mažiausiai neseniai naudotas "b"
+    assert cache.get("b", (2,)) is None
+    assert cache.get("c", (3,)) == "hc"
+    cache.invalidate(["a", "c"])
+    assert len(cache) == 0
+    disabled = LeafHashCache(maxsize=0)
+    disabled.put("a", (1,), "ha")
+    assert len(disabled) == 0
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 5, 8, 13])
+def test_every_leaf_proof_verifies(n):
+    txs = [_tx(i) for i in range(n)]
+    tree = MerkleTree(txs)
+    root = compute_merkle_root_from_tx_list(txs, show_tree=False)
+    for i, tx in enumerate(txs):
+        proof = tree.proof(i)
+        assert proof == tree.proof(tx["transaction_id"]) == merkle_proof(txs, tx["transaction_id"])
+        assert len(proof["siblings"]) == len(tree.levels) - 1
+        assert verify_merkle_proof(proof, root)
+        assert verify_merkle_proof(proof, root, tx=tx)
+
+
+@pytest.mark.parametrize("n", [2, 5, 7])
+def test_tampered_proofs_are_rejected(n):
+    txs = [_tx(i) for i in range(n)]
+    tree = MerkleTree(txs)
+    root = tree.root
+    for i in range(n):
+        proof = tree.proof(i)
+        for level, sibling in enumerate(proof["siblings"]):
+            flipped = sibling[:-1] + ("0" if sibling[-1] != "0" else "1")
+            siblings = proof["siblings"][:level] + [flipped] + proof["siblings"][level + 1:]
+            assert not verify_merkle_proof(dict(proof, siblings=siblings), root)
+        # kitas indeksas keičia poravimo kryptį — root nesutampa (išskyrus savimi poruotus mazgus)
+        for wrong in range(n):
+            if wrong != i and tree.proof(wrong)["siblings"] != proof["siblings"]:
+                assert not verify_merkle_proof(dict(proof, index=wrong), root)
+        assert not verify_merkle_proof(proof, root, tx=_tx(i, amount=0))
+        assert not verify_merkle_proof(proof, "00000000")
+
+
+def test_batch_verification_matches_single():
+    txs = [_tx(i) for i in range(11)]
+    other = [_tx(i) for i in range(100, 104)]
+    tree, other_tree = MerkleTree(txs), MerkleTree(other)
+    proofs = [tree.proof(i) for i in range(11)] + [other_tree.proof(i) for i in range(4)]
+    roots = [tree.root] * 11 + [other_tree.root] * 4
+    assert verify_merkle_proofs(proofs, roots) == [True] * 15
+    assert verify_merkle_proofs(proofs[:11], tree.root) == [True] * 11
+    bad = list(proofs)
+    bad[3] = dict(bad[3], index=2)
+    bad[12] = dict(bad[12], leaf=bad[13]["leaf"])
+    assert verify_merkle_proofs(bad, roots) == [verify_merkle_proof(p, r) for p, r in zip(bad, roots)]
+    assert verify_merkle_proofs(bad, roots).count(False) == 2
+    assert verify_merkle_proofs([], []) == []
+    with pytest.raises(ValueError):
+        verify_merkle_proofs(proofs, roots[:3])
+
+
+def test_proof_from_stored_block_leaves():
+    txs = [_tx(i) for i in range(7)]
+    root, levels = compute_merkle_root_from_tx_list(txs, show_tree=True)
+    block = {"body": {"merkle_root": root, "merkle_leaves": levels[0], "transaction_ids": [tx["transaction_id"] for tx in txs]}}
+    for tx in txs:
+        proof = proof_from_block(block, tx["transaction_id"])
+        assert verify_merkle_proof(proof, root, tx=tx)
+    with pytest.raises(KeyError):
+        proof_from_block(block, "ffffffff")
+
+
+@pytest.mark.parametrize("n", [1, 3, 4, 7, 8, 9, 31, 33, 100])
+@pytest.mark.parametrize("chunk_size", [4, 8, 16])
+def test_parallel_root_matches_sequential(n, chunk_size):
+    txs = [_tx(i) for i in range(n)]
+    expected = _reference_levels(txs)
+    root, levels = compute_merkle_root_parallel(txs, show_tree=True, workers=2, chunk_size=chunk_size)
+    assert levels == expected
+    assert root == expected[-1][0] == compute_merkle_root_from_tx_list(txs, show_tree=False)
+    # lygiagretus kelias užpildo lapų kešą tais pačiais hash'ais
+    LEAF_CACHE.clear()
+    compute_merkle_root_parallel(txs, workers=2, chunk_size=chunk_size)
+    assert leaf_hashes(txs) == expected[0]
+    assert LEAF_CACHE.stats()["misses"] == (n if n <= chunk_size else 0)
+
+
+@pytest.mark.parametrize("backend", ["custom32", "sha256"])
+def test_parallel_root_with_shared_pool(backend):
+    with Pool(2) as pool:
+        for n in (5, 64, 65, 130):
+            txs = [_tx(i) for i in range(n)]
+            root = compute_merkle_root_parallel(txs, workers=2, chunk_size=8, pool=pool, backend=backend)
+            assert root == _reference_levels(txs, backend)[-1][0]
+
+
+def test_parallel_rejects_non_power_of_two_chunk():
+    with pytest.raises(ValueError):
+        compute_merkle_root_parallel([_tx(i) for i in range(10)], workers=2, chunk_size=6)
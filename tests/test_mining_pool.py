@@ -0,0 +1,34 @@
+from Header import BlockHeader
+from procesas import MiningPool, assign_workers
+
+
+def _candidates(n):
+    # target=0 — hash niekada nerandamas, todėl kiekvienas raundas baigiasi pagal laiką
+    return [BlockHeader(prev_hash="00000000", timestamp=1_700_000_000, version=1, merkle_root=f"{i:08x}", target=0) for i in range(n)]
+
+
+def test_assign_workers_partitions_nonces():
+    slots = assign_workers(2, 5)
+    assert slots == [(0, 0, 3), (0, 1, 3), (0, 2, 3), (1, 0, 2), (1, 1, 2)]
+    assert assign_workers(3, 1) == [(0, 0, 1), (1, 0, 1), (2, 0, 1)]
+
+
+def test_round_cursors_never_overlap():
+    candidates = _candidates(2)
+    with MiningPool(candidates, n_workers=4) as pool:
+        starts = [candidates[c].nonce + 1 + offset for c, offset, _ in pool.slots]
+        previous = starts
+        for round_no in range(1, 5):
+            header, block_hash, idx, _ = pool.run_round(0.05)
+            assert header is None and idx is None
+            # visi worker'iai patvirtino būtent šį raundą
+            assert list(pool.rounds.done_round) == [round_no] * len(pool.slots)
+            cursors = pool.cursors()
+            for slot, (cand_idx, offset, step) in enumerate(pool.slots):
+                assert cursors[slot] >= previous[slot]
+                assert (cursors[slot] - starts[slot]) % step == 0
+                # tikrinti nonce — ištisinė start, start + step, ... seka: nei praleistų, nei pakartotų
+                assert (cursors[slot] - starts[slot]) // step == pool.shared.tries[slot]
+            previous = cursors
+        assert sum(pool.shared.tries) > 0
+
@@ -0,0 +1,21 @@
+import csv
+import os
+
+from main import mine_chain_from_csv
+
+
+def _rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [tuple(row) for row in csv.reader(f)]
+
+
+def test_pipelined_mining_failure_keeps_csv(make_dataset, monkeypatch):
+    monkeypatch.chdir(make_dataset())
+    before = _rows("tx.csv")
+    # difficulty=6 su max_nonce=1000 — pirmo bloko iškasti nepavyksta
+    chain = mine_chain_from_csv("tx.csv", users_path="users.txt", difficulty=6, max_nonce=1000,
+                                output_path="chain.json", store_dir="chain_store",
+                                genesis_utxos_path="genesis_utxos.csv", pipelined=True)
+    assert chain == []
+    assert _rows("tx.csv") == before
+    assert not os.path.exists("tx.csv.tombstones")
@@ -0,0 +1,27 @@
+import pytest
+
+from hash_backends import get_backend
+from main import _nonce_limit
+from scheduler import BlockScheduler, MIN_TARGET_MARGIN
+
+
+def test_nonce_budget_uses_target_margin():
+    scheduler = BlockScheduler(1.0, target=1 << 20, bits=32)
+    assert scheduler.nonce_budget() == int((1 << 12) * scheduler.work_factor * MIN_TARGET_MARGIN)
+    assert _nonce_limit(10, scheduler) == scheduler.nonce_budget()
+    assert _nonce_limit(10 ** 9, scheduler) == 10 ** 9
+    assert _nonce_limit(123, None) == 123
+
+
+@pytest.mark.parametrize("backend_name", ["custom32", "sha256"])
+def test_target_floor_keeps_budget_within_max_tries(backend_name):
+    backend = get_backend(backend_name)
+    max_tries = 1_000_000
+    scheduler = BlockScheduler.for_backend(backend, 1.0, target=1, retarget_every=1, max_tries=max_tries)
+    assert scheduler.target == scheduler.min_target()
+    # labai greitas hash greitis traukia target žemyn — jis lieka ties apatine riba
+    for _ in range(5):
+        scheduler.record_block(tries=int(scheduler.expected_tries()), seconds=1e-6)
+        assert scheduler.target >= scheduler.min_target()
+        assert scheduler.nonce_budget() <= max_tries
+    assert scheduler.nonce_budget() > max_tries * 0.99
@@ -1,8 +1,10 @@
+import heapq
 import random
-from typing import List
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from dataclasses import dataclass
-from my_hash_function import hash_generator 
+from hash_backends import get_backend, hex_lengths, backend_from_argv
 from user import User  
+from chain_state import DEFAULT_GENESIS_UTXO_PATH
 import sys
 
 @dataclass
@@ -18,10 +20,121 @@ class Transaction:
     inputs: List[UTXO]
     outputs: List[UTXO]
 
+DEFAULT_EXPORT_BATCH = 10_000  # kiek transakcijų kaupiama prieš rašant į failus
+
+class UTXOSet:
+    """
+    Neišleistų išėjimų aibė su indeksais pagal (transaction_id, tr_index) ir pagal savininką.
+    add/spend — O(1) (heap'ui O(log k)), random_choice — tolygiai atsitiktinis UTXO per O(1).
+    Kiekvienam savininkui laikoma suma ir min-heap pagal amount, todėl mažiausių UTXO
+    parinkimas nereikalauja peržiūrėti visų savininko UTXO.
+    """
+
+    def __init__(self, utxos: Iterable[UTXO] = ()):
+        self._items: List[UTXO] = []                           # tolygiam atsitiktiniam parinkimui
+        self._pos: Dict[Tuple[str, int], int] = {}             # (transaction_id, tr_index) -> vieta _items
+        self._by_owner: Dict[str, Dict[Tuple[str, int], UTXO]] = {}
+        self._owner_total: Dict[str, int] = {}
+        # savininko min-heap (amount, eilės nr., raktas); išleisti įrašai pašalinami tingiai
+        self._owner_heap: Dict[str, List[Tuple[int, int, Tuple[str, int]]]] = {}
+        self._seq = 0
+        self.extend(utxos)
+
+    @staticmethod
+    def key(u: UTXO) -> Tuple[str, int]:
+        return (u.transaction_id, u.tr_index)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[UTXO]:
+        return iter(self._items)
+
+    def __contains__(self, u: UTXO) -> bool:
+        return self.key(u) in self._pos
+
+    def get(self, transaction_id: str, tr_index: int) -> Optional[UTXO]:
+        pos = self._pos.get((transaction_id, tr_index))
+        return None if pos is None else self._items[pos]
+
+    def add(self, u: UTXO) -> None:
+        k = self.key(u)
+        if k in self._pos:
+            raise ValueError(f"UTXO {k[0]}:{k[1]} jau yra aibėje")
+        self._pos[k] = len(self._items)
+        self._items.append(u)
+        self._by_owner.setdefault(u.owner, {})[k] = u
+        self._owner_total[u.owner] = self._owner_total.get(u.owner, 0) + u.amount
+        heapq.heappush(self._owner_heap.setdefault(u.owner, []), (u.amount, self._seq, k))
+        self._seq += 1
+
+    def append(self, u: UTXO) -> None:
+        self.add(u)
+
+    def extend(self, utxos: Iterable[UTXO]) -> None:
+        for u in utxos:
+            self.add(u)
+
+    def spend(self, u: UTXO) -> None:
+        """Pašalina UTXO: paskutinis elementas perkeliamas į atsilaisvinusią vietą."""
+        k = self.key(u)
+        pos = self._pos.pop(k)
+        last = self._items.pop()
+        if pos < len(self._items):
+            self._items[pos] = last
+            self._pos[self.key(last)] = pos
+        owned = self._by_owner[u.owner]
+        del owned[k]
+        self._owner_total[u.owner] -= u.amount
+        if not owned:
+            del self._by_owner[u.owner]
+            del self._owner_total[u.owner]
+            del self._owner_heap[u.owner]
+
+    def remove(self, u: UTXO) -> None:
+        self.spend(u)
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._pos.clear()
+        self._by_owner.clear()
+        self._owner_total.clear()
+        self._owner_heap.clear()
+
+    def random_choice(self, rng=random) -> UTXO:
+        return self._items[rng.randrange(len(self._items))]
+
+    def owned_by(self, owner: str) -> List[UTXO]:
+        """Savininko UTXO pridėjimo tvarka (O(savininko UTXO skaičius))."""
+        return list(self._by_owner.get(owner, {}).values())
+
+    def owner_total(self, owner: str) -> int:
+        return self._owner_total.get(owner, 0)
+
+    def first_owned(self, owner: str) -> Optional[UTXO]:
+        """Seniausiai pridėtas savininko UTXO."""
+        return next(iter(self._by_owner.get(owner, {}).values()), None)
+
+    def smallest_owned(self, owner: str, count: int) -> List[UTXO]:
+        """Iki count mažiausių savininko UTXO (lygių sumų atveju — pridėjimo tvarka)."""
+        heap = self._owner_heap.get(owner)
+        if not heap:
+            return []
+        owned = self._by_owner[owner]
+        taken = []
+        while heap and len(taken) < count:
+            entry = heapq.heappop(heap)
+            if entry[2] in owned:
+                taken.append(entry)
+        for entry in taken:
+            heapq.heappush(heap, entry)
+        return [owned[entry[2]] for entry in taken]
+
 class UTXOGenerator:
-    def __init__(self, users: List[User]):
+    def __init__(self, users: List[User], backend: str = None):
         self.users = users
-        self.utxos: List[UTXO] = []  # dabartiniai „unspent“ išėjimai
+        self.backend = get_backend(backend)  # transakcijų id hash funkcija (hash_backends)
+        self.utxos = UTXOSet()  # dabartiniai „unspent“ išėjimai
         self.transactions: List[Transaction] = []
 
     def create_genesis_utxos(self, n_per_user: int = 3):
@@ -44,21 +157,34 @@ class UTXOGenerator:
                     break
                     
                 # Genesis be laiko - deterministinis
-                transaction_id = hash_generator(f"genesis-{user.public_key}-{i}")
+                transaction_id = self.backend.hash_text(f"genesis-{user.public_key}-{i}")
+                if self.utxos.get(transaction_id, i) is not None:
+                    continue  # hash sutapimas su jau sukurtu genesis UTXO
                 self.utxos.append(UTXO(transaction_id=transaction_id, tr_index=i, owner=user.public_key, amount=amount))
         
 
+    def save_utxos_csv(self, path: str = DEFAULT_GENESIS_UTXO_PATH):
+        """Išsaugo dabartinius UTXO (pvz. genesis) — iš jų chain_state.ChainState tikrina input'us."""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("transaction_id,tr_index,owner,amount\n")
+            for u in self.utxos:
+                f.write(f"{u.transaction_id},{u.tr_index},{u.owner},{u.amount}\n")
+
     def generate_transactions(self, n_txs: int = 1000, max_inputs: int = 3):
         """Generuoja transakcijas, optimizuoja input skaičių."""
+        self.transactions.extend(self.iter_transactions(n_txs, max_inputs))
+
+    def iter_transactions(self, n_txs: int = 1000, max_inputs: int = 3) -> Iterator[Transaction]:
+        """Kaip generate_transactions, bet transakcijas grąžina po vieną (į self.transactions nededa)."""
         for _ in range(n_txs):
             if len(self.utxos) < 1:
                 break
 
             # Pasirenkam siuntėją
-            seed_utxo = random.choice(self.utxos)
+            seed_utxo = self.utxos.random_choice()
             sender_pk = seed_utxo.owner
-            owner_utxos = [u for u in self.utxos if u.owner == sender_pk]
-            if not owner_utxos:
+            first_utxo = self.utxos.first_owned(sender_pk)
+            if first_utxo is None:
                 continue
 
             # Pasirenkam gavėją
@@ -67,19 +193,19 @@ class UTXOGenerator:
                 receiver = random.choice(self.users)
 
             # Pasirenkam sumą
-            total_available = sum(u.amount for u in owner_utxos)
+            total_available = self.utxos.owner_total(sender_pk)
 
             if random.random() < 0.3:  # 30% atvejų - didelė suma (reikės kelių input'ų)
                 target_amount = int(total_available * random.uniform(0.6, 0.9))
             else:  # 70% atvejų - maža suma (pakanka vieno input'o)
-                target_amount = int(owner_utxos[0].amount * random.uniform(0.3, 0.9))
+                target_amount = int(first_utxo.amount * random.uniform(0.3, 0.9))
             
             # OPTIMIZACIJA: Renkam TIK kiek reikia input'ų
             input_utxos = []
             total_input = 0
             
-            # Surūšiuojam UTXO nuo mažiausio (pirmiau suvalgys mažesnius)
-            sorted_utxos = sorted(owner_utxos, key=lambda u: u.amount)
+            # Imam UTXO nuo mažiausio (pirmiau suvalgys mažesnius) — daugiau nei max_inputs neprireiks
+            sorted_utxos = self.utxos.smallest_owned(sender_pk, max_inputs)
             
             for utxo in sorted_utxos:
                 if total_input >= target_amount or len(input_utxos) >= max_inputs:
@@ -95,16 +221,20 @@ class UTXOGenerator:
             if target_amount < 1 or not input_utxos:
                 continue
             
-            # Pašalinam panaudotus UTXO
-            for u in input_utxos:
-                self.utxos.remove(u)
-
             # Generuojam transaction_id (deterministiškai)
             tx_str = "|".join(
                 [sender_pk, receiver.public_key, str(target_amount)]
                 + [f"{u.transaction_id}:{u.tr_index}" for u in input_utxos]
             )
-            transaction_id = hash_generator(tx_str)
+            transaction_id = self.backend.hash_text(tx_str)
+
+            # 32 bitų hash gali sutapti su dar neišleisto išėjimo id — tokią TX praleidžiam
+            if self.utxos.get(transaction_id, 0) is not None or self.utxos.get(transaction_id, 1) is not None:
+                continue
+
+            # Pašalinam panaudotus UTXO
+            for u in input_utxos:
+                self.utxos.spend(u)
 
             # Outputs
             change = total_input - target_amount
@@ -114,69 +244,117 @@ class UTXOGenerator:
                 outputs.append(UTXO(transaction_id=transaction_id, tr_index=1, owner=sender_pk, amount=change))
 
             tx = Transaction(transaction_id=transaction_id, inputs=input_utxos, outputs=outputs)
-            self.transactions.append(tx)
             self.utxos.extend(outputs)
+            yield tx
+
+    def _user_names(self) -> Dict[str, str]:
+        """public_key -> vardas, sudaromas vieną kartą eksportui."""
+        names: Dict[str, str] = {}
+        for user in self.users:
+            names.setdefault(user.public_key, user.name)
+        return names
+
+    @staticmethod
+    def _format_report_entry(idx: int, tx: Transaction, names: Dict[str, str], tx_ref_of) -> str:
+        """Vienos transakcijos įrašas transactions.txt formatu; tx_ref_of(inp) grąžina TX numerį arba None."""
+        lines = [f"[Transaction #{idx:05d}]\n", f"Transaction ID: {tx.transaction_id}\n\n", "Inputs:\n"]
+        for i, inp in enumerate(tx.inputs):
+            sender_name = names.get(inp.owner, "Unknown")
+
+            # Patikriname ar input'as yra iš genesis ar iš ankstesnės TX
+            num = tx_ref_of(inp)
+            tx_ref = f"TX #{num:05d}" if num is not None else "Genesis"
+
+            lines.append(f"   ({i}) {tx_ref} → {sender_name} : {inp.amount}\n")
+
+        lines.append("\nOutputs:\n")
+        for i, out in enumerate(tx.outputs):
+            receiver_name = names.get(out.owner, "Unknown")
+            change_text = " (change)" if i > 0 else ""
+            lines.append(f"   ({i}) {receiver_name} : {out.amount}{change_text}\n")
+
+        lines.append("\n---------------------------------------------------\n\n")
+        return "".join(lines)
+
+    @staticmethod
+    def _format_csv_row(tx: Transaction) -> str:
+        """Viena transactions_min.csv eilutė: transaction_id,sender,receiver,amount,inputs."""
+        sender = tx.inputs[0].owner if tx.inputs else ""
+        # Parenkam gavėjo output
+        if tx.outputs:
+            recv_out = next((o for o in tx.outputs if o.owner != sender), tx.outputs[0])
+            receiver = recv_out.owner
+            amount = recv_out.amount
+        else:
+            receiver, amount = "", 0
+
+        inputs_field = ";".join(f"{inp.transaction_id}:{inp.tr_index}" for inp in tx.inputs) if tx.inputs else ""
+        return f"{tx.transaction_id},{sender},{receiver},{amount},{inputs_field}\n"
 
     def save_transactions(self, path: str):
         """Saves transactions in a detailed, readable format."""
         # Sukuriame žodyną transaction_id -> numeris
         tx_id_to_num = {tx.transaction_id: idx for idx, tx in enumerate(self.transactions, 1)}
-        
+        names = self._user_names()
+        tx_ref_of = lambda inp: tx_id_to_num.get(inp.transaction_id)
+
         with open(path, 'w', encoding='utf-8') as f:
             for idx, tx in enumerate(self.transactions, 1):
-                f.write(f"[Transaction #{idx:05d}]\n")
-                f.write(f"Transaction ID: {tx.transaction_id}\n\n")
-                
-                f.write("Inputs:\n")
-                for i, inp in enumerate(tx.inputs):
-                    sender_name = next((user.name for user in self.users if user.public_key == inp.owner), "Unknown")
-                    
-                    # Patikriname ar input'as yra iš genesis ar iš ankstesnės TX
-                    if inp.transaction_id in tx_id_to_num:
-                        tx_ref = f"TX #{tx_id_to_num[inp.transaction_id]:05d}"
-                    else:
-                        tx_ref = "Genesis"
-                    
-                    f.write(f"   ({i}) {tx_ref} → {sender_name} : {inp.amount}\n")
-                
-                f.write("\nOutputs:\n")
-                for i, out in enumerate(tx.outputs):
-                    receiver_name = next((user.name for user in self.users if user.public_key == out.owner), "Unknown")
-                    change_text = " (change)" if i > 0 else ""
-                    f.write(f"   ({i}) {receiver_name} : {out.amount}{change_text}\n")
-                
-                f.write("\n---------------------------------------------------\n\n")
+                f.write(self._format_report_entry(idx, tx, names, tx_ref_of))
 
     def save_minimal_csv(self, path: str):
         """Išsaugo minimalų CSV: transaction_id,sender,receiver,amount,inputs."""
         with open(path, 'w', encoding='utf-8') as f:
             f.write("transaction_id,sender,receiver,amount,inputs\n")
             for tx in self.transactions:
-                sender = tx.inputs[0].owner if tx.inputs else ""
-                # Parenkam gavėjo output 
-                if tx.outputs:
-                    recv_out = next((o for o in tx.outputs if o.owner != sender), tx.outputs[0])
-                    receiver = recv_out.owner
-                    amount = recv_out.amount
-                else:
-                    receiver, amount = "", 0
-                
-                inputs_field = ";".join(f"{inp.transaction_id}:{inp.tr_index}" for inp in tx.inputs) if tx.inputs else ""
-                f.write(f"{tx.transaction_id},{sender},{receiver},{amount},{inputs_field}\n")
+                f.write(self._format_csv_row(tx))
+
+    def generate_and_export(self, n_txs: int, report_path: str, csv_path: str, max_inputs: int = 3, batch_size: int = DEFAULT_EXPORT_BATCH) -> int:
+        """
+        Generuoja transakcijas ir iš karto rašo jas į report_path (transactions.txt formatas)
+        ir csv_path (transactions_min.csv formatas) paketais po batch_size.
+        Transakcijos atmintyje nekaupiamos: TX numeriai saugomi tik dar neišleistiems išėjimams,
+        todėl atminties kiekis priklauso nuo UTXO aibės, o ne nuo sugeneruotų transakcijų skaičiaus.
+        Grąžina sugeneruotų transakcijų skaičių.
+        """
+        names = self._user_names()
+        # (transaction_id, tr_index) -> TX numeris; įrašas pašalinamas, kai išėjimas išleidžiamas
+        live_num: Dict[Tuple[str, int], int] = {}
+        tx_ref_of = lambda inp: live_num.pop(UTXOSet.key(inp), None)
+        count = 0
+        with open(report_path, 'w', encoding='utf-8') as rf, open(csv_path, 'w', encoding='utf-8') as cf:
+            cf.write("transaction_id,sender,receiver,amount,inputs\n")
+            report_buf: List[str] = []
+            csv_buf: List[str] = []
+            for tx in self.iter_transactions(n_txs, max_inputs):
+                count += 1
+                report_buf.append(self._format_report_entry(count, tx, names, tx_ref_of))
+                csv_buf.append(self._format_csv_row(tx))
+                for out in tx.outputs:
+                    live_num[UTXOSet.key(out)] = count
+                if len(csv_buf) >= batch_size:
+                    rf.write("".join(report_buf))
+                    cf.write("".join(csv_buf))
+                    report_buf.clear()
+                    csv_buf.clear()
+            rf.write("".join(report_buf))
+            cf.write("".join(csv_buf))
+        return count
 
     @staticmethod
     def load_users_from_file(path: str) -> List[User]:
         """Loads users from a text file."""
         users = []
+        key_lengths = set(hex_lengths())
         with open(path, 'r', encoding='utf-8') as f:
             next(f)  # skip header
             next(f)  # skip dashed line
             for line in f:
                 parts = line.strip().split()
                 
-                # Find the public key by looking for an 8-character hex string
+                # Find the public key by looking for a hex string of a registered hash length (8 or 64)
                 for i, part in enumerate(parts):
-                    if len(part) == 8 and all(c in '0123456789abcdef' for c in part.lower()):
+                    if len(part) in key_lengths and all(c in '0123456789abcdef' for c in part.lower()):
                         # Everything before this is the name
                         name = ' '.join(parts[:i])  # name may contain spaces
                         public_key = part
@@ -187,9 +365,10 @@ class UTXOGenerator:
         return users
 
 if __name__ == "__main__":
-    # Naudojam paprastą argv: python.exe transaction_generator.py users1.txt
-    if len(sys.argv) > 1:
-        users_file = sys.argv[1]
+    # Naudojam paprastą argv: python.exe transaction_generator.py users1.txt [--hash=sha256]
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if args:
+        users_file = args[0]
     else:
         users_file = "users.txt"
 
@@ -199,10 +378,10 @@ if __name__ == "__main__":
         print(f"Klaida: failas '{users_file}' nerastas.")
         sys.exit(1)
 
-    tx_gen = UTXOGenerator(users)
+    # --hash=sha256: transakcijų id hash funkcija (turi sutapti su grandinės --hash)
+    tx_gen = UTXOGenerator(users, backend=backend_from_argv(sys.argv))
     tx_gen.create_genesis_utxos(n_per_user=3)
-    tx_gen.generate_transactions(n_txs=20)
-    tx_gen.save_transactions("transactions.txt")
-    tx_gen.save_minimal_csv("transactions_min.csv")
+    tx_gen.save_utxos_csv(DEFAULT_GENESIS_UTXO_PATH)
+    tx_gen.generate_and_export(n_txs=20, report_path="transactions.txt", csv_path="transactions_min.csv")
 
-    print(f"Created transactions.txt and transactions_min.csv from {users_file}.")
\ No newline at end of file
+    print(f"Created transactions.txt, transactions_min.csv and {DEFAULT_GENESIS_UTXO_PATH} from {users_file}.")
\ No newline at end of file
@@ -1,11 +1,13 @@
 import random
+import sys
 from typing import List
 from user import User         
-from my_hash_function import hash_generator 
+from hash_backends import get_backend, backend_from_argv
 
 class UserGenerator:
-    def __init__(self, n_users: int = 1000, min_bal: int = 100, max_bal: int = 1_000_000):
+    def __init__(self, n_users: int = 1000, min_bal: int = 100, max_bal: int = 1_000_000, backend: str = None):
         self.n = n_users
+        self.backend = get_backend(backend)  # viešų raktų hash funkcija (hash_backends)
         self.min_bal = min_bal
         self.max_bal = max_bal
         self.users: List[User] = []
@@ -18,7 +20,7 @@ class UserGenerator:
 
 
     def _make_public_key_8(self, name:str) -> str:
-        return hash_generator(name)
+        return self.backend.hash_text(name)
 
     def _make_balance(self) -> int:
         return random.randint(self.min_bal, self.max_bal)
@@ -42,7 +44,8 @@ class UserGenerator:
 
 
 if __name__ == "__main__":
-    gen = UserGenerator(n_users=6)  # pakeiskite n_users jei reikia
+    # --hash=sha256: viešų raktų hash funkcija
+    gen = UserGenerator(n_users=6, backend=backend_from_argv(sys.argv))  # pakeiskite n_users jei reikia
     gen.generate()
     gen.to_text_file("users.txt")
     print("users.txt sukurtas.")
\ No newline at end of file
@@ -0,0 +1,195 @@
+import json
+import os
+import sys
+from dataclasses import dataclass, field, fields
+from multiprocessing import Pool
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from Header import BlockHeader
+from merkel_root2 import MerkleTree, compute_merkle_root_from_tx_list
+from chain_store import ChainStore, DEFAULT_STORE_DIR, GENESIS_PREV_HASH
+
+# Grandinės tikrinimas: kiekvieno bloko header hash, PoW ir Merkle root tikrinami procesų pool'e,
+# prev_hash ryšiai — tėviniame procese (jiems reikia eilės). Patikrintas aukštis įrašomas į
+# checkpoint failą, todėl kitą kartą tikrinami tik nauji blokai.
+CHECKPOINT_FILE = "validated.json"
+DEFAULT_WORKERS = os.cpu_count() or 1
+CHUNK_SIZE = 32  # kiek blokų vienu kartu siunčiama worker'iui
+
+_HEADER_FIELDS = [f.name for f in fields(BlockHeader) if f.name != "is_genesis"]
+
+
+@dataclass
+class ValidationResult:
+    start_height: int = 0          # nuo kurio aukščio tikrinta (po checkpoint)
+    checked: int = 0               # kiek blokų patikrinta šiame paleidime
+    valid_height: int = 0          # kiek blokų iš eilės nuo pradžios yra teisingi
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def _block_hash(block: Dict[str, Any]) -> str:
+    return block.get("Block_hash") or block.get("block_hash") or ""
+
+
+def header_from_block(block: Dict[str, Any]) -> BlockHeader:
+    h = block.get("header", {})
+    return BlockHeader(**{name: h[name] for name in _HEADER_FIELDS if name in h})
+
+
+def _check_merkle(block: Dict[str, Any], merkle_root: str, backend=None) -> Optional[str]:
+    body = block.get("body", {})
+    if body.get("merkle_root", merkle_root) != merkle_root:
+        return "body merkle_root nesutampa su header"
+    if body.get("transactions"):
+        root = compute_merkle_root_from_tx_list(body["transactions"], show_tree=False, backend=backend)
+    elif body.get("merkle_leaves"):
+        root = MerkleTree.from_leaves(body["merkle_leaves"], backend=backend).root
+    elif body.get("merkle_tree_levels"):
+        stored = [lvl["hashes"] for lvl in body["merkle_tree_levels"]]
+        tree = MerkleTree.from_leaves(stored[0], backend=backend)
+        if tree.levels != stored:
+            return "merkle_tree_levels neatitinka perskaičiuotų lygių"
+        root = tree.root
+    else:
+        return None  # bloke nėra duomenų Merkle root perskaičiavimui
+    if root != merkle_root:
+        return f"Merkle root {root} != {merkle_root}"
+    return None
+
+
+def check_block(item: Tuple[int, Dict[str, Any]]) -> List[Tuple[int, str]]:
+    """Vieno bloko patikrinimai, nepriklausantys nuo kitų blokų (vykdoma worker'yje)."""
+    height, block = item
+    errors = []
+    try:
+        header = header_from_block(block)
+        block_hash = _block_hash(block)
+        computed = header.hash()
+        if computed != block_hash:
+            errors.append((height, f"header hash {computed} != Block_hash {block_hash}"))
+        if not header.validate_proof_of_work():
+            errors.append((height, f"hash {computed} neatitinka difficulty {header.difficulty}"))
+        merkle_error = _check_merkle(block, header.merkle_root, header.backend)
+        if merkle_error:
+            errors.append((height, merkle_error))
+    except Exception as e:
+        errors.append((height, f"blokas neperskaitomas: {e}"))
+    return errors
+
+
+def _check_chunk(chunk: List[Tuple[int, Dict[str, Any]]]) -> List[List[Tuple[int, str]]]:
+    return [check_block(item) for item in chunk]
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[list]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def load_checkpoint(path: str) -> Dict[str, Any]:
+    if os.path.isfile(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            pass
+    return {"height": 0, "tip_hash": GENESIS_PREV_HASH}
+
+
+def save_checkpoint(path: str, height: int, tip_hash: str) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"height": height, "tip_hash": tip_hash}, f)
+    os.replace(tmp_path, path)
+
+
+def validate_blocks(blocks: Iterable[Dict[str, Any]], start_height: int = 0, prev_hash: str = GENESIS_PREV_HASH, workers: int = DEFAULT_WORKERS, chunk_size: int = CHUNK_SIZE) -> Tuple[ValidationResult, str]:
+    """
+    Tikrina blokų srautą, prasidedantį aukščiu start_height, kai ankstesnio bloko hash — prev_hash.
+    Grąžina (rezultatas, paskutinio teisingo bloko hash).
+    """
+    result = ValidationResult(start_height=start_height, valid_height=start_height)
+    valid_tip = prev_hash
+    broken = False
+    items = _chunks(enumerate(blocks, start_height), chunk_size)
+
+    def _consume(checked_chunks):
+        nonlocal prev_hash, valid_tip, broken
+        for chunk, chunk_errors in checked_chunks:
+            for (height, block), errors in zip(chunk, chunk_errors):
+                header_prev = block.get("header", {}).get("prev_hash")
+                if header_prev != prev_hash:
+                    errors = [(height, f"prev_hash {header_prev} != ankstesnio bloko {prev_hash}")] + errors
+                result.errors.extend(errors)
+                result.checked += 1
+                prev_hash = _block_hash(block)
+                if errors:
+                    broken = True
+                elif not broken:
+                    result.valid_height = height + 1
+                    valid_tip = prev_hash
+
+    if workers <= 1:
+        _consume((chunk, _check_chunk(chunk)) for chunk in items)
+    else:
+        # chunk'ai siunčiami langais, kad atmintyje nebūtų visa grandinė
+        with Pool(workers) as pool:
+            for window in _chunks(items, workers * 4):
+                _consume(zip(window, pool.map(_check_chunk, window)))
+    return result, valid_tip
+
+
+def validate_store(store: ChainStore, workers: int = DEFAULT_WORKERS, checkpoint_path: Optional[str] = None, full: bool = False) -> ValidationResult:
+    """
+    Tikrina žurnalą nuo checkpoint (arba nuo pradžių, jei full=True ar checkpoint nebeatitinka grandinės)
+    ir atnaujina checkpoint iki paskutinio teisingo bloko.
+    """
+    checkpoint_path = checkpoint_path or os.path.join(store.directory, CHECKPOINT_FILE)
+    start, prev_hash = 0, GENESIS_PREV_HASH
+    if not full:
+        cp = load_checkpoint(checkpoint_path)
+        height = cp.get("height", 0)
+        # grandinė galėjo būti perrašyta — checkpoint tinka tik jei jo hash vis dar toje vietoje
+        if 0 < height <= len(store) and store.get_block_hash(height - 1) == cp.get("tip_hash"):
+            start, prev_hash = height, cp["tip_hash"]
+    result, valid_tip = validate_blocks(store.iter_blocks(start), start, prev_hash, workers)
+    save_checkpoint(checkpoint_path, result.valid_height, valid_tip)
+    return result
+
+
+def validate_chain_json(chain_path: str = "chain.json", workers: int = DEFAULT_WORKERS) -> ValidationResult:
+    """Seno chain.json tikrinimas (be checkpoint)."""
+    with open(chain_path, "r", encoding="utf-8") as f:
+        chain = json.load(f) or []
+    return validate_blocks(chain, 0, GENESIS_PREV_HASH, workers)[0]
+
+
+if __name__ == "__main__":
+    # python validator.py [store_dir|chain.json] [workers] [--full]
+    full = "--full" in sys.argv
+    args = [a for a in sys.argv if a != "--full"]
+    target = args[1] if len(args) > 1 else DEFAULT_STORE_DIR
+    workers = int(args[2]) if len(args) > 2 else DEFAULT_WORKERS
+
+    if os.path.isfile(target):
+        result = validate_chain_json(target, workers)
+    else:
+        result = validate_store(ChainStore(target), workers, full=full)
+
+    print(f"Patikrinta blokų: {result.checked} (nuo aukščio {result.start_height})")
+    print(f"Teisingų blokų iš eilės: {result.valid_height}")
+    for height, message in result.errors[:20]:
+        print(f"  #{height}: {message}")
+    if len(result.errors) > 20:
+        print(f"  ... ir dar {len(result.errors) - 20} klaidų")
+    sys.exit(0 if result.ok else 1)